@@ -0,0 +1,118 @@
+import os
+import json
+import logging
+from typing import Any, Dict, Optional
+
+# Optional fast serializers / compressor - the codec falls back to stdlib json and no compression
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Encoded values start with a 3-byte header: marker, serializer id, compression id.
+# The marker is a control byte that never starts legacy JSON (or image data), so
+# values written before the codec existed are still decoded as plain JSON.
+_MARKER = b'\x01'
+_SERIALIZER_IDS = {'json': b'j', 'orjson': b'o', 'msgpack': b'm'}
+_COMPRESSION_IDS = {None: b'-', 'zstd': b'z'}
+_SERIALIZER_NAMES = {v: k for k, v in _SERIALIZER_IDS.items()}
+_COMPRESSION_NAMES = {v: k for k, v in _COMPRESSION_IDS.items()}
+
+def _available(serializer: str) -> bool:
+    return serializer == 'json' or (serializer == 'orjson' and orjson is not None) or (serializer == 'msgpack' and msgpack is not None)
+
+class CacheCodec:
+    """Pluggable (de)serialization for RedisCache values.
+
+    Writes use the configured serializer (json, orjson or msgpack) and, for
+    values of at least compress_min_bytes, optional zstd compression. Reads
+    dispatch on the header, so any combination - and legacy headerless JSON -
+    stays readable whatever the current configuration is.
+    """
+
+    def __init__(
+        self,
+        serializer: Optional[str] = None,
+        compression: Optional[str] = None,
+        compress_min_bytes: int = 1024,
+        level: int = 3
+    ):
+        serializer = (serializer or os.getenv('CACHE_CODEC', 'orjson')).lower()
+        if serializer not in _SERIALIZER_IDS:
+            raise ValueError(f"Unknown cache serializer: {serializer}")
+        if not _available(serializer):
+            logger.warning(f"Cache serializer {serializer} not installed, falling back to json")
+            serializer = 'json'
+
+        if compression is None:
+            compression = os.getenv('CACHE_COMPRESSION', 'zstd').lower()
+        compression = None if compression in ('', 'none') else compression
+        if compression not in _COMPRESSION_IDS:
+            raise ValueError(f"Unknown cache compression: {compression}")
+        if compression == 'zstd' and zstandard is None:
+            logger.info("zstandard not installed, cache values will not be compressed")
+            compression = None
+
+        self.serializer = serializer
+        self.compression = compression
+        self.compress_min_bytes = compress_min_bytes
+        self._compressor = zstandard.ZstdCompressor(level=level) if compression == 'zstd' else None
+        self._decompressor = zstandard.ZstdDecompressor() if zstandard is not None else None
+
+    def _serialize(self, value: Any) -> bytes:
+        if self.serializer == 'orjson':
+            return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+        if self.serializer == 'msgpack':
+            return msgpack.packb(value, use_bin_type=True)
+        return json.dumps(value).encode('utf-8')
+
+    @staticmethod
+    def _deserialize(serializer: str, payload: bytes) -> Any:
+        if serializer == 'orjson':
+            return orjson.loads(payload) if orjson is not None else json.loads(payload)
+        if serializer == 'msgpack':
+            if msgpack is None:
+                raise ValueError("msgpack value found but msgpack is not installed")
+            return msgpack.unpackb(payload, raw=False)
+        return json.loads(payload)
+
+    def encode(self, value: Any) -> bytes:
+        payload = self._serialize(value)
+        compression = None
+        if self._compressor is not None and len(payload) >= self.compress_min_bytes:
+            payload = self._compressor.compress(payload)
+            compression = 'zstd'
+        return _MARKER + _SERIALIZER_IDS[self.serializer] + _COMPRESSION_IDS[compression] + payload
+
+    def decode(self, data: bytes) -> Any:
+        """Decode a value written by any codec configuration; raises ValueError on corrupt data"""
+        if data[:1] != _MARKER:
+            return json.loads(data.decode('utf-8'))  # Legacy headerless JSON
+
+        serializer = _SERIALIZER_NAMES.get(data[1:2])
+        compression = _COMPRESSION_NAMES.get(data[2:3], 'unknown')
+        if serializer is None or compression == 'unknown':
+            raise ValueError(f"Unknown cache codec header: {data[:3]!r}")
+        payload = data[3:]
+        if compression == 'zstd':
+            if self._decompressor is None:
+                raise ValueError("zstd value found but zstandard is not installed")
+            payload = self._decompressor.decompress(payload)
+        return self._deserialize(serializer, payload)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            'serializer': self.serializer,
+            'compression': self.compression,
+            'compress_min_bytes': self.compress_min_bytes
+        }
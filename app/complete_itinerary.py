@@ -6,16 +6,21 @@ import asyncio
 import logging
 import random
 from dotenv import load_dotenv
-from typing import Dict, List, Any, Optional, Tuple
+from typing import AsyncIterator, Callable, Dict, List, Any, Optional, Tuple
 from datetime import datetime, timedelta
-from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
 from langchain.output_parsers import PydanticOutputParser, OutputFixingParser
+from langchain_core.runnables import RunnableLambda
 
 from .schema import StructuredItinerary, LandmarkSelection, ItineraryBlock, StructuredDayPlan, Location
 from .places_client import GooglePlacesClient
 from .llm_descriptions import LLMDescriptionService
 from .llm_prompt_generator import LLMPromptGenerator
+from .streaming import events_from_callback
+from .stream_parser import IncrementalArrayParser
+from .deadline import budget_timeout, expired
+from .hedging import HedgePolicy
+from .llm_gateway import get_llm_gateway
 
 # Configure structured logging
 logging.basicConfig(
@@ -38,8 +43,24 @@ except Exception as e:
 # Debug mode configuration
 DEBUG_MODE = os.getenv("DEBUG_ITINERARY", "false").lower() == "true"
 
-# Cache for storing generated itineraries
-_itinerary_cache = {}
+# Bump when the prompt or response format changes so previously cached itineraries are ignored
+ITINERARY_CACHE_VERSION = 1
+
+# Alternative spellings of the same destination share one cached itinerary
+DESTINATION_ALIASES = {
+    'nyc': 'new york',
+    'new york city': 'new york',
+    'new york, ny': 'new york',
+    'sf': 'san francisco',
+    'la': 'los angeles',
+    'dc': 'washington',
+    'washington dc': 'washington',
+    'washington d.c.': 'washington',
+}
+_COUNTRY_SUFFIXES = (', usa', ', us', ', united states')
+
+# Receives progress events ({"event": ..., ...}) while an itinerary is being built
+ProgressCallback = Callable[[Dict[str, Any]], None]
 
 # Initialize LLM description service globally
 _llm_description_service = None
@@ -56,45 +77,92 @@ def debug_print(*args, **kwargs):
     timestamp = datetime.now().strftime("%H:%M:%S")
     print(f"[{timestamp}]", *args, **kwargs)
 
+def block_to_dict(block: ItineraryBlock) -> Dict[str, Any]:
+    """Response format for a single itinerary block"""
+    return {
+        "type": block.type,
+        "name": block.name,
+        "description": block.description,
+        "start_time": block.start_time,
+        "duration": block.duration,
+        "mealtime": block.mealtime,
+        "place_id": block.place_id,
+        "rating": block.rating,
+        "location": {"lat": block.location.lat, "lng": block.location.lng} if block.location else None,
+        "address": block.address,
+        "photo_url": block.photo_url,
+        "website": block.website
+    }
+
+def itinerary_to_days(itinerary: StructuredItinerary) -> List[Dict[str, Any]]:
+    return [
+        {"day": day.day, "blocks": [block_to_dict(block) for block in day.blocks]}
+        for day in itinerary.itinerary
+    ]
+
+def _record_timing(performance_metrics: Dict, stage: str, seconds: float, progress: Optional[ProgressCallback] = None):
+    """Store a stage timing in performance_metrics and report it to the progress listener"""
+    performance_metrics["timings"][stage] = round(seconds, 2)
+    if progress:
+        progress({"event": "timing", "stage": stage, "seconds": round(seconds, 2)})
+
+def _normalize_text(value: Any) -> str:
+    return ' '.join(str(value or '').lower().split())
+
+def normalize_destination(destination: str) -> str:
+    """Lowercase, collapse whitespace, drop a trailing country and resolve aliases"""
+    name = _normalize_text(destination).rstrip('.,')
+    for suffix in _COUNTRY_SUFFIXES:
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    return DESTINATION_ALIASES.get(name, name)
+
 def get_cache_key(selection: LandmarkSelection) -> str:
-    """Generate a cache key based on core parameters"""
+    """Canonical selection signature: attraction order within a day, destination
+    spelling and whitespace do not change the key"""
+    def item_key(name: Any, item_type: Any) -> List[str]:
+        return [_normalize_text(name), _normalize_text(item_type)]
+
     key_data = {
-        'destination': selection.details.destination,
+        'destination': normalize_destination(selection.details.destination),
         'travel_days': selection.details.travelDays,
         'with_kids': selection.details.withKids,
-        'kids_age': selection.details.kidsAge,
-        'special_requests': selection.details.specialRequests,
-        'attractions': [(a.name, a.type) for day in selection.itinerary for a in day.attractions],
-        'wishlist': [(w.get('name'), w.get('type')) if isinstance(w, dict) else str(w) for w in (selection.wishlist or [])]
+        'kids_age': sorted(selection.details.kidsAge or []),
+        'with_elderly': selection.details.withElders,
+        'special_requests': _normalize_text(selection.details.specialRequests),
+        'days': sorted(
+            [day.day, sorted(item_key(a.name, a.type) for a in day.attractions)]
+            for day in selection.itinerary
+        ),
+        'wishlist': sorted(
+            item_key(w.get('name'), w.get('type')) if isinstance(w, dict) else item_key(w, 'landmark')
+            for w in (selection.wishlist or [])
+        )
     }
-    return hashlib.md5(json.dumps(key_data, sort_keys=True).encode()).hexdigest()
+    signature = hashlib.sha256(json.dumps(key_data, sort_keys=True).encode()).hexdigest()
+    return f"itinerary:v{ITINERARY_CACHE_VERSION}:{signature}"
 
 load_dotenv()
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
-
-# Use GPT-4-turbo as primary model for quality
-llm = ChatOpenAI(
-    api_key=OPENAI_API_KEY,
-    model_name="gpt-4-turbo",
-    temperature=0.3,
-    max_tokens=2000,
-    request_timeout=25,
-    **({"base_url": OPENAI_BASE_URL} if OPENAI_BASE_URL else {})  # Use base_url if set, otherwise use default
-)
+
+# Use GPT-4-turbo as primary model for quality (all calls go through the shared LLM gateway)
+PRIMARY_MODEL = {"model": "gpt-4-turbo", "temperature": 0.3, "max_tokens": 2000, "timeout": 25}
 parser = PydanticOutputParser(pydantic_object=StructuredItinerary)
 prompt_generator = LLMPromptGenerator()
 
 # Backup LLM for retries
-backup_llm = ChatOpenAI(
-    api_key=OPENAI_API_KEY,
-    model_name="gpt-3.5-turbo",
-    temperature=0.3,
-    max_tokens=2000,
-    request_timeout=15,
-    **({"base_url": OPENAI_BASE_URL} if OPENAI_BASE_URL else {})  # Use base_url if set, otherwise use default
-)
-backup_fallback_parser = OutputFixingParser.from_llm(llm=backup_llm, parser=parser)
+BACKUP_MODEL = {"model": "gpt-3.5-turbo", "temperature": 0.3, "max_tokens": 2000, "timeout": 15}
+
+async def _complete_with_backup_model(prompt_value) -> str:
+    """Backup model as a langchain runnable, for the output fixing parser"""
+    response = await get_llm_gateway().complete(
+        [{"role": "user", "content": prompt_value.to_string()}], purpose="itinerary_fix", **BACKUP_MODEL
+    )
+    return response.content
+
+backup_fallback_parser = OutputFixingParser.from_llm(llm=RunnableLambda(_complete_with_backup_model), parser=parser)
+
+# Hedges the primary itinerary call with the backup model (adaptive delay, see app/hedging.py)
+itinerary_llm_hedge = HedgePolicy("itinerary_llm")
 
 def create_itinerary_prompt() -> PromptTemplate:
     """Create prompt for generating complete itinerary with landmarks"""
@@ -195,6 +263,30 @@ def is_theme_park_day(day_plan: StructuredDayPlan) -> bool:
     debug_print(f"🏛️ Regular day detected")
     return False
 
+# Meal clusters whose landmarks are within this estimated drive share one restaurant search
+MEAL_CLUSTER_MAX_TRAVEL_MINUTES = 10
+
+def merge_nearby_meal_groups(meal_groups: Dict[str, Dict[str, Any]], places_client: GooglePlacesClient) -> Dict[str, Dict[str, Any]]:
+    """Greedily merge meal location groups that are a short trip apart, without any API calls"""
+    if len(meal_groups) <= 1:
+        return meal_groups
+    
+    keys = list(meal_groups.keys())
+    points = [{"lat": meal_groups[k]["location"].lat, "lng": meal_groups[k]["location"].lng} for k in keys]
+    _, durations = places_client.travel_estimator.estimate_arrays(points, points, mode="DRIVE")
+    
+    merged: Dict[str, Dict[str, Any]] = {}
+    anchors: List[int] = []
+    for i, key in enumerate(keys):
+        anchor = next((a for a in anchors if durations[a, i] <= MEAL_CLUSTER_MAX_TRAVEL_MINUTES * 60), None)
+        if anchor is None:
+            anchors.append(i)
+            merged[key] = {"location": meal_groups[key]["location"], "meals": list(meal_groups[key]["meals"])}
+        else:
+            merged[keys[anchor]]["meals"].extend(meal_groups[key]["meals"])
+    
+    return merged
+
 async def add_restaurants_to_day_optimized(
     day_plan: StructuredDayPlan,
     places_client: GooglePlacesClient,
@@ -346,6 +438,9 @@ async def add_restaurants_to_day_optimized(
                             }
                         meal_groups[location_key]["meals"].append((meal_type, time_minutes, duration))
                 
+                # 🎯 COST OPTIMIZATION: One restaurant search for clusters a short drive apart (offline estimate)
+                meal_groups = merge_nearby_meal_groups(meal_groups, places_client)
+                
                 debug_print(f"📍 Grouped meals into {len(meal_groups)} location clusters")
                 
                 # Search for restaurants for each location group (reduced API calls)
@@ -556,64 +651,100 @@ async def search_multiple_restaurants_near_location(
         return []
 
 
+async def enrich_day(
+    day_plan: StructuredDayPlan,
+    places_client: GooglePlacesClient,
+    destination: str,
+    used_restaurants: set,
+    progress: Optional[ProgressCallback] = None
+) -> Tuple[List[ItineraryBlock], int]:
+    """Add restaurants and Google data for one day in parallel.
+
+    Landmark descriptions are left to describe_landmarks so the whole itinerary
+    still costs a single LLM call. Returns the day's blocks sorted by start time
+    and the number of Places API calls used.
+    """
+    async def add_restaurants_and_report() -> StructuredDayPlan:
+        day_with_restaurants = await add_restaurants_to_day_optimized(
+            day_plan,
+            places_client,
+            destination,
+            used_restaurants,
+            is_theme_park_day(day_plan)
+        )
+        if progress:
+            progress({
+                "event": "restaurants",
+                "day": day_plan.day,
+                "blocks": [block_to_dict(b) for b in day_with_restaurants.blocks if b.type == "restaurant"]
+            })
+        return day_with_restaurants
+
+    day_with_restaurants, (_, api_calls) = await asyncio.gather(
+        add_restaurants_and_report(),
+        enhance_landmarks_cost_efficiently(
+            StructuredItinerary(itinerary=[day_plan]), places_client, destination, progress, describe=False
+        )
+    )
+
+    # Landmark blocks were enhanced in place; restaurants come from the restaurant task
+    landmarks = [b for b in day_plan.blocks if b.type == "landmark"]
+    restaurants = [b for b in day_with_restaurants.blocks if b.type == "restaurant"]
+    all_blocks = landmarks + restaurants
+    all_blocks.sort(key=lambda x: parse_time_to_minutes(x.start_time))
+
+    debug_print(f"📅 Day {day_plan.day}: {len(landmarks)} landmarks + {len(restaurants)} restaurants = {len(all_blocks)} total blocks")
+    return all_blocks, api_calls
+
+
 async def enhance_itinerary_simultaneously(
     itinerary: StructuredItinerary,
     places_client: GooglePlacesClient,
     destination: str,
-    used_restaurants: set
+    used_restaurants: set,
+    progress: Optional[ProgressCallback] = None,
+    day_tasks: Optional[Dict[int, "asyncio.Future"]] = None
 ) -> Tuple[StructuredItinerary, Dict]:
-    """Simultaneously add restaurants and enhance landmarks for maximum speed"""
+    """Simultaneously add restaurants and enhance landmarks for maximum speed.
+
+    `day_tasks` maps day numbers to enrich_day tasks that were already started
+    while the LLM was still streaming; they are reused instead of redone.
+    """
     
     debug_print("🚀 SIMULTANEOUS OPTIMIZATION: Adding restaurants + enhancing landmarks in parallel")
     
-    # Prepare tasks for parallel execution
-    restaurant_tasks = []
-    enhancement_tasks = []
+    start_time = time.time()
+    day_tasks = day_tasks or {}
     
-    # Create restaurant addition tasks for each day
+    # Create enrichment tasks for each day not already started from the stream
+    tasks = []
     for day_plan in itinerary.itinerary:
-        is_theme_park = is_theme_park_day(day_plan)
-        task = add_restaurants_to_day_optimized(
-            day_plan,
-            places_client,
-            destination,
-            used_restaurants,
-            is_theme_park
-        )
-        restaurant_tasks.append(task)
-    
-    # Create landmark enhancement task
-    enhancement_task = enhance_landmarks_cost_efficiently(itinerary, places_client, destination)
-    
-    # Execute all tasks simultaneously
-    debug_print(f"⚡ Running {len(restaurant_tasks)} restaurant tasks + 1 enhancement task in parallel")
+        task = day_tasks.get(day_plan.day)
+        if task is None:
+            task = asyncio.ensure_future(
+                enrich_day(day_plan, places_client, destination, used_restaurants, progress)
+            )
+        tasks.append(task)
     
-    start_time = time.time()
+    debug_print(f"⚡ Running {len(tasks)} day tasks ({len(day_tasks)} started early) + 1 description task in parallel")
     
-    # Run restaurant addition and landmark enhancement simultaneously
-    restaurant_results, (enhanced_itinerary, api_calls) = await asyncio.gather(
-        asyncio.gather(*restaurant_tasks),
-        enhancement_task
-    )
+    # Run per-day enrichment and the single description call simultaneously
+    try:
+        day_results, _ = await asyncio.gather(
+            asyncio.gather(*tasks),
+            describe_landmarks(itinerary, destination, progress)
+        )
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
     
     end_time = time.time()
     
-    # Update itinerary with restaurant results - FIXED MERGING LOGIC
-    for i, enhanced_day_with_restaurants in enumerate(restaurant_results):
-        if i < len(enhanced_itinerary.itinerary):
-            # Get enhanced landmarks from the enhancement task
-            enhanced_landmarks = [b for b in enhanced_itinerary.itinerary[i].blocks if b.type == "landmark"]
-            # Get restaurants from the restaurant addition task
-            restaurants = [b for b in enhanced_day_with_restaurants.blocks if b.type == "restaurant"]
-            
-            # Combine and sort all blocks by start time
-            all_blocks = enhanced_landmarks + restaurants
-            all_blocks.sort(key=lambda x: parse_time_to_minutes(x.start_time))
-            
-            # Update the enhanced itinerary with the combined blocks
-            enhanced_itinerary.itinerary[i].blocks = all_blocks
-            
-            debug_print(f"📅 Day {i+1}: {len(enhanced_landmarks)} landmarks + {len(restaurants)} restaurants = {len(all_blocks)} total blocks")
+    api_calls = 0
+    for day_plan, (all_blocks, day_api_calls) in zip(itinerary.itinerary, day_results):
+        day_plan.blocks = all_blocks
+        api_calls += day_api_calls
     
     performance_metrics = {
         "restaurant_and_enhancement_time": round(end_time - start_time, 2),
@@ -624,7 +755,7 @@ async def enhance_itinerary_simultaneously(
     debug_print(f"✅ Simultaneous processing completed in {end_time - start_time:.2f} seconds")
     debug_print(f"💰 API calls used for enhancement: {api_calls}")
     
-    return enhanced_itinerary, performance_metrics
+    return itinerary, performance_metrics
 
 
 def find_optimal_meal_time(landmarks: List[ItineraryBlock], meal_type: str, target_start: int, target_end: int) -> int:
@@ -747,10 +878,87 @@ def _extract_location_from_place_data(place_data: Dict) -> Optional[Location]:
         pass
     return None
 
+# 🚀 SPEED + COST OPTIMIZATION: Single LLM call for ALL landmarks at once
+async def describe_landmarks(
+    itinerary: StructuredItinerary,
+    destination: str,
+    progress: Optional[ProgressCallback] = None
+):
+    """Generate descriptions for ALL landmarks in a single LLM call"""
+    if not itinerary.itinerary:
+        return
+        
+    # Collect ALL landmarks from the itinerary (both selected and recommended)
+    all_landmarks = []
+    landmark_blocks = []
+    
+    for day_plan in itinerary.itinerary:
+        for block in day_plan.blocks:
+            if block.type == "landmark":
+                # Prepare landmark data for LLM
+                landmark_data = {
+                    'name': block.name,
+                    'types': ['tourist_attraction', 'landmark'],
+                    'rating': block.rating or 4.5,
+                    'user_ratings_total': 100,
+                    'location': {
+                        'lat': block.location.lat if block.location else 37.7749,
+                        'lng': block.location.lng if block.location else -122.4194
+                    }
+                }
+                all_landmarks.append(landmark_data)
+                landmark_blocks.append(block)
+    
+    if not all_landmarks:
+        return
+        
+    debug_print(f"💰 Generating descriptions for ALL {len(all_landmarks)} landmarks in single LLM call")
+    
+    try:
+        # Single LLM call for all landmarks
+        llm_service = await get_llm_description_service()
+        user_preferences = {
+            'destination': destination,
+            'type': 'landmarks',
+            'with_kids': False,  # Can be enhanced with actual user preferences
+            'special_requests': 'Generate engaging, concise descriptions'
+        }
+        
+        enhanced_landmarks = await llm_service.generate_place_descriptions(
+            all_landmarks,
+            destination,
+            user_preferences,
+            batch_size=len(all_landmarks)  # Single batch for all landmarks
+        )
+        
+        # Apply descriptions to all landmark blocks
+        for i, block in enumerate(landmark_blocks):
+            if i < len(enhanced_landmarks) and enhanced_landmarks[i].get('description'):
+                block.description = enhanced_landmarks[i]['description']
+                debug_print(f"   ✅ Enhanced {block.name} with LLM description")
+            else:
+                # Fallback description
+                block.description = f"{block.name} is a notable landmark in {destination}."
+                
+    except Exception as e:
+        debug_print(f"   ❌ Error generating landmark descriptions: {e}")
+        # Add fallback descriptions
+        for block in landmark_blocks:
+            if not block.description:
+                block.description = f"{block.name} is a notable landmark in {destination}."
+
+    if progress:
+        progress({
+            "event": "descriptions",
+            "landmarks": [{"name": block.name, "description": block.description} for block in landmark_blocks]
+        })
+
 async def enhance_landmarks_cost_efficiently(
     itinerary: StructuredItinerary, 
     places_client: Optional[GooglePlacesClient] = None,
-    destination: str = ""
+    destination: str = "",
+    progress: Optional[ProgressCallback] = None,
+    describe: bool = True
 ) -> (StructuredItinerary, int):
     """
     Enhances landmarks with Google Places data and generated descriptions with a focus on cost and speed.
@@ -860,73 +1068,8 @@ async def enhance_landmarks_cost_efficiently(
             # Only use LLM for landmarks that have all Google data but need better descriptions
             landmarks_needing_descriptions.append(item)
     
-    # 🚀 SPEED + COST OPTIMIZATION: Single LLM call for ALL landmarks at once
-    async def generate_all_landmark_descriptions():
-        """Generate descriptions for ALL landmarks in a single LLM call"""
-        if not itinerary.itinerary:
-            return
-            
-        # Collect ALL landmarks from the itinerary (both selected and recommended)
-        all_landmarks = []
-        landmark_blocks = []
-        
-        for day_plan in itinerary.itinerary:
-            for block in day_plan.blocks:
-                if block.type == "landmark":
-                    # Prepare landmark data for LLM
-                    landmark_data = {
-                        'name': block.name,
-                        'types': ['tourist_attraction', 'landmark'],
-                        'rating': block.rating or 4.5,
-                        'user_ratings_total': 100,
-                        'location': {
-                            'lat': block.location.lat if block.location else 37.7749,
-                            'lng': block.location.lng if block.location else -122.4194
-                        }
-                    }
-                    all_landmarks.append(landmark_data)
-                    landmark_blocks.append(block)
-        
-        if not all_landmarks:
-            return
-            
-        debug_print(f"💰 Generating descriptions for ALL {len(all_landmarks)} landmarks in single LLM call")
-        
-        try:
-            # Single LLM call for all landmarks
-            llm_service = await get_llm_description_service()
-            user_preferences = {
-                'destination': destination,
-                'type': 'landmarks',
-                'with_kids': False,  # Can be enhanced with actual user preferences
-                'special_requests': 'Generate engaging, concise descriptions'
-            }
-            
-            enhanced_landmarks = await llm_service.generate_place_descriptions(
-                all_landmarks,
-                destination,
-                user_preferences,
-                batch_size=len(all_landmarks)  # Single batch for all landmarks
-            )
-            
-            # Apply descriptions to all landmark blocks
-            for i, block in enumerate(landmark_blocks):
-                if i < len(enhanced_landmarks) and enhanced_landmarks[i].get('description'):
-                    block.description = enhanced_landmarks[i]['description']
-                    debug_print(f"   ✅ Enhanced {block.name} with LLM description")
-                else:
-                    # Fallback description
-                    block.description = f"{block.name} is a notable landmark in {destination}."
-                    
-        except Exception as e:
-            debug_print(f"   ❌ Error generating landmark descriptions: {e}")
-            # Add fallback descriptions
-            for block in landmark_blocks:
-                if not block.description:
-                    block.description = f"{block.name} is a notable landmark in {destination}."
-
-    # Start single LLM call for all landmarks
-    llm_task = asyncio.create_task(generate_all_landmark_descriptions())
+    # Start single LLM call for all landmarks (callers enriching day by day batch it themselves)
+    llm_task = asyncio.create_task(describe_landmarks(itinerary, destination, progress)) if describe else None
 
     # 🚀 SPEED OPTIMIZATION: Simplified Google API processing for photos only
     async def enhance_photos_and_data():
@@ -962,6 +1105,8 @@ async def enhance_landmarks_cost_efficiently(
                         failed_count += 1
                     elif result:
                         enhanced_count += 1
+                        if progress:
+                            progress({"event": "landmark", "day": batch[j]['day'], "block": block_to_dict(batch[j]['block'])})
                     else:
                         failed_count += 1
         
@@ -1110,7 +1255,7 @@ async def enhance_landmarks_cost_efficiently(
                         # Try to get website from place details if we have place_id
                         if best_match.get('place_id'):
                             try:
-                                place_details = await places_client.place_details(best_match['place_id'])
+                                place_details = await places_client.get_place_details(best_match['place_id'], profile='card')
                                 api_calls_made += 1
                                 if place_details and place_details.get('result', {}).get('website'):
                                     block.website = place_details['result']['website']
@@ -1136,7 +1281,7 @@ async def enhance_landmarks_cost_efficiently(
     photo_task = asyncio.create_task(enhance_photos_and_data())
     
     # Wait for both LLM and photo processing to complete
-    await asyncio.gather(llm_task, photo_task)
+    await asyncio.gather(*(task for task in (llm_task, photo_task) if task))
     
     # Report final results
     debug_print(f"💰 Landmark enhancement complete:")
@@ -1145,12 +1290,103 @@ async def enhance_landmarks_cost_efficiently(
     
     return itinerary, api_calls_made
 
+async def stream_itinerary_from_llm(
+    prompt_text: str,
+    on_day: Callable[[StructuredDayPlan], None]
+) -> Tuple[str, Optional[Dict[str, int]]]:
+    """Stream the primary model's answer, calling on_day for each day plan as soon
+    as its JSON object is complete. Returns the full text and the token usage."""
+    day_parser = IncrementalArrayParser()
+    usage = None
+    async for text, chunk_usage in get_llm_gateway().stream(
+        [{"role": "user", "content": prompt_text}], purpose="itinerary", **PRIMARY_MODEL
+    ):
+        usage = chunk_usage or usage
+        for item in day_parser.feed(text):
+            try:
+                on_day(StructuredDayPlan.model_validate(item))
+            except Exception as e:
+                # The final parse decides; a day that does not validate here is just not started early
+                debug_print(f"⚠️ Skipping streamed day that failed validation: {e}")
+    return day_parser.text, usage
+
+class _DayRestaurants:
+    """used_restaurants for one day enriched during streaming.
+
+    Lookups see every day's picks, but the day remembers its own so they can be
+    given back if the day is discarded; after release() nothing more is added.
+    """
+
+    def __init__(self, shared: set):
+        self.shared = shared
+        self.picked = set()
+        self.released = False
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.shared
+
+    def add(self, name: str):
+        if not self.released:
+            self.shared.add(name)
+            self.picked.add(name)
+
+    def release(self):
+        self.released = True
+        self.shared.difference_update(self.picked)
+        self.picked.clear()
+
+StreamedDay = Tuple[StructuredDayPlan, StructuredDayPlan, Optional["asyncio.Future"], Optional[_DayRestaurants]]
+
+def adopt_streamed_days(
+    itinerary: StructuredItinerary,
+    streamed_days: Dict[int, StreamedDay]
+) -> Dict[int, "asyncio.Future"]:
+    """Reuse enrichment started during streaming for days the final parse agrees with.
+
+    `streamed_days` maps day number to (day being enriched, pristine copy, task,
+    restaurants picked). Days that came out differently (e.g. the output fixer
+    rewrote them) are enriched again from scratch; their early task is cancelled
+    and its restaurants are freed for the other days.
+    """
+    day_tasks = {}
+    for i, day_plan in enumerate(itinerary.itinerary):
+        entry = streamed_days.get(day_plan.day)
+        if not entry:
+            continue
+        streamed_day, snapshot, task, _ = entry
+        if task is not None and snapshot == day_plan:
+            del streamed_days[day_plan.day]
+            itinerary.itinerary[i] = streamed_day
+            day_tasks[day_plan.day] = task
+    _cancel_streamed_days(streamed_days)
+    return day_tasks
+
+def _cancel_streamed_days(streamed_days: Dict[int, StreamedDay]):
+    """Cancel enrichment of streamed days that were not adopted and give back their restaurants"""
+    for _, _, task, restaurants in streamed_days.values():
+        if task is not None and not task.done():
+            task.cancel()
+        if restaurants is not None:
+            restaurants.release()
+    streamed_days.clear()
+
 async def complete_itinerary_from_selection(
     selection: LandmarkSelection,
-    places_client: Optional[GooglePlacesClient] = None
+    places_client: Optional[GooglePlacesClient] = None,
+    progress: Optional[ProgressCallback] = None,
+    bypass_cache: bool = False
 ) -> Dict:
-    """Generate complete itinerary with landmarks and restaurants"""
+    """Generate complete itinerary with landmarks and restaurants.
+
+    Results are shared across workers through the places client's Redis cache,
+    keyed on get_cache_key(selection); `bypass_cache` skips the lookup but still
+    stores the fresh result. If `progress` is given it is called with an event
+    dict as each stage finishes (see stream_complete_itinerary).
+    """
+    cache = places_client.cache if places_client else None
     start_time = time.time()
+    streamed_days: Dict[int, StreamedDay] = {}
+    day_tasks: Dict[int, asyncio.Future] = {}
     performance_metrics = {
         "timings": {},
         "costs": {
@@ -1159,11 +1395,16 @@ async def complete_itinerary_from_selection(
         }
     }
     try:
-        # Check cache
+        # 🚀 SPEED + COST OPTIMIZATION: Repeats of the same selection skip GPT-4 and enrichment on any worker
         cache_key = get_cache_key(selection)
-        if cache_key in _itinerary_cache:
-            debug_print("✅ Cache hit - returning cached itinerary")
-            return _itinerary_cache[cache_key]
+        if cache and not bypass_cache:
+            cached = await cache.get(cache_key)
+            if cached:
+                debug_print("✅ Cache hit - returning cached itinerary")
+                # Cached values are shared, so mark the hit on a copy
+                return {**cached, "performance_metrics": {**(cached.get("performance_metrics") or {}), "cache_hit": True}}
+        elif bypass_cache:
+            debug_print("🔄 Cache bypass requested - regenerating itinerary")
         
         # Extract details
         destination = selection.details.destination
@@ -1207,70 +1448,95 @@ async def complete_itinerary_from_selection(
             "wishlist_recommendations": wishlist_text
         }
         
-        # Clear cache for debugging
-        debug_print("🧹 Clearing cache for fresh results")
-        _itinerary_cache.clear()
-        
-        # Try with primary model first
-        try:
-            debug_print("🤖 Calling LLM to generate itinerary...")
-            llm_start_time = time.time()
-            result = await llm.ainvoke(prompt.format(**prompt_inputs))
-            llm_end_time = time.time()
+        used_restaurants = set()
+
+        def start_day(day_plan: StructuredDayPlan):
+            # 🚀 SPEED OPTIMIZATION: Enrich each day while the LLM is still writing the next one
+            if day_plan.day in streamed_days:
+                return
+            if not streamed_days:
+                _record_timing(performance_metrics, "llm_first_day", time.time() - llm_start_time, progress)
+            snapshot = day_plan.model_copy(deep=True)
+            task = restaurants = None
+            if places_client:
+                restaurants = _DayRestaurants(used_restaurants)
+                task = asyncio.ensure_future(
+                    enrich_day(day_plan, places_client, destination, restaurants, progress)
+                )
+            streamed_days[day_plan.day] = (day_plan, snapshot, task, restaurants)
+            if progress:
+                progress({"event": "skeleton_day", "day": day_plan.day, "blocks": [block_to_dict(b) for b in snapshot.blocks]})
+
+        prompt_text = prompt.format(**prompt_inputs)
+
+        async def generate_with_primary() -> StructuredItinerary:
+            debug_print("🤖 Streaming LLM itinerary...")
+            content, usage = await asyncio.wait_for(
+                stream_itinerary_from_llm(prompt_text, start_day), timeout=budget_timeout(PRIMARY_MODEL["timeout"])
+            )
             
             # Log token usage
-            if result.response_metadata and 'token_usage' in result.response_metadata:
-                token_usage = result.response_metadata['token_usage']
-                prompt_tokens = token_usage.get('prompt_tokens', 0)
-                completion_tokens = token_usage.get('completion_tokens', 0)
-                total_tokens = token_usage.get('total_tokens', 0)
+            if usage:
+                prompt_tokens = usage.get('prompt_tokens', 0)
+                completion_tokens = usage.get('completion_tokens', 0)
+                total_tokens = usage.get('total_tokens', 0)
                 debug_print(f"💰 Token Usage (Primary): {total_tokens} total tokens ({prompt_tokens} prompt, {completion_tokens} completion)")
                 performance_metrics["costs"]["openai"]["primary"] = {
-                    "model": "gpt-4-turbo",
+                    "model": PRIMARY_MODEL["model"],
                     "prompt_tokens": prompt_tokens,
                     "completion_tokens": completion_tokens,
                     "total_tokens": total_tokens
                 }
             
-            debug_print(f"📝 LLM Raw Response: {result.content[:500]}...")
-            itinerary = parser.parse(result.content)
-            llm_end_time = time.time()
-            performance_metrics["timings"]["llm_generation"] = round(llm_end_time - llm_start_time, 2)
-            debug_print(f"✅ LLM Generated landmarks in {llm_end_time - llm_start_time:.2f} seconds")
-            for day in itinerary.itinerary:
-                landmarks = [b.name for b in day.blocks if b.type == "landmark"]
-                debug_print(f"   Day {day.day}: {landmarks}")
-        except Exception as e:
-            debug_print(f"⚠️ Primary model failed: {e}, trying backup model")
-            llm_start_time = time.time()
-            result = await backup_llm.ainvoke(prompt.format(**prompt_inputs))
-            llm_end_time = time.time()
+            debug_print(f"📝 LLM Raw Response: {content[:500]}...")
+            return parser.parse(content)
+
+        async def generate_with_backup() -> StructuredItinerary:
+            debug_print("🤖 Calling backup LLM...")
+            # Not cached: a regenerated itinerary (refresh) must really be new
+            result = await get_llm_gateway().complete(
+                [{"role": "user", "content": prompt_text}], purpose="itinerary_backup", use_cache=False, **BACKUP_MODEL
+            )
 
             # Log token usage for backup model
-            if result.response_metadata and 'token_usage' in result.response_metadata:
-                token_usage = result.response_metadata['token_usage']
-                prompt_tokens = token_usage.get('prompt_tokens', 0)
-                completion_tokens = token_usage.get('completion_tokens', 0)
-                total_tokens = token_usage.get('total_tokens', 0)
+            if result.usage:
+                prompt_tokens = result.usage.get('prompt_tokens', 0)
+                completion_tokens = result.usage.get('completion_tokens', 0)
+                total_tokens = result.usage.get('total_tokens', 0)
                 debug_print(f"💰 Token Usage (Backup): {total_tokens} total tokens ({prompt_tokens} prompt, {completion_tokens} completion)")
                 performance_metrics["costs"]["openai"]["backup"] = {
-                    "model": "gpt-3.5-turbo",
+                    "model": BACKUP_MODEL["model"],
                     "prompt_tokens": prompt_tokens,
                     "completion_tokens": completion_tokens,
                     "total_tokens": total_tokens
                 }
 
             debug_print(f"📝 Backup LLM Raw Response: {result.content[:500]}...")
-            itinerary = backup_fallback_parser.parse(result.content)
-            llm_end_time = time.time()
-            performance_metrics["timings"]["llm_generation_backup"] = round(llm_end_time - llm_start_time, 2)
-            debug_print(f"✅ Backup LLM Generated landmarks in {llm_end_time - llm_start_time:.2f} seconds")
-            for day in itinerary.itinerary:
-                landmarks = [b.name for b in day.blocks if b.type == "landmark"]
-                debug_print(f"   Day {day.day}: {landmarks}")
+            # Async parse: a fixing call must not block the primary stream it is racing
+            return await backup_fallback_parser.aparse(result.content)
+
+        # 🚀 SPEED OPTIMIZATION: Race the backup model once the primary is slower than usual
+        # instead of waiting for the primary to time out first
+        llm_start_time = time.time()
+        winner, itinerary = await itinerary_llm_hedge.run(generate_with_primary, generate_with_backup)
+        llm_end_time = time.time()
+        stage = "llm_generation" if winner == "primary" else "llm_generation_backup"
+        _record_timing(performance_metrics, stage, llm_end_time - llm_start_time, progress)
+        debug_print(f"✅ {winner.title()} LLM generated landmarks in {llm_end_time - llm_start_time:.2f} seconds")
+        for day in itinerary.itinerary:
+            landmarks = [b.name for b in day.blocks if b.type == "landmark"]
+            debug_print(f"   Day {day.day}: {landmarks}")
+        if winner == "primary":
+            day_tasks = adopt_streamed_days(itinerary, streamed_days)
+            debug_print(f"🚀 {len(day_tasks)} days were already being enriched while the LLM streamed")
+        else:
+            # Days streamed by the losing primary do not belong to this itinerary
+            _cancel_streamed_days(streamed_days)
         
+        if progress:
+            progress({"event": "skeleton", "itinerary": itinerary_to_days(itinerary)})
+
         # 🚀 SIMULTANEOUS OPTIMIZATION: Add restaurants and enhance landmarks in parallel
-        used_restaurants = set()
         if not places_client:
             debug_print("⚠️ No places client available - skipping restaurant addition and landmark enhancement")
         else:
@@ -1278,11 +1544,11 @@ async def complete_itinerary_from_selection(
             simultaneous_start_time = time.time()
             
             itinerary, simultaneous_metrics = await enhance_itinerary_simultaneously(
-                itinerary, places_client, destination, used_restaurants
+                itinerary, places_client, destination, used_restaurants, progress, day_tasks=day_tasks
             )
             
             simultaneous_end_time = time.time()
-            performance_metrics["timings"]["restaurant_and_enhancement"] = round(simultaneous_end_time - simultaneous_start_time, 2)
+            _record_timing(performance_metrics, "restaurant_and_enhancement", simultaneous_end_time - simultaneous_start_time, progress)
             performance_metrics["costs"]["google_places"]["enhancement_api_calls"] = simultaneous_metrics.get("enhancement_api_calls", 0)
             performance_metrics["optimization"] = simultaneous_metrics.get("api_calls_saved", "")
             debug_print(f"✅ Simultaneous processing completed in {simultaneous_end_time - simultaneous_start_time:.2f} seconds")
@@ -1292,48 +1558,56 @@ async def complete_itinerary_from_selection(
         duplicate_start_time = time.time()
         itinerary = await remove_duplicate_landmarks(itinerary, places_client)
         duplicate_end_time = time.time()
-        performance_metrics["timings"]["duplicate_removal"] = round(duplicate_end_time - duplicate_start_time, 2)
+        _record_timing(performance_metrics, "duplicate_removal", duplicate_end_time - duplicate_start_time, progress)
         debug_print(f"✅ Duplicate landmark check completed in {duplicate_end_time - duplicate_start_time:.2f} seconds")
         
         # Format result - fix double nesting issue
         result = {
-            "itinerary": [
-                {
-                    "day": day.day,
-                    "blocks": [
-                        {
-                            "type": block.type,
-                            "name": block.name,
-                            "description": block.description,
-                            "start_time": block.start_time,
-                            "duration": block.duration,
-                            "mealtime": block.mealtime,
-                            "place_id": block.place_id,
-                            "rating": block.rating,
-                            "location": {"lat": block.location.lat, "lng": block.location.lng} if block.location else None,
-                            "address": block.address,
-                            "photo_url": block.photo_url,
-                            "website": block.website
-                        }
-                        for block in day.blocks
-                    ]
-                }
-                for day in itinerary.itinerary
-            ],
+            "itinerary": itinerary_to_days(itinerary),
             "performance_metrics": performance_metrics
         }
         
-        # Cache the result
-        _itinerary_cache[cache_key] = result
-        
         end_time = time.time()
-        performance_metrics["timings"]["total_generation"] = round(end_time - start_time, 2)
+        _record_timing(performance_metrics, "total_generation", end_time - start_time, progress)
+
+        # Cache the result (unless the request budget ran out and enrichment may be partial)
+        if cache and not expired():
+            await cache.set(cache_key, result, 'itinerary')
         debug_print(f"✅ Total itinerary generation time: {end_time - start_time:.2f} seconds")
         return result
         
     except Exception as e:
         logger.error(f"Error in complete_itinerary_from_selection: {e}")
         return {"error": str(e)}
+    finally:
+        # Failures, client disconnects and the request budget all end here: stop any
+        # enrichment started while streaming that nothing will await any more
+        _cancel_streamed_days(streamed_days)
+        for task in day_tasks.values():
+            if not task.done():
+                task.cancel()
+
+async def stream_complete_itinerary(
+    selection: LandmarkSelection,
+    places_client: Optional[GooglePlacesClient] = None,
+    bypass_cache: bool = False
+) -> AsyncIterator[Dict[str, Any]]:
+    """complete_itinerary_from_selection as a stream of progress events.
+
+    Yields "skeleton_day" as each day arrives from the LLM stream, "skeleton"
+    (all LLM landmarks), "restaurants" per day, "landmark" and
+    "descriptions" enrichments and "timing" events as they happen, then a final
+    "complete" event with the same payload as /complete-itinerary (or "error").
+    Partial events are previews; duplicate removal can still swap landmarks.
+    """
+    async def run(emit: ProgressCallback) -> Dict[str, Any]:
+        result = await complete_itinerary_from_selection(selection, places_client, progress=emit, bypass_cache=bypass_cache)
+        if "error" in result:
+            return {"event": "error", "status_code": 500, "detail": result["error"]}
+        return {"event": "complete", **result}
+
+    async for event in events_from_callback(run):
+        yield event
 
 # Helper functions for time calculations
 def parse_time_to_minutes(time_str: str) -> int:
@@ -0,0 +1,71 @@
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+# Absolute time.monotonic() by which the current request should have answered.
+# Set per request by the deadline middleware in main.py; None means no budget.
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("request_deadline", default=None)
+
+# Never hand out a zero timeout: aiohttp and asyncio treat 0 as "no timeout" or
+# cancel before the first poll, so an exhausted budget still gets a tiny slice
+MIN_TIMEOUT = 0.05
+
+# Overall budget per endpoint (seconds), overridable through the environment
+REQUEST_DEADLINES = {
+    "/generate": float(os.getenv("GENERATE_DEADLINE_SECONDS", 12)),
+    "/complete-itinerary": float(os.getenv("COMPLETE_ITINERARY_DEADLINE_SECONDS", 45)),
+    "/api/v1/image_proxy": float(os.getenv("IMAGE_PROXY_DEADLINE_SECONDS", 5)),
+}
+DEFAULT_REQUEST_DEADLINE = float(os.getenv("DEFAULT_DEADLINE_SECONDS", 30))
+
+
+def deadline_for_path(path: str) -> float:
+    """Budget for a request path; /generate/stream shares the /generate budget and so on"""
+    for prefix, seconds in REQUEST_DEADLINES.items():
+        if path == prefix or path.startswith(prefix + "/"):
+            return seconds
+    return DEFAULT_REQUEST_DEADLINE
+
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current request's budget, or None if there is no deadline"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def budget_timeout(default: float) -> float:
+    """Timeout for one sub-call: its usual limit, capped by what is left of the request budget"""
+    left = remaining()
+    if left is None:
+        return default
+    return max(MIN_TIMEOUT, min(default, left))
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[None]:
+    """Run a block with at most `seconds` left; an existing tighter deadline still wins.
+
+    deadline_scope(None) detaches the block from any request deadline, e.g. for
+    background refreshes that outlive the request that scheduled them.
+    """
+    if seconds is None:
+        deadline = None
+    else:
+        deadline = time.monotonic() + seconds
+        current = _deadline.get()
+        if current is not None:
+            deadline = min(deadline, current)
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
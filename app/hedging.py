@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+# Observed primary latencies kept for the adaptive threshold
+HEDGE_WINDOW = int(os.getenv('LLM_HEDGE_WINDOW', 200))
+# Until this many primary calls have been seen the fixed initial delay is used
+HEDGE_MIN_SAMPLES = int(os.getenv('LLM_HEDGE_MIN_SAMPLES', 20))
+
+
+class LatencyTracker:
+    """Rolling window of latencies (seconds) with nearest-rank percentiles"""
+
+    def __init__(self, window: int = HEDGE_WINDOW):
+        self.samples = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))
+        return ordered[index]
+
+
+class HedgePolicy:
+    """Start a backup call when the primary is slower than usual; first valid result wins.
+
+    The hedge delay is the `percentile` of recent primary latencies, clamped to
+    [min_delay, max_delay], or `initial_delay` until enough samples exist. When
+    the backup beats a still-running primary, the elapsed time is recorded as a
+    lower bound of the primary's latency, so a slow primary keeps the delay up. A primary that fails outright falls back to the backup immediately,
+    as before. Whichever call loses is cancelled.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        percentile: Optional[float] = None,
+        initial_delay: Optional[float] = None,
+        min_delay: float = 2.0,
+        max_delay: float = 20.0
+    ):
+        self.name = name
+        self.percentile = percentile if percentile is not None else float(os.getenv('LLM_HEDGE_PERCENTILE', 95))
+        self.initial_delay = initial_delay if initial_delay is not None else float(os.getenv('LLM_HEDGE_DELAY_SECONDS', 10))
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.latencies = LatencyTracker()
+        self.logger = logging.getLogger(__name__)
+        self.stats = {
+            'calls': 0,
+            'hedged': 0,
+            'fallbacks': 0,
+            'primary_wins': 0,
+            'backup_wins': 0,
+            'failures': 0
+        }
+
+    def hedge_delay(self) -> float:
+        if len(self.latencies.samples) < HEDGE_MIN_SAMPLES:
+            return self.initial_delay
+        return min(self.max_delay, max(self.min_delay, self.latencies.percentile(self.percentile)))
+
+    async def run(
+        self,
+        primary: Callable[[], Awaitable[Any]],
+        backup: Callable[[], Awaitable[Any]]
+    ) -> Tuple[str, Any]:
+        """Returns ("primary" | "backup", result); raises the backup's error if both fail"""
+        self.stats['calls'] += 1
+        started = time.monotonic()
+        delay = self.hedge_delay()
+        primary_task = asyncio.ensure_future(primary())
+        backup_task = None
+        try:
+            done, _ = await asyncio.wait({primary_task}, timeout=delay)
+            if done and primary_task.exception() is None:
+                return self._won('primary', primary_task, primary_task, started)
+
+            if done:
+                # Primary failed fast: plain fallback, nothing to race
+                self.stats['fallbacks'] += 1
+                self.logger.warning(f"{self.name}: primary failed ({primary_task.exception()}), using backup")
+            else:
+                # 🚀 SPEED OPTIMIZATION: Primary is slower than usual - race a backup instead of waiting it out
+                self.stats['hedged'] += 1
+                self.logger.info(f"{self.name}: primary slower than {delay:.1f}s, hedging with backup")
+            backup_task = asyncio.ensure_future(backup())
+
+            pending = {t for t in (primary_task, backup_task) if not t.done()}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in (primary_task, backup_task):
+                    if task in done and task.exception() is None:
+                        return self._won('primary' if task is primary_task else 'backup', task, primary_task, started)
+            self.stats['failures'] += 1
+            raise backup_task.exception()
+        finally:
+            for task in (primary_task, backup_task):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    def _won(self, winner: str, task: asyncio.Future, primary_task: asyncio.Future, started: float) -> Tuple[str, Any]:
+        self.stats[f'{winner}_wins'] += 1
+        # A primary that lost while still running would have taken at least this long (censored
+        # sample); dropping it would let the delay decay under a consistently slow primary
+        if winner == 'primary' or not primary_task.done():
+            self.latencies.record(time.monotonic() - started)
+        return winner, task.result()
+
+    def get_stats(self) -> Dict[str, Any]:
+        p50 = self.latencies.percentile(50)
+        p99 = self.latencies.percentile(99)
+        return {
+            **self.stats,
+            'hedge_rate': round(self.stats['hedged'] / self.stats['calls'], 3) if self.stats['calls'] else 0.0,
+            'hedge_delay_s': round(self.hedge_delay(), 2),
+            'primary_p50_s': round(p50, 2) if p50 is not None else None,
+            'primary_p99_s': round(p99, 2) if p99 is not None else None,
+            'samples': len(self.latencies.samples)
+        }
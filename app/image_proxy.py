@@ -0,0 +1,196 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+import aiohttp
+from fastapi import HTTPException
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_PHOTO_URL = "https://maps.googleapis.com/maps/api/place/photo"
+# 🚀 SPEED OPTIMIZATION: Forward upstream bytes in small chunks instead of buffering whole images
+IMAGE_CHUNK_SIZE = 64 * 1024
+# Most bytes of one image a worker holds while teeing it into the cache; larger images stream uncached
+IMAGE_MAX_BUFFER_BYTES = int(os.getenv('IMAGE_PROXY_MAX_BUFFER_BYTES', 2 * 1024 * 1024))
+# Anything smaller is an error page rather than an image
+IMAGE_MIN_CACHE_BYTES = 100
+
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+stats: Dict[str, int] = {
+    'cache_hits': 0, 'disk_hits': 0, 'cache_misses': 0, 'not_modified': 0, 'partial': 0,
+    'streamed_bytes': 0, 'cached': 0, 'too_large_to_cache': 0
+}
+# Cache writes finish after the response; keep references so they aren't garbage collected
+_background: Set[asyncio.Task] = set()
+
+
+# Persists a complete image: (bytes, content type)
+ImageWriter = Callable[[bytes, str], Awaitable[None]]
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def image_etag(cache_key: str) -> str:
+    """Strong ETag for a photo reference + size.
+
+    Google photo references always resolve to the same bytes, so the tag can be
+    derived from the cache key and checked without reading the image at all.
+    """
+    return '"' + hashlib.sha256(cache_key.encode()).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    return '*' in tags or etag in tags or f"W/{etag}" in tags
+
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Inclusive (start, end) for a single byte range, or None to send the whole image.
+
+    Multi-range and malformed headers are ignored (a full 200 is always allowed);
+    a well-formed range past the end raises RangeNotSatisfiable.
+    """
+    if not range_header:
+        return None
+    match = _RANGE_PATTERN.match(range_header.strip())
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+    first, last = match.groups()
+    if first == '':
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise RangeNotSatisfiable()
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size:
+        raise RangeNotSatisfiable()
+    if end < start:
+        return None
+    return start, end
+
+
+def cached_image_response(
+    image: bytes,
+    etag: str,
+    cache_control: str,
+    range_header: Optional[str] = None,
+    if_range: Optional[str] = None,
+    media_type: str = "image/jpeg"
+) -> Response:
+    """Serve cached image bytes, honouring a single Range (206) when If-Range still matches"""
+    stats['cache_hits'] += 1
+    headers = {"Cache-Control": cache_control, "ETag": etag, "Accept-Ranges": "bytes", "X-Cache": "HIT"}
+    if if_range and if_range.strip() != etag:
+        range_header = None
+    try:
+        byte_range = parse_range(range_header, len(image))
+    except RangeNotSatisfiable:
+        headers["Content-Range"] = f"bytes */{len(image)}"
+        return Response(status_code=416, headers=headers)
+    if byte_range is None:
+        return Response(content=image, media_type=media_type, headers=headers)
+
+    start, end = byte_range
+    stats['partial'] += 1
+    headers["Content-Range"] = f"bytes {start}-{end}/{len(image)}"
+    return Response(content=image[start:end + 1], status_code=206, media_type=media_type, headers=headers)
+
+
+def stored_image_response(path: str, stat: os.stat_result, etag: str, cache_control: str, media_type: str) -> FileResponse:
+    """Serve an image from the disk store; the server sends the file itself (sendfile/pathsend
+    where supported) and Starlette handles Range and If-Range"""
+    stats['cache_hits'] += 1
+    stats['disk_hits'] += 1
+    headers = {"Cache-Control": cache_control, "ETag": etag, "X-Cache": "HIT"}
+    return FileResponse(path, stat_result=stat, media_type=media_type, headers=headers)
+
+
+def not_modified_response(etag: str, cache_control: str) -> Response:
+    stats['not_modified'] += 1
+    return Response(status_code=304, headers={"Cache-Control": cache_control, "ETag": etag})
+
+
+def schedule_store(store: ImageWriter, image: bytes, content_type: str):
+    """Persist an image after the response without delaying it"""
+    task = asyncio.get_running_loop().create_task(_store_quietly(store, image, content_type))
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
+async def _tee_to_cache(
+    upstream: aiohttp.ClientResponse,
+    store: ImageWriter,
+    content_type: str
+) -> AsyncIterator[bytes]:
+    """Yield upstream chunks as they arrive while keeping (at most IMAGE_MAX_BUFFER_BYTES of) a copy for the cache"""
+    buffer: Optional[bytearray] = bytearray()
+    complete = False
+    try:
+        async for chunk in upstream.content.iter_chunked(IMAGE_CHUNK_SIZE):
+            if buffer is not None:
+                if len(buffer) + len(chunk) > IMAGE_MAX_BUFFER_BYTES:
+                    # Don't hold a huge image in memory just to cache it
+                    stats['too_large_to_cache'] += 1
+                    buffer = None
+                else:
+                    buffer.extend(chunk)
+            stats['streamed_bytes'] += len(chunk)
+            yield chunk
+        complete = True
+    finally:
+        upstream.release()
+
+    # Only complete downloads are cached; a dropped client or upstream error leaves the cache alone
+    if complete and buffer is not None and len(buffer) > IMAGE_MIN_CACHE_BYTES:
+        schedule_store(store, bytes(buffer), content_type)
+
+
+async def _store_quietly(store: ImageWriter, image: bytes, content_type: str):
+    try:
+        await asyncio.wait_for(store(image, content_type), timeout=1.0)
+        stats['cached'] += 1
+    except (asyncio.TimeoutError, Exception) as e:
+        logger.warning(f"Image proxy: Cache set error: {e}")
+
+
+async def stream_upstream_image(
+    session: aiohttp.ClientSession,
+    params: Dict[str, str],
+    etag: str,
+    cache_control: str,
+    store: ImageWriter,
+    timeout: float
+) -> StreamingResponse:
+    """Start the Google photo download and stream it to the client, caching it on the way.
+
+    Range requests on a miss get the full image (200); later requests are served from the cache.
+    """
+    stats['cache_misses'] += 1
+    upstream = await session.get(GOOGLE_PHOTO_URL, params=params, timeout=timeout)
+    if upstream.status != 200:
+        status = upstream.status
+        upstream.release()
+        logger.error(f"Image proxy: Google Places Photo API failed. Status: {status}")
+        raise HTTPException(status_code=status if status >= 400 else 500, detail="Failed to fetch image from provider")
+
+    content_type = upstream.headers.get("Content-Type", "image/jpeg")
+    headers = {"Cache-Control": cache_control, "ETag": etag, "Accept-Ranges": "bytes", "X-Cache": "MISS"}
+    if upstream.headers.get("Content-Length") and not upstream.headers.get("Content-Encoding"):
+        headers["Content-Length"] = upstream.headers["Content-Length"]
+    return StreamingResponse(_tee_to_cache(upstream, store, content_type), media_type=content_type, headers=headers)
+
+
+def get_stats() -> Dict[str, int]:
+    return {**stats, 'pending_cache_writes': len(_background), 'max_buffer_bytes': IMAGE_MAX_BUFFER_BYTES}
@@ -0,0 +1,178 @@
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from typing import Any, Dict, Optional, Tuple
+
+# 🚀 SPEED OPTIMIZATION: Proxied photos served from local disk in front of the shared Redis copy.
+# Off unless IMAGE_STORE_DIR names a persistent (non-tmpfs) volume: on Cloud Run /tmp is memory
+IMAGE_STORE_DIR = os.getenv('IMAGE_STORE_DIR')
+# LRU size cap for the blobs on this instance; 0 disables the store
+IMAGE_STORE_MAX_BYTES = int(os.getenv('IMAGE_STORE_MAX_BYTES', 512 * 1024 * 1024))
+# Evict down to this fraction of the cap so every write doesn't trigger a scan
+IMAGE_STORE_LOW_WATERMARK = 0.9
+# Access times are refreshed at most this often per blob (LRU granularity)
+IMAGE_STORE_TOUCH_INTERVAL = 60 * 60
+
+
+def image_ref_key(cache_key: str) -> str:
+    """Redis key of the reference for an image_proxy cache key"""
+    return 'image_ref:' + cache_key.split(':', 1)[1]
+
+
+class ImageStore:
+    """Content-addressed blob store for proxied images on local disk.
+
+    Blobs are named by the sha256 of their bytes (identical photos are stored once)
+    and written atomically. Recency is tracked through file mtimes, so workers
+    sharing the directory share one LRU; the oldest blobs are removed once the
+    directory grows past max_bytes. Blobs exist only on the instance that wrote
+    them, so the image bytes stay in Redis as well for the other instances.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._bytes: Optional[int] = None  # Approximate; recomputed from disk on every eviction
+        self._evicting: Optional[asyncio.Task] = None
+        self.stats = {'hits': 0, 'misses': 0, 'writes': 0, 'deduplicated': 0, 'evictions': 0, 'evicted_bytes': 0}
+        self.logger = logging.getLogger(__name__)
+        os.makedirs(root, exist_ok=True)
+
+    def path_for(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def lookup(self, digest: str) -> Optional[Tuple[str, os.stat_result]]:
+        """(path, stat) of a stored blob, or None if it was never written here or has been evicted"""
+        path = self.path_for(digest)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.stats['misses'] += 1
+            return None
+        self.stats['hits'] += 1
+        self._touch(path, stat)
+        return path, stat
+
+    def _touch(self, path: str, stat: os.stat_result):
+        now = time.time()
+        if now - stat.st_mtime > IMAGE_STORE_TOUCH_INTERVAL:
+            try:
+                os.utime(path, (now, now))
+            except OSError:
+                pass
+
+    async def put(self, data: bytes) -> str:
+        """Store bytes and return their digest"""
+        digest = hashlib.sha256(data).hexdigest()
+        written = await asyncio.to_thread(self._write, digest, data)
+        if written:
+            self.stats['writes'] += 1
+            if self._bytes is not None:
+                self._bytes += len(data)
+        else:
+            self.stats['deduplicated'] += 1
+
+        if self._bytes is None or self._bytes > self.max_bytes:
+            self._schedule_eviction()
+        return digest
+
+    def _write(self, digest: str, data: bytes) -> bool:
+        path = self.path_for(digest)
+        try:
+            self._touch(path, os.stat(path))
+            return False
+        except OSError:
+            pass
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            # Readers never see a half-written blob
+            os.replace(tmp_path, path)
+        except Exception:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        return True
+
+    def _schedule_eviction(self):
+        if self._evicting is None or self._evicting.done():
+            self._evicting = asyncio.get_running_loop().create_task(self._run_eviction())
+
+    async def _run_eviction(self):
+        try:
+            removed, removed_bytes, remaining = await asyncio.to_thread(self._evict)
+            self._bytes = remaining
+            self.stats['evictions'] += removed
+            self.stats['evicted_bytes'] += removed_bytes
+            if removed:
+                self.logger.info(f"Image store: evicted {removed} blobs ({removed_bytes} bytes), {remaining} bytes left")
+        except Exception as e:
+            self.logger.error(f"Image store eviction failed: {str(e)}")
+
+    def _evict(self) -> Tuple[int, int, int]:
+        """Remove least recently used blobs until under the low watermark; returns (removed, removed_bytes, remaining_bytes)"""
+        blobs = []
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.startswith('.tmp-'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                blobs.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in blobs)
+        if total <= self.max_bytes:
+            return 0, 0, total
+
+        target = self.max_bytes * IMAGE_STORE_LOW_WATERMARK
+        removed = removed_bytes = 0
+        for _, size, path in sorted(blobs):
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+            removed_bytes += size
+        return removed, removed_bytes, total
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats['hits'] + self.stats['misses']
+        return {
+            **self.stats,
+            'hit_rate': round(self.stats['hits'] / lookups, 3) if lookups else 0.0,
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+            'root': self.root
+        }
+
+
+_image_store: Optional[ImageStore] = None
+_image_store_enabled = bool(IMAGE_STORE_DIR) and IMAGE_STORE_MAX_BYTES > 0
+
+
+def get_image_store() -> Optional[ImageStore]:
+    """Process-wide image store, or None when disabled (no IMAGE_STORE_DIR, IMAGE_STORE_MAX_BYTES=0)
+    or the directory is unusable"""
+    global _image_store, _image_store_enabled
+    if _image_store is None and _image_store_enabled:
+        try:
+            _image_store = ImageStore(IMAGE_STORE_DIR, IMAGE_STORE_MAX_BYTES)
+        except OSError as e:
+            _image_store_enabled = False
+            logging.getLogger(__name__).error(f"Image store disabled, cannot use {IMAGE_STORE_DIR}: {str(e)}")
+    return _image_store
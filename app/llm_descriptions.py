@@ -1,16 +1,53 @@
 import asyncio
+import hashlib
 import json
 import logging
 import os
 from typing import List, Dict, Any, Optional
-import aiohttp
+from cachetools import TTLCache
+from .llm_gateway import get_llm_gateway
+
+# Bump to invalidate cached descriptions after prompt or model changes
+DESCRIPTION_CACHE_VERSION = 2
+# Fallback per-process bound when no Redis cache is attached
+DESCRIPTION_CACHE_MAX_ENTRIES = int(os.getenv('DESCRIPTION_CACHE_MAX_ENTRIES', 5000))
+# Bound on cached descriptions in Redis (special requests are free text, so profiles are unbounded)
+DESCRIPTION_REDIS_MAX_ENTRIES = int(os.getenv('DESCRIPTION_REDIS_MAX_ENTRIES', 100000))
+DESCRIPTION_CACHE_TTL = 14 * 24 * 60 * 60
+DESCRIPTION_INDEX_KEY = f"llm_description:v{DESCRIPTION_CACHE_VERSION}:index"
+
+# Record freshly written description keys in a sorted set (server time) and delete the
+# oldest ones beyond the bound. KEYS[1]: index; ARGV: max entries, key lifetime (s), written keys.
+# Returns the number of descriptions evicted.
+TRIM_DESCRIPTIONS_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1])
+for i = 3, #ARGV do
+    redis.call('ZADD', KEYS[1], now, ARGV[i])
+end
+redis.call('ZREMRANGEBYSCORE', KEYS[1], 0, now - tonumber(ARGV[2]))
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+local excess = redis.call('ZCARD', KEYS[1]) - tonumber(ARGV[1])
+if excess <= 0 then
+    return 0
+end
+local oldest = redis.call('ZRANGE', KEYS[1], 0, excess - 1)
+redis.call('ZREMRANGEBYRANK', KEYS[1], 0, excess - 1)
+for _, key in ipairs(oldest) do
+    redis.call('DEL', key)
+end
+return #oldest
+"""
 
 class LLMDescriptionService:
     """Service to generate place descriptions using LLM instead of Google place_details"""
     
-    def __init__(self):
-        self.api_key = os.getenv('OPENAI_API_KEY')  # or your preferred LLM provider
-        self.cache = {}  # Simple in-memory cache for now
+    def __init__(self, cache=None):
+        # 💰 COST OPTIMIZATION: One cached description per place + preference profile, shared
+        # across workers through Redis (RedisCache); a bounded local TTL cache otherwise
+        self.redis_cache = cache
+        self.cache: TTLCache = TTLCache(maxsize=DESCRIPTION_CACHE_MAX_ENTRIES, ttl=DESCRIPTION_CACHE_TTL)
+        self.stats = {'requested': 0, 'cache_hits': 0, 'generated': 0, 'fallbacks': 0, 'evicted': 0}
         self.logger = logging.getLogger(__name__)
         
         # Model configuration - GPT-3.5-turbo optimized for maximum speed
@@ -21,6 +58,10 @@ class LLMDescriptionService:
             'timeout': 2            # Very short timeout for maximum speed
         }
 
+    def attach_cache(self, cache):
+        """Use a RedisCache for descriptions (set once the app's cache exists)"""
+        self.redis_cache = cache
+
     async def generate_place_descriptions(
         self, 
         places: List[Dict[str, Any]], 
@@ -29,90 +70,127 @@ class LLMDescriptionService:
         batch_size: int = 4  # Smaller batches for faster processing
     ) -> List[Dict[str, Any]]:
         """
-        Generate descriptions for multiple places in a single LLM call
+        Generate descriptions for multiple places, only asking the LLM for uncached ones
         
         Args:
             places: List of places from Google nearby_search (basic data only)
             destination: Destination city for context
             user_preferences: User preferences for personalized descriptions
-        """
         
-        # Check cache first
-        cache_key = self._get_cache_key(places, destination, user_preferences)
-        if cache_key in self.cache:
-            cached_descriptions = self.cache[cache_key]
+        Returns copies of the places, in input order, with 'description' and 'description_source' set.
+        """
+        profile = self._get_profile_key(destination, user_preferences)
+        keys = [self._get_cache_key(place, destination, profile) for place in places]
+        descriptions = await self._get_cached(keys)
+        missing = [i for i, description in enumerate(descriptions) if description is None]
+        self.stats['requested'] += len(places)
+        self.stats['cache_hits'] += len(places) - len(missing)
+
+        if missing:
+            self.logger.info(f"LLM descriptions: {len(places) - len(missing)} cached, generating {len(missing)}")
+            try:
+                generated = await self._generate_descriptions(
+                    [places[i] for i in missing], destination, user_preferences, batch_size
+                )
+            except Exception as e:
+                self.logger.error(f"LLM description generation failed: {e}")
+                generated = [None] * len(missing)
+
+            fresh = {}
+            for i, description in zip(missing, generated):
+                if description:
+                    descriptions[i] = description
+                    fresh[keys[i]] = description
+            self.stats['generated'] += len(fresh)
+            await self._store(fresh)
+        else:
             self.logger.info(f"Found cached LLM descriptions for {len(places)} places")
-            return cached_descriptions
 
-        try:
-            # 🚀 SPEED OPTIMIZATION: Process in parallel batches for faster response
-            if len(places) <= batch_size:
-                # Small batch - single API call
-                prompt = self._build_batch_prompt(places, destination, user_preferences)
-                descriptions = await self._call_llm(prompt, len(places))
-                enhanced_places = self._merge_descriptions(places, descriptions)
+        enhanced_places = []
+        for place, description in zip(places, descriptions):
+            enhanced_place = place.copy()
+            if description:
+                enhanced_place['description'] = description
+                enhanced_place['description_source'] = 'llm'
             else:
-                # Large batch - parallel processing
-                enhanced_places = await self._process_parallel_batches(
-                    places, destination, user_preferences, batch_size
-                )
-            
-            # Cache the results (simple in-memory cache)
-            self.cache[cache_key] = enhanced_places
-            
-            self.logger.info(f"Generated LLM descriptions for {len(places)} places")
-            return enhanced_places
-            
-        except Exception as e:
-            self.logger.error(f"LLM description generation failed: {e}")
-            # Fallback: return places with basic descriptions
-            return self._add_fallback_descriptions(places)
+                # Fallback: basic description (not cached, so the next request retries the LLM)
+                enhanced_place['description'] = self._generate_fallback_description(place)
+                enhanced_place['description_source'] = 'fallback'
+                self.stats['fallbacks'] += 1
+            enhanced_places.append(enhanced_place)
+        return enhanced_places
 
-    async def _process_parallel_batches(
+    async def _generate_descriptions(
         self, 
         places: List[Dict], 
         destination: str, 
         user_preferences: Optional[Dict],
         batch_size: int
-    ) -> List[Dict]:
-        """Process places in parallel batches for maximum speed"""
+    ) -> List[Optional[str]]:
+        """Describe places in parallel batches; result is aligned with places (None where missing)"""
         
-        # Split places into batches
+        # 🚀 SPEED OPTIMIZATION: Process in parallel batches for faster response
         batches = [places[i:i + batch_size] for i in range(0, len(places), batch_size)]
+        batch_results = await asyncio.gather(
+            *(self._process_single_batch(batch, destination, user_preferences) for batch in batches),
+            return_exceptions=True
+        )
         
-        # Create tasks for parallel processing
-        tasks = []
-        for batch in batches:
-            task = self._process_single_batch(batch, destination, user_preferences)
-            tasks.append(task)
-        
-        # Execute all batches in parallel
-        batch_results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        # Combine results
-        enhanced_places = []
-        for result in batch_results:
+        descriptions: List[Optional[str]] = []
+        for batch, result in zip(batches, batch_results):
             if isinstance(result, Exception):
                 self.logger.error(f"Batch processing failed: {result}")
-                continue
-            enhanced_places.extend(result)
-        
-        return enhanced_places
+                result = []
+            # Pad short answers so every place keeps its position
+            descriptions.extend((list(result) + [None] * len(batch))[:len(batch)])
+        return descriptions
 
     async def _process_single_batch(
         self, 
         batch: List[Dict], 
         destination: str, 
         user_preferences: Optional[Dict]
-    ) -> List[Dict]:
-        """Process a single batch of places"""
+    ) -> List[Optional[str]]:
+        """Process a single batch of places; result is aligned with the batch (None where not described)"""
         try:
             prompt = self._build_batch_prompt(batch, destination, user_preferences)
-            descriptions = await self._call_llm(prompt, len(batch))
-            return self._merge_descriptions(batch, descriptions)
+            described = await self._call_llm(prompt, len(batch))
+            return [described.get(number) for number in range(1, len(batch) + 1)]
         except Exception as e:
             self.logger.error(f"Single batch processing failed: {e}")
-            return self._add_fallback_descriptions(batch)
+            return []
+
+    async def _get_cached(self, keys: List[str]) -> List[Optional[str]]:
+        """Look up cached descriptions; errors count as misses"""
+        if self.redis_cache is None:
+            return [self.cache.get(key) for key in keys]
+        # Concurrent gets share Redis round trips (auto-pipelined in RedisClient)
+        results = await asyncio.gather(*(self.redis_cache.get(key) for key in keys), return_exceptions=True)
+        return [result if isinstance(result, str) else None for result in results]
+
+    async def _store(self, descriptions: Dict[str, str]):
+        if not descriptions:
+            return
+        if self.redis_cache is None:
+            self.cache.update(descriptions)
+            return
+        results = await asyncio.gather(
+            *(self.redis_cache.set(key, description, 'llm_description') for key, description in descriptions.items()),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                self.logger.warning(f"Failed to cache LLM description: {result}")
+
+        # Keep the Redis keyspace bounded: oldest descriptions go first once over the limit
+        lifetime = int(self.redis_cache.ttl['llm_description'] * (1 + self.redis_cache.stale_grace)) + 1
+        evicted = await self.redis_cache.redis_client.eval(
+            TRIM_DESCRIPTIONS_SCRIPT,
+            keys=[DESCRIPTION_INDEX_KEY],
+            args=[DESCRIPTION_REDIS_MAX_ENTRIES, lifetime, *descriptions]
+        )
+        if isinstance(evicted, int) and evicted > 0:
+            self.stats['evicted'] += evicted
 
     def _build_batch_prompt(
         self, 
@@ -141,7 +219,8 @@ class LLMDescriptionService:
             place_info += f"Reviews: {place.get('user_ratings_total', 0)})"
             place_list.append(place_info)
 
-        prompt = f"""Brief descriptions for {destination} landmarks:
+        prompt = f"""Brief descriptions for {destination} landmarks.
+{context}
 
 {chr(10).join(place_list)}
 
@@ -149,75 +228,43 @@ JSON: [{{"place_number": 1, "description": "30-word description"}}]"""
 
         return prompt
 
-    async def _call_llm(self, prompt: str, expected_count: int) -> List[str]:
-        """Make LLM API call with error handling and retries"""
-        
-        headers = {
-            'Authorization': f'Bearer {self.api_key}',
-            'Content-Type': 'application/json'
-        }
-        
-        payload = {
-            'model': self.model_config['model'],
-            'messages': [
-                {'role': 'system', 'content': 'You are a travel expert who creates engaging place descriptions.'},
-                {'role': 'user', 'content': prompt}
-            ],
-            'max_tokens': self.model_config['max_tokens'] * expected_count,
-            'temperature': self.model_config['temperature']
-        }
-        
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.post(
-                    'https://api.openai.com/v1/chat/completions',
-                    headers=headers,
-                    json=payload,
-                    timeout=self.model_config['timeout']
-                ) as response:
-                    
-                    if response.status != 200:
-                        raise Exception(f"LLM API error: {response.status}")
-                    
-                    result = await response.json()
-                    content = result['choices'][0]['message']['content']
-                    
-                    # Parse JSON response
-                    descriptions_data = json.loads(content.strip())
-                    descriptions = [item['description'] for item in descriptions_data]
-                    
-                    self.logger.info(f"LLM generated {len(descriptions)} descriptions")
-                    return descriptions
-                    
-            except Exception as e:
-                self.logger.error(f"LLM API call failed: {e}")
-                raise
+    async def _call_llm(self, prompt: str, expected_count: int) -> Dict[int, str]:
+        """Make LLM API call through the shared gateway (pooled, cached, retried).
 
-    def _merge_descriptions(self, places: List[Dict], descriptions: List[str]) -> List[Dict]:
-        """Merge LLM descriptions with original place data"""
-        enhanced_places = []
+        Returns descriptions by place_number. Raises if any entry does not map to
+        exactly one place of the batch, so a garbled answer is never cached
+        under the wrong place.
+        """
         
-        for i, place in enumerate(places):
-            enhanced_place = place.copy()
+        try:
+            response = await get_llm_gateway().complete(
+                messages=[
+                    {'role': 'system', 'content': 'You are a travel expert who creates engaging place descriptions.'},
+                    {'role': 'user', 'content': prompt}
+                ],
+                model=self.model_config['model'],
+                max_tokens=self.model_config['max_tokens'] * expected_count,
+                temperature=self.model_config['temperature'],
+                timeout=self.model_config['timeout'],
+                purpose='descriptions',
+                max_retries=1  # Short timeout call: one retry at most
+            )
             
-            if i < len(descriptions):
-                enhanced_place['description'] = descriptions[i]
-            else:
-                # Fallback description
-                enhanced_place['description'] = self._generate_fallback_description(place)
+            # Parse JSON response
+            descriptions_data = json.loads(response.content.strip())
+            descriptions = {}
+            for item in descriptions_data:
+                number = item['place_number']
+                if not isinstance(number, int) or not 1 <= number <= expected_count or number in descriptions:
+                    raise ValueError(f"place_number {number!r} does not match a place in the batch")
+                descriptions[number] = item['description']
             
-            # Add metadata
-            enhanced_place['description_source'] = 'llm'
-            enhanced_places.append(enhanced_place)
-        
-        return enhanced_places
-
-    def _add_fallback_descriptions(self, places: List[Dict]) -> List[Dict]:
-        """Add simple fallback descriptions if LLM fails"""
-        for place in places:
-            place['description'] = self._generate_fallback_description(place)
-            place['description_source'] = 'fallback'
-        return places
+            self.logger.info(f"LLM generated {len(descriptions)} descriptions")
+            return descriptions
+                
+        except Exception as e:
+            self.logger.error(f"LLM API call failed: {e}")
+            raise
 
     def _generate_fallback_description(self, place: Dict) -> str:
         """Generate simple description from place types"""
@@ -244,17 +291,35 @@ JSON: [{{"place_number": 1, "description": "30-word description"}}]"""
         desc += "."
         return desc
 
-    def _get_cache_key(self, places: List[Dict], destination: str, preferences: Optional[Dict]) -> str:
-        """Generate cache key for place descriptions"""
-        place_ids = [place.get('place_id', place.get('name', '')) for place in places]
-        key_parts = [
-            'llm_descriptions',
-            destination.lower().replace(' ', '_'),
-            '_'.join(sorted(place_ids[:5])),  # Use first 5 place IDs for key
-            str(hash(str(preferences)) if preferences else 'no_prefs')[:8]
-        ]
-        return ':'.join(key_parts)
+    @staticmethod
+    def _get_profile_key(destination: str, preferences: Optional[Dict]) -> str:
+        """Digest of everything besides the place itself that shapes a description"""
+        preferences = preferences or {}
+        profile = {
+            'destination': destination.strip().lower(),
+            'with_kids': bool(preferences.get('with_kids')),
+            'with_elderly': bool(preferences.get('with_elderly')),
+            'special_requests': (preferences.get('special_requests') or '').strip().lower()
+        }
+        return hashlib.sha256(json.dumps(profile, sort_keys=True).encode()).hexdigest()[:16]
+
+    @staticmethod
+    def _get_cache_key(place: Dict, destination: str, profile: str) -> str:
+        """Cache key for one place's description under a preference profile"""
+        place_key = place.get('place_id') or f"{destination.strip().lower()}|{place.get('name', '').strip().lower()}"
+        digest = hashlib.sha256(place_key.encode()).hexdigest()[:24]
+        return f"llm_description:v{DESCRIPTION_CACHE_VERSION}:{profile}:{digest}"
+
+    def get_stats(self) -> Dict[str, Any]:
+        requested = self.stats['requested']
+        return {
+            **self.stats,
+            'hit_rate': round(self.stats['cache_hits'] / requested, 3) if requested else 0.0,
+            'backend': 'redis' if self.redis_cache is not None else 'local',
+            'max_redis_entries': DESCRIPTION_REDIS_MAX_ENTRIES,
+            'local_entries': len(self.cache)
+        }
 
     async def close(self):
         """Close connections"""
-        self.cache.clear() 
\ No newline at end of file
+        self.cache.clear()
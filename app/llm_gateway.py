@@ -0,0 +1,343 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import httpx
+import openai
+
+from .deadline import budget_timeout, expired, remaining
+
+Messages = List[Dict[str, str]]
+Usage = Dict[str, int]
+
+# Bump when the request format sent to the backend changes so old completions are ignored
+LLM_CACHE_VERSION = 1
+
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', 16))
+LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', 2))
+RETRY_BASE_BACKOFF = 0.25  # seconds, doubled per attempt
+RETRY_MAX_BACKOFF = 2.0
+
+
+class LLMResponse(NamedTuple):
+    content: str
+    usage: Usage  # prompt_tokens / completion_tokens / total_tokens
+    model: str
+    cached: bool
+    latency_ms: float
+
+
+class RetryableLLMError(Exception):
+    """Transient backend failure worth retrying (timeouts, rate limits, 5xx)"""
+
+
+def _usage(prompt_tokens: int = 0, completion_tokens: int = 0) -> Usage:
+    return {
+        'prompt_tokens': prompt_tokens,
+        'completion_tokens': completion_tokens,
+        'total_tokens': prompt_tokens + completion_tokens
+    }
+
+
+class OpenAIBackend:
+    """OpenAI chat completions over one pooled keep-alive HTTP client"""
+
+    name = 'openai'
+    _RETRYABLE = (openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+
+    def __init__(self, max_connections: int = LLM_MAX_CONCURRENCY):
+        self.client = openai.AsyncOpenAI(
+            api_key=os.getenv('OPENAI_API_KEY'),
+            max_retries=0,  # The gateway retries with jitter and deadline awareness
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+                timeout=30.0
+            ),
+            **({"base_url": os.getenv("OPENAI_BASE_URL")} if os.getenv("OPENAI_BASE_URL") else {})
+        )
+
+    async def complete(self, request: Dict[str, Any], timeout: float, purpose: str) -> Tuple[str, Usage]:
+        try:
+            response = await self.client.chat.completions.create(**request, timeout=timeout)
+        except self._RETRYABLE as e:
+            raise RetryableLLMError(str(e)) from e
+        usage = response.usage
+        return (
+            response.choices[0].message.content or "",
+            _usage(usage.prompt_tokens, usage.completion_tokens) if usage else _usage()
+        )
+
+    async def stream(self, request: Dict[str, Any], timeout: float, purpose: str) -> AsyncIterator[Tuple[str, Optional[Usage]]]:
+        try:
+            response = await self.client.chat.completions.create(
+                **request, stream=True, stream_options={"include_usage": True}, timeout=timeout
+            )
+        except self._RETRYABLE as e:
+            raise RetryableLLMError(str(e)) from e
+        async for chunk in response:
+            text = chunk.choices[0].delta.content if chunk.choices else None
+            usage = _usage(chunk.usage.prompt_tokens, chunk.usage.completion_tokens) if chunk.usage else None
+            yield text or "", usage
+
+    async def close(self):
+        await self.client.close()
+
+
+def _stub_itinerary(prompt: str) -> str:
+    """Schedule the prompt's selected attractions, three hours apart from 09:00"""
+    section = prompt.split('SELECTED ATTRACTIONS', 1)[-1].split('REQUIREMENTS:', 1)[0]
+    days: List[Dict[str, Any]] = []
+    for line in section.splitlines():
+        line = line.strip()
+        day_match = re.match(r'^Day (\d+):$', line)
+        item_match = re.match(r'^- (.+) \((\w+)\)$', line)
+        if day_match:
+            days.append({"day": int(day_match.group(1)), "blocks": []})
+        elif item_match and days:
+            hour = 9 + 3 * len(days[-1]["blocks"])
+            days[-1]["blocks"].append({
+                "type": "landmark",
+                "name": item_match.group(1),
+                "start_time": f"{hour:02d}:00",
+                "duration": "2h"
+            })
+    return json.dumps({"itinerary": days})
+
+
+def _stub_descriptions(prompt: str) -> str:
+    names = re.findall(r'^(\d+)\. (.+?) \(Rating', prompt, flags=re.MULTILINE)
+    return json.dumps([
+        {"place_number": int(number), "description": f"{name} is a well-loved local highlight worth the visit."}
+        for number, name in names
+    ])
+
+
+def _stub_preferences(prompt: str) -> str:
+    return json.dumps({"keywords": [], "cuisine_types": [], "accessibility": []})
+
+
+class StubBackend:
+    """Deterministic offline backend for tests and benchmarks.
+
+    Answers come from per-purpose responders (prompt text -> completion text);
+    the built-in ones produce valid itinerary, description and preference JSON.
+    Every call takes `latency` seconds and reports ~4 characters per token.
+    """
+
+    name = 'stub'
+
+    def __init__(self, latency: Optional[float] = None, responders: Optional[Dict[str, Callable[[str], str]]] = None):
+        self.latency = latency if latency is not None else float(os.getenv('LLM_STUB_LATENCY_MS', 50)) / 1000
+        self.responders = {
+            'itinerary': _stub_itinerary,
+            'itinerary_backup': _stub_itinerary,
+            'descriptions': _stub_descriptions,
+            'preferences': _stub_preferences,
+            **(responders or {})
+        }
+        self.calls = 0
+
+    def _respond(self, request: Dict[str, Any], purpose: str) -> Tuple[str, Usage]:
+        self.calls += 1
+        prompt = request['messages'][-1]['content']
+        responder = self.responders.get(purpose)
+        content = responder(prompt) if responder else f"stub:{hashlib.sha256(prompt.encode()).hexdigest()[:16]}"
+        prompt_chars = sum(len(m['content']) for m in request['messages'])
+        return content, _usage(prompt_chars // 4, len(content) // 4)
+
+    async def complete(self, request: Dict[str, Any], timeout: float, purpose: str) -> Tuple[str, Usage]:
+        await asyncio.sleep(self.latency)
+        return self._respond(request, purpose)
+
+    async def stream(self, request: Dict[str, Any], timeout: float, purpose: str) -> AsyncIterator[Tuple[str, Optional[Usage]]]:
+        content, usage = self._respond(request, purpose)
+        pieces = [content[i:i + 64] for i in range(0, len(content), 64)] or [""]
+        for piece in pieces:
+            await asyncio.sleep(self.latency / len(pieces))
+            yield piece, None
+        yield "", usage
+
+    async def close(self):
+        pass
+
+
+def _default_backend():
+    if os.getenv('LLM_BACKEND', 'openai').lower() == 'stub':
+        return StubBackend()
+    return OpenAIBackend()
+
+
+class LLMGateway:
+    """Single async entry point for every LLM call in the app.
+
+    Provides one pooled backend client, a global concurrency limit, retries with
+    full jitter for transient failures (never past the request deadline), token
+    and latency accounting per purpose, and a content-addressed completion cache
+    in Redis (key = hash of model, messages and sampling parameters).
+    """
+
+    def __init__(self, backend=None, cache=None, max_concurrency: int = LLM_MAX_CONCURRENCY, max_retries: int = LLM_MAX_RETRIES):
+        self.backend = backend or _default_backend()
+        self.cache = cache
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self.logger = logging.getLogger(__name__)
+        self.stats: Dict[str, Dict[str, Any]] = {}
+
+    def attach_cache(self, cache):
+        """Use a RedisCache for completions (set once the app's cache exists)"""
+        self.cache = cache
+
+    @staticmethod
+    def cache_key(request: Dict[str, Any]) -> str:
+        digest = hashlib.sha256(json.dumps(request, sort_keys=True).encode()).hexdigest()
+        return f"llm:v{LLM_CACHE_VERSION}:{digest}"
+
+    def _stats_for(self, purpose: str) -> Dict[str, Any]:
+        return self.stats.setdefault(purpose, {
+            'calls': 0, 'cache_hits': 0, 'errors': 0, 'retries': 0,
+            'prompt_tokens': 0, 'completion_tokens': 0,
+            'total_latency_ms': 0.0, 'max_latency_ms': 0.0
+        })
+
+    def _account(self, purpose: str, model: str, usage: Usage, latency_ms: float):
+        stats = self._stats_for(purpose)
+        stats['calls'] += 1
+        stats['prompt_tokens'] += usage.get('prompt_tokens', 0)
+        stats['completion_tokens'] += usage.get('completion_tokens', 0)
+        stats['total_latency_ms'] += latency_ms
+        stats['max_latency_ms'] = max(stats['max_latency_ms'], latency_ms)
+        self.logger.info(
+            f"LLM {purpose} ({model}): {latency_ms:.0f}ms, "
+            f"{usage.get('prompt_tokens', 0)} prompt + {usage.get('completion_tokens', 0)} completion tokens"
+        )
+
+    def _request(self, messages: Messages, model: str, max_tokens: int, temperature: float) -> Dict[str, Any]:
+        return {'model': model, 'messages': messages, 'max_tokens': max_tokens, 'temperature': temperature}
+
+    async def complete(
+        self,
+        messages: Messages,
+        model: str,
+        max_tokens: int,
+        temperature: float = 0.3,
+        timeout: float = 30.0,
+        purpose: str = 'default',
+        use_cache: bool = True,
+        max_retries: Optional[int] = None
+    ) -> LLMResponse:
+        """One chat completion; served from the completion cache when possible"""
+        request = self._request(messages, model, max_tokens, temperature)
+        key = self.cache_key(request) if use_cache and self.cache else None
+        if key:
+            # 💰 COST OPTIMIZATION: Identical requests from any worker reuse the stored completion
+            cached = await self.cache.get(key)
+            if cached:
+                self._stats_for(purpose)['cache_hits'] += 1
+                return LLMResponse(cached['content'], _usage(), model, True, 0.0)
+
+        started = time.perf_counter()
+        retries = self.max_retries if max_retries is None else max_retries
+        attempt = 0
+        while True:
+            try:
+                async with self._slot():
+                    content, usage = await asyncio.wait_for(
+                        self.backend.complete(request, budget_timeout(timeout), purpose),
+                        timeout=budget_timeout(timeout)
+                    )
+                break
+            except (RetryableLLMError, asyncio.TimeoutError) as e:
+                backoff = random.uniform(0, min(RETRY_MAX_BACKOFF, RETRY_BASE_BACKOFF * 2 ** attempt))
+                left = remaining()
+                if attempt >= retries or expired() or (left is not None and left <= backoff):
+                    self._stats_for(purpose)['errors'] += 1
+                    raise
+                attempt += 1
+                self._stats_for(purpose)['retries'] += 1
+                self.logger.warning(f"LLM {purpose} attempt {attempt} failed ({e!r}), retrying in {backoff:.2f}s")
+                await asyncio.sleep(backoff)
+            except Exception:
+                self._stats_for(purpose)['errors'] += 1
+                raise
+
+        latency_ms = (time.perf_counter() - started) * 1000
+        self._account(purpose, model, usage, latency_ms)
+        if key and not expired():
+            await self.cache.set(key, {'content': content}, 'llm')
+        return LLMResponse(content, usage, model, False, latency_ms)
+
+    async def stream(
+        self,
+        messages: Messages,
+        model: str,
+        max_tokens: int,
+        temperature: float = 0.3,
+        timeout: float = 30.0,
+        purpose: str = 'default'
+    ) -> AsyncIterator[Tuple[str, Optional[Usage]]]:
+        """Streamed completion: yields (text delta, None) and finally ("", usage).
+
+        Not cached or retried; callers that need a second chance hedge instead.
+        """
+        request = self._request(messages, model, max_tokens, temperature)
+        started = time.perf_counter()
+        usage = _usage()
+        try:
+            async with self._slot():
+                async for text, chunk_usage in self.backend.stream(request, budget_timeout(timeout), purpose):
+                    if chunk_usage:
+                        usage = chunk_usage
+                    yield text, chunk_usage
+        except Exception:
+            self._stats_for(purpose)['errors'] += 1
+            raise
+        self._account(purpose, model, usage, (time.perf_counter() - started) * 1000)
+
+    @asynccontextmanager
+    async def _slot(self):
+        """Hold one of the global concurrency slots"""
+        async with self._semaphore:
+            self.in_flight += 1
+            try:
+                yield
+            finally:
+                self.in_flight -= 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'backend': self.backend.name,
+            'max_concurrency': self.max_concurrency,
+            'in_flight': self.in_flight,
+            'purposes': {
+                purpose: {
+                    **{k: v for k, v in s.items() if k != 'total_latency_ms'},
+                    'max_latency_ms': round(s['max_latency_ms'], 1),
+                    'avg_latency_ms': round(s['total_latency_ms'] / s['calls'], 1) if s['calls'] else 0.0
+                }
+                for purpose, s in self.stats.items()
+            }
+        }
+
+    async def close(self):
+        await self.backend.close()
+
+
+_gateway: Optional[LLMGateway] = None
+
+
+def get_llm_gateway() -> LLMGateway:
+    """Process-wide gateway, created on first use"""
+    global _gateway
+    if _gateway is None:
+        _gateway = LLMGateway()
+    return _gateway
@@ -0,0 +1,104 @@
+import os
+import time
+import logging
+from typing import Any, Dict, NamedTuple, Optional
+from cachetools import TLRUCache
+
+class _LocalEntry(NamedTuple):
+    value: Any
+    ttl: int
+    size: int
+
+class _CountingTLRUCache(TLRUCache):
+    """TLRUCache that counts capacity evictions (expired items are not counted)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.evictions = 0
+
+    def popitem(self):
+        item = super().popitem()
+        self.evictions += 1
+        return item
+
+class LocalCache:
+    """Bounded in-process TTL-LRU cache used as the first tier in front of Redis.
+
+    Capacity is measured in bytes (the encoded size of each value as stored in Redis)
+    and each entry expires according to the same TTL table RedisCache uses, or
+    earlier when the copy it came from expires sooner in Redis.
+    Values are kept as decoded Python objects and shared between callers, so
+    callers must treat them as read-only.
+    """
+
+    def __init__(
+        self,
+        ttl: Dict[str, int],
+        max_bytes: Optional[int] = None,
+        max_item_bytes: Optional[int] = None,
+        default_ttl: int = 3600
+    ):
+        self.ttl = ttl
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes or int(os.getenv('LOCAL_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+        # Single huge values (e.g. large images) would otherwise flush the whole tier
+        self.max_item_bytes = max_item_bytes or max(1, self.max_bytes // 16)
+        self._cache = _CountingTLRUCache(
+            maxsize=self.max_bytes,
+            ttu=lambda _key, entry, now: now + entry.ttl,
+            getsizeof=lambda entry: entry.size
+        )
+        self.hits = 0
+        self.misses = 0
+        self.logger = logging.getLogger(__name__)
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._cache.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry.value
+
+    def set(self, key: str, value: Any, ttl_type: str, size: int, expires_at: Optional[float] = None):
+        """Store a decoded value; size is its encoded byte length.
+
+        `expires_at` (epoch seconds) caps the local TTL, so a value read back from
+        Redis never outlives the key it was read from.
+        """
+        if size > self.max_item_bytes:
+            self.logger.debug(f"Local cache: skipping {key} ({size} bytes exceeds per-item limit)")
+            return
+        ttl = self.ttl.get(ttl_type, self.default_ttl)
+        if expires_at is not None:
+            ttl = min(ttl, expires_at - time.time())
+            if ttl <= 0:
+                return
+        self._cache[key] = _LocalEntry(value, ttl, max(1, size))
+
+    def invalidate(self, key: str) -> bool:
+        """Drop a single key from this worker's tier"""
+        return self._cache.pop(key, None) is not None
+
+    def invalidate_prefix(self, prefix: str) -> int:
+        """Drop every key starting with prefix (e.g. 'places:destination:32.72,-117.16')"""
+        keys = [key for key in list(self._cache.keys()) if key.startswith(prefix)]
+        for key in keys:
+            self._cache.pop(key, None)
+        return len(keys)
+
+    def clear(self):
+        self._cache.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        self._cache.expire()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'evictions': self._cache.evictions,
+            'entries': len(self._cache),
+            'bytes': self._cache.currsize,
+            'max_bytes': self.max_bytes
+        }
@@ -9,17 +9,26 @@ from dotenv import load_dotenv
 # Load environment variables first
 load_dotenv()
 
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import Response
 from pydantic import BaseModel, field_validator, model_validator
 import aiohttp
 
-from .complete_itinerary import complete_itinerary_from_selection
+from .complete_itinerary import complete_itinerary_from_selection, stream_complete_itinerary, itinerary_llm_hedge, get_llm_description_service
+from .llm_gateway import get_llm_gateway
 from .schema import LandmarkSelection, StructuredItinerary, StructuredDayPlan, ItineraryBlock, Location, CompleteItineraryResponse
 from .recommendations import RecommendationGenerator
+from .streaming import event_stream_response
+from .image_proxy import (
+    cached_image_response, etag_matches, image_etag, not_modified_response, schedule_store,
+    stored_image_response, stream_upstream_image, get_stats as get_image_proxy_stats
+)
+from .image_store import get_image_store, image_ref_key
 from .places_client import GooglePlacesClient
 from .redis_client import redis_client
+from .travel_estimator import travel_estimator
+from .deadline import budget_timeout, deadline_for_path, deadline_scope
 from decorators.rate_limit import rate_limit
 
 # Configure logging
@@ -40,6 +49,11 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
         client_session = aiohttp.ClientSession()
         places_client = GooglePlacesClient(session=client_session, redis_client=redis_client)
         recommendation_generator = RecommendationGenerator(places_client=places_client)
+        # 💰 COST OPTIMIZATION: LLM completions are cached in the same Redis as Places data
+        get_llm_gateway().attach_cache(places_client.cache)
+        (await get_llm_description_service()).attach_cache(places_client.cache)
+        image_store = get_image_store()
+        logging.info(f"Application lifespan: image store {'at ' + image_store.root if image_store else 'disabled'}.")
         
         app_state["client_session"] = client_session
         app_state["places_client"] = places_client
@@ -60,6 +74,12 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
             except Exception as e:
                 logging.exception("Application lifespan: Error closing GooglePlacesClient.")
         
+        try:
+            await get_llm_gateway().close()
+            logging.info("Application lifespan: LLM gateway closed.")
+        except Exception as e:
+            logging.exception("Application lifespan: Error closing LLM gateway.")
+        
         if "redis_client" in app_state and app_state["redis_client"]:
             # Close Redis client
             try:
@@ -122,6 +142,12 @@ env_origins = os.getenv("ALLOWED_ORIGINS", "https://tripaibuddy.app")
 if env_origins:
     allowed_origins.extend(env_origins.split(","))
 
+@app.middleware("http")
+async def request_deadline(request: Request, call_next):
+    """Give every request an overall time budget that sub-calls derive their timeouts from"""
+    with deadline_scope(deadline_for_path(request.url.path)):
+        return await call_next(request)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=allowed_origins,
@@ -217,17 +243,20 @@ async def _convert_to_structured_itinerary(
             
             # Create time schedule
             current_time = 8 * 60 + 30  # Start at 8:30 AM
+            previous_stop = None
             
             # Add breakfast
             if day_restaurants:
                 restaurant = day_restaurants[0]
                 blocks.append(_create_restaurant_block(restaurant, current_time, "breakfast"))
+                previous_stop = restaurant
                 current_time += 45  # 45 minutes for breakfast
             
             # Add morning landmarks
             morning_landmarks = day_landmarks[:len(day_landmarks)//2] if len(day_landmarks) > 1 else day_landmarks[:1]
             for landmark in morning_landmarks:
-                current_time += 30  # Travel time
+                current_time += _estimated_travel_minutes(previous_stop, landmark)
+                previous_stop = landmark
                 blocks.append(_create_landmark_block(landmark, current_time))
                 current_time += 120  # 2 hours for landmark
             
@@ -235,12 +264,14 @@ async def _convert_to_structured_itinerary(
             if len(day_restaurants) > 1:
                 restaurant = day_restaurants[1]
                 blocks.append(_create_restaurant_block(restaurant, current_time, "lunch"))
+                previous_stop = restaurant
                 current_time += 60  # 1 hour for lunch
             
             # Add afternoon landmarks
             afternoon_landmarks = day_landmarks[len(day_landmarks)//2:] if len(day_landmarks) > 1 else []
             for landmark in afternoon_landmarks:
-                current_time += 30  # Travel time
+                current_time += _estimated_travel_minutes(previous_stop, landmark)
+                previous_stop = landmark
                 blocks.append(_create_landmark_block(landmark, current_time))
                 current_time += 120  # 2 hours for landmark
             
@@ -305,17 +336,20 @@ async def _convert_to_structured_itinerary_fast(
             
             # Create time schedule
             current_time = 8 * 60 + 30  # Start at 8:30 AM
+            previous_stop = None
             
             # Add breakfast
             if day_restaurants:
                 restaurant = day_restaurants[0]
                 blocks.append(_create_restaurant_block_fast(restaurant, current_time, "breakfast"))
+                previous_stop = restaurant
                 current_time += 45  # 45 minutes for breakfast
             
             # Add morning landmarks
             morning_landmarks = day_landmarks[:len(day_landmarks)//2] if len(day_landmarks) > 1 else day_landmarks[:1]
             for landmark in morning_landmarks:
-                current_time += 30  # Travel time
+                current_time += _estimated_travel_minutes(previous_stop, landmark)
+                previous_stop = landmark
                 blocks.append(_create_landmark_block_fast(landmark, current_time))
                 current_time += 120  # 2 hours for landmark
             
@@ -323,12 +357,14 @@ async def _convert_to_structured_itinerary_fast(
             if len(day_restaurants) > 1:
                 restaurant = day_restaurants[1]
                 blocks.append(_create_restaurant_block_fast(restaurant, current_time, "lunch"))
+                previous_stop = restaurant
                 current_time += 60  # 1 hour for lunch
             
             # Add afternoon landmarks
             afternoon_landmarks = day_landmarks[len(day_landmarks)//2:] if len(day_landmarks) > 1 else []
             for landmark in afternoon_landmarks:
-                current_time += 30  # Travel time
+                current_time += _estimated_travel_minutes(previous_stop, landmark)
+                previous_stop = landmark
                 blocks.append(_create_landmark_block_fast(landmark, current_time))
                 current_time += 120  # 2 hours for landmark
             
@@ -410,6 +446,16 @@ def _create_restaurant_block(restaurant: Dict[str, Any], start_time_minutes: int
         website=restaurant.get('website')
     )
 
+def _estimated_travel_minutes(previous_stop: Optional[Dict[str, Any]], next_stop: Dict[str, Any]) -> int:
+    """Estimated drive between two stops rounded up to 5 minutes (10-60), 30 if either location is unknown"""
+    prev_loc = (previous_stop or {}).get('location')
+    next_loc = next_stop.get('location')
+    if not (isinstance(prev_loc, dict) and isinstance(next_loc, dict)
+            and 'lat' in prev_loc and 'lng' in prev_loc and 'lat' in next_loc and 'lng' in next_loc):
+        return 30
+    minutes = travel_estimator.estimate_minutes(prev_loc, next_loc, mode="DRIVE")
+    return min(60, max(10, -(-minutes // 5) * 5))
+
 def _create_landmark_block_fast(landmark: Dict[str, Any], start_time_minutes: int) -> ItineraryBlock:
     """Create a landmark block from landmark data - FAST VERSION"""
     location = None
@@ -545,9 +591,34 @@ async def generate(request: ItineraryRequest):
         logging.exception("Error during /generate")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/generate/stream")
+@rate_limit(endpoint="generate", limit=50)
+async def generate_stream(request: ItineraryRequest, http_request: Request):
+    """Streaming /generate: each search's places are sent as soon as that search completes.
+
+    NDJSON by default, Server-Sent Events when the client sends Accept: text/event-stream.
+    The last event is a "summary" with the same recommendations shape as /generate.
+    """
+    logging.info(f"🎯 Generate stream called for destination: {request.destination}")
+    recommendation_generator = app_state["recommendation_generator"]
+    events = recommendation_generator.stream_recommendations(
+        destination=request.destination,
+        travel_days=request.travel_days,
+        with_kids=request.with_kids,
+        kids_age=request.kids_age,
+        with_elderly=request.with_elderly,
+        special_requests=request.special_requests,
+        start_date=request.start_date,
+        end_date=request.end_date
+    )
+    return event_stream_response(events, accept=http_request.headers.get("accept"))
+
 @app.post("/complete-itinerary", response_model=CompleteItineraryResponse)
 @rate_limit(endpoint="complete_itinerary", limit=50)
-async def complete_itinerary(data: LandmarkSelection):
+async def complete_itinerary(
+    data: LandmarkSelection,
+    refresh: bool = Query(False, description="Bypass the shared itinerary cache and regenerate")
+):
     try:
         logging.info(f"Received complete-itinerary request: {data.model_dump()}")
         
@@ -556,7 +627,7 @@ async def complete_itinerary(data: LandmarkSelection):
         
         # Use the single LLM call approach from complete_itinerary.py
         logging.info("🚀 Using Single LLM Call System (complete_itinerary.py)")
-        result = await complete_itinerary_from_selection(data, places_client)
+        result = await complete_itinerary_from_selection(data, places_client, bypass_cache=refresh)
         
         logging.info(f"Complete itinerary result: {result}")
         
@@ -583,11 +654,104 @@ async def complete_itinerary(data: LandmarkSelection):
         logging.exception(f"Error in complete-itinerary endpoint: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to complete itinerary: {str(e)}")
 
+@app.post("/complete-itinerary/stream")
+@rate_limit(endpoint="complete_itinerary", limit=50)
+async def complete_itinerary_stream(
+    data: LandmarkSelection,
+    http_request: Request,
+    refresh: bool = Query(False, description="Bypass the shared itinerary cache and regenerate")
+):
+    """Progressive /complete-itinerary: skeleton, per-day restaurants, landmark
+    enrichments and stage timings are sent as they finish, then a "complete"
+    event with the regular response body. SSE when requested via Accept, NDJSON otherwise.
+    """
+    logging.info(f"Received complete-itinerary stream request for {data.details.destination}")
+    places_client = app_state.get("places_client")
+    events = stream_complete_itinerary(data, places_client, bypass_cache=refresh)
+    return event_stream_response(events, accept=http_request.headers.get("accept"))
+
+async def serve_image(
+    request: Request,
+    places_client: GooglePlacesClient,
+    session: aiohttp.ClientSession,
+    cache_key: str,
+    photoreference: str,
+    maxwidth: int,
+    maxheight: Optional[int],
+    cache_control: str
+) -> Response:
+    """Serve a Places photo: 304 on a matching ETag, this instance's disk image store (zero-copy
+    file response), cached bytes in Redis (with Range support), or the upstream image streamed
+    to the client while it is teed into the caches."""
+    etag = image_etag(cache_key)
+    # 🚀 SPEED OPTIMIZATION: Revalidation needs neither the cache nor Google
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified_response(etag, cache_control)
+
+    image_store = get_image_store()
+
+    async def save_to_disk(image: bytes, content_type: str):
+        digest = await image_store.put(image)
+        await places_client.cache.set(
+            image_ref_key(cache_key), {'digest': digest, 'size': len(image), 'content_type': content_type}, 'image_ref'
+        )
+
+    async def save_image(image: bytes, content_type: str):
+        # Redis keeps the bytes for every instance; the disk store is only this instance's copy
+        await places_client.cache.set(cache_key, image, 'image_proxy')
+        if image_store is not None:
+            await save_to_disk(image, content_type)
+
+    try:
+        ref = None
+        if image_store is not None:
+            ref = await asyncio.wait_for(
+                places_client.cache.get(image_ref_key(cache_key)),
+                timeout=budget_timeout(1.0)
+            )
+            blob = image_store.lookup(ref['digest']) if ref else None
+            if blob:
+                path, stat = blob
+                return stored_image_response(path, stat, etag, cache_control, ref.get('content_type', 'image/jpeg'))
+        # Try to get from cache with a short timeout
+        cached_image = await asyncio.wait_for(
+            places_client.cache.get_swr(
+                cache_key,
+                refresh=lambda: places_client.fetch_photo(cache_key, photoreference, maxwidth, maxheight)
+            ),
+            timeout=budget_timeout(1.0)  # 1 second timeout for cache
+        )
+        if cached_image:
+            if image_store is not None:
+                # Written by another instance (or evicted here): keep a local copy for next time
+                schedule_store(save_to_disk, cached_image, ref.get('content_type', 'image/jpeg') if ref else 'image/jpeg')
+            return cached_image_response(
+                cached_image, etag, cache_control,
+                range_header=request.headers.get("range"),
+                if_range=request.headers.get("if-range")
+            )
+    except (asyncio.TimeoutError, Exception) as e:
+        logging.warning(f"Image proxy: Cache error for {photoreference}: {str(e)}")
+        # Continue to Google API if cache fails
+
+    if not await places_client.rate_limits['photos'].acquire():
+        raise HTTPException(status_code=429, detail="Image proxy is busy, please retry")
+
+    params = {
+        "maxwidth": str(maxwidth),
+        "photoreference": photoreference,
+        "key": places_client.api_key  # API key used internally, not logged
+    }
+    if maxheight:
+        params["maxheight"] = str(maxheight)
+
+    return await stream_upstream_image(session, params, etag, cache_control, store=save_image, timeout=budget_timeout(3))
+
 @app.get("/api/v1/image_proxy")
-async def image_proxy(photoreference: str, maxwidth: int = 800, maxheight: Optional[int] = None):
+async def image_proxy(request: Request, photoreference: str, maxwidth: int = 800, maxheight: Optional[int] = None):
     """
     Proxies requests to the Google Places Photo API.
-    Caches results in Redis.
+    Caches results in Redis; supports ETag revalidation and byte ranges.
     """
     if "places_client" not in app_state or not app_state["places_client"] or \
        "client_session" not in app_state or not app_state["client_session"]:
@@ -609,69 +773,12 @@ async def image_proxy(photoreference: str, maxwidth: int = 800, maxheight: Optio
     cache_key = places_client.cache.get_key('image_proxy', **cache_key_params)
     
     try:
-        # Try to get from cache with a short timeout
-        try:
-            cached_image = await asyncio.wait_for(
-                places_client.cache.get(cache_key),
-                timeout=1.0  # 1 second timeout for cache
-            )
-            if cached_image:
-                return Response(
-                    content=cached_image,
-                    media_type="image/jpeg",
-                    headers={
-                        "Cache-Control": "public, max-age=604800",  # 1 week cache
-                        "X-Cache": "HIT"
-                    }
-                )
-        except (asyncio.TimeoutError, Exception) as e:
-            logging.warning(f"Image proxy: Cache error for {photoreference}: {str(e)}")
-            # Continue to Google API if cache fails
-
-        # Fetch from Google with a reasonable timeout
-        google_photo_url = "https://maps.googleapis.com/maps/api/place/photo"
-        params = {
-            "maxwidth": str(maxwidth),
-            "photoreference": photoreference,
-            "key": places_client.api_key  # API key used internally, not logged
-        }
-        if maxheight:
-            params["maxheight"] = str(maxheight)
-
-        async with client_session.get(google_photo_url, params=params, timeout=3) as res:
-            if res.status == 200:
-                img_data = await res.read()
-                content_type = res.headers.get("Content-Type", "image/jpeg")
-                
-                # Only cache if we got valid image data
-                if len(img_data) > 100:  # Basic check for valid image data
-                    try:
-                        # Try to cache but don't wait too long
-                        await asyncio.wait_for(
-                            places_client.cache.set(cache_key, img_data, 'image_proxy'),
-                            timeout=1.0  # 1 second timeout for cache set
-                        )
-                    except (asyncio.TimeoutError, Exception) as e_cache:
-                        logging.warning(f"Image proxy: Cache set error: {e_cache}")
-                        # Continue without caching if it fails
-                
-                return Response(
-                    content=img_data,
-                    media_type=content_type,
-                    headers={
-                        "Cache-Control": "public, max-age=604800",  # 1 week cache
-                        "Content-Type": content_type,
-                        "X-Cache": "MISS"
-                    }
-                )
-            else:
-                error_text = await res.text()
-                logging.error(f"Image proxy: Google Places Photo API failed. Status: {res.status}")
-                raise HTTPException(
-                    status_code=res.status if res.status >= 400 else 500,
-                    detail="Failed to fetch image from provider"
-                )
-
+        return await serve_image(
+            request, places_client, client_session, cache_key, photoreference, maxwidth, maxheight,
+            cache_control="public, max-age=604800"  # 1 week cache
+        )
+    except HTTPException:
+        raise
     except aiohttp.ClientError as e_aiohttp:
         logging.error(f"Image proxy: Network error: {e_aiohttp}")
         raise HTTPException(status_code=504, detail="Network error while fetching image")
@@ -687,6 +794,33 @@ async def health_check():
     """Health check endpoint for GCP"""
     return {"status": "healthy"}
 
+@app.get("/api/v1/metrics")
+async def metrics():
+    """Cache and upstream-call statistics for this worker"""
+    places_client = app_state.get("places_client")
+    if not places_client:
+        raise HTTPException(status_code=503, detail="Places client not available")
+    recommendation_generator = app_state.get("recommendation_generator")
+    return {
+        "single_flight": places_client.single_flight.get_stats(),
+        "local_cache": places_client.cache.local.get_stats(),
+        "redis_pipeline": dict(redis_client.pipeline_stats),
+        "rate_limits": {name: bucket.get_stats() for name, bucket in places_client.rate_limits.items()},
+        "travel_estimator": places_client.travel_estimator.get_stats(),
+        "place_index": places_client.place_index.get_stats(),
+        "place_details_cache": dict(places_client.details_cache_stats),
+        "deadlines": dict(places_client.deadline_stats),
+        "stale_while_revalidate": places_client.cache.get_swr_stats(),
+        "cache_codec": places_client.cache.codec.describe(),
+        "recommendation_stages": recommendation_generator.stage_stats.get_stats() if recommendation_generator else None,
+        "preferences": recommendation_generator.preferences_parser.get_stats() if recommendation_generator else None,
+        "llm_hedging": itinerary_llm_hedge.get_stats(),
+        "llm_gateway": get_llm_gateway().get_stats(),
+        "llm_descriptions": (await get_llm_description_service()).get_stats(),
+        "image_proxy": get_image_proxy_stats(),
+        "image_store": get_image_store().get_stats() if get_image_store() else None
+    }
+
 @app.get("/")
 async def home():
     return {
@@ -696,27 +830,22 @@ async def home():
     }
 
 @app.get("/photo-proxy/{photo_reference}")
-async def photo_proxy(photo_reference: str, maxwidth: int = 400, maxheight: int = 400):
+async def photo_proxy(request: Request, photo_reference: str, maxwidth: int = 400, maxheight: int = 400):
     """Proxy Google Places photos with caching"""
     try:
         places_client = app_state.get("places_client")
         if not places_client:
             raise HTTPException(status_code=500, detail="Places client not available")
-            
-        photo_data = await places_client.get_photo_data(photo_reference, maxwidth, maxheight)
-        
-        if not photo_data:
-            raise HTTPException(status_code=404, detail="Photo not found")
-            
-        # Return the image with appropriate headers
-        return Response(
-            content=photo_data,
-            media_type="image/jpeg",
-            headers={
-                "Cache-Control": "public, max-age=86400",  # Cache for 24 hours
-                "Content-Length": str(len(photo_data))
-            }
+
+        cache_key = places_client.cache.get_key(
+            'image_proxy', photoreference=photo_reference, maxwidth=maxwidth, maxheight=maxheight
         )
+        return await serve_image(
+            request, places_client, await places_client.get_session(), cache_key, photo_reference, maxwidth, maxheight,
+            cache_control="public, max-age=86400"  # Cache for 24 hours
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         logging.exception(f"Error in photo proxy: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error fetching photo: {str(e)}")
@@ -0,0 +1,175 @@
+import copy
+import math
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from cachetools import TTLCache
+
+# Nearby Search returns at most 20 results per page; a full page means we only saw
+# the most prominent places, whatever the radius, so it proves no coverage
+NEARBY_PAGE_SIZE = 20
+
+def _distance_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * 6371008.8 * math.asin(math.sqrt(min(1.0, a)))
+
+class PlaceIndex:
+    """In-process spatial index of every place returned by Nearby Search.
+
+    Places are bucketed into fixed lat/lng grid cells (~1km) per place type. A
+    cell is marked covered for a type once a (non-keyword) search whose circle
+    contains the cell centre came back without being truncated. Radius+type queries are
+    answered locally when enough of their cells are covered. Places are copied in and
+    out, so callers may annotate results without touching the index. Keyword queries always
+    go to the API: Google matches keywords against more than names, so a local name
+    match can't stand in for its result set.
+    """
+
+    def __init__(
+        self,
+        cell_degrees: float = 0.01,
+        min_coverage: float = 0.8,
+        min_results: int = 5,
+        ttl: int = 48 * 60 * 60,
+        max_cells: int = 20000
+    ):
+        self.cell_degrees = cell_degrees
+        self.min_coverage = min_coverage
+        self.min_results = min_results
+        # (place_type, cell) -> {'places': {place_id: place}, 'covered': bool}
+        self._cells: TTLCache = TTLCache(maxsize=max_cells, ttl=ttl)
+        self.logger = logging.getLogger(__name__)
+        self.stats = {'queries': 0, 'local_hits': 0, 'misses': 0, 'indexed_searches': 0}
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        return (math.floor(lat / self.cell_degrees), math.floor(lng / self.cell_degrees))
+
+    def _cells_in_circle(self, location: Dict[str, float], radius: int, intersecting: bool) -> List[Tuple[int, int]]:
+        """Cells touching the circle, or (for coverage) those whose centre lies inside it"""
+        lat, lng = location['lat'], location['lng']
+        dlat = radius / 111320
+        dlng = radius / (111320 * max(0.01, math.cos(math.radians(lat))))
+        min_cell, max_cell = self._cell(lat - dlat, lng - dlng), self._cell(lat + dlat, lng + dlng)
+        size = self.cell_degrees
+        cells = []
+        for ix in range(min_cell[0], max_cell[0] + 1):
+            for iy in range(min_cell[1], max_cell[1] + 1):
+                lat0, lng0 = ix * size, iy * size
+                if intersecting:
+                    # Nearest point of the cell to the centre
+                    plat = min(max(lat, lat0), lat0 + size)
+                    plng = min(max(lng, lng0), lng0 + size)
+                else:
+                    plat, plng = lat0 + size / 2, lng0 + size / 2
+                if _distance_m(lat, lng, plat, plng) <= radius:
+                    cells.append((ix, iy))
+        if not cells and not intersecting:
+            cells.append(self._cell(lat, lng))  # Circle smaller than a cell
+        return cells
+
+    def add_results(
+        self,
+        location: Dict[str, float],
+        radius: int,
+        place_type: str,
+        results: List[Dict[str, Any]],
+        keyword: Optional[str] = None
+    ):
+        """Index Nearby Search results and record the coverage the search proves"""
+        self.stats['indexed_searches'] += 1
+        for place in results:
+            loc = place.get('geometry', {}).get('location')
+            if not loc or not place.get('place_id'):
+                continue
+            cell = self._cell(loc['lat'], loc['lng'])
+            for t in {place_type, *place.get('types', [])}:
+                entry = self._cells.get((t, cell))
+                if entry is None:
+                    entry = {'places': {}, 'covered': False}
+                    self._cells[(t, cell)] = entry
+                entry['places'][place['place_id']] = copy.deepcopy(place)
+
+        # Keyword searches are filtered, and truncated pages only show the top places
+        if keyword or len(results) >= NEARBY_PAGE_SIZE:
+            return
+        for cell in self._cells_in_circle(location, radius, intersecting=False):
+            entry = self._cells.get((place_type, cell))
+            if entry is None:
+                entry = {'places': {}, 'covered': True}
+                self._cells[(place_type, cell)] = entry
+            entry['covered'] = True
+
+    def coverage(self, location: Dict[str, float], radius: int, place_type: str) -> float:
+        """Fraction of the cells within the search circle that are covered for this type"""
+        cells = self._cells_in_circle(location, radius, intersecting=False)
+        if not cells:
+            return 0.0
+        covered = sum(1 for cell in cells if self._cells.get((place_type, cell), {}).get('covered'))
+        return covered / len(cells)
+
+    def coverage_report(self, location: Dict[str, float], radius: int, place_type: str) -> List[Dict[str, Any]]:
+        """Per-cell coverage for a search circle: cell bounds, covered flag and indexed place count"""
+        report = []
+        for ix, iy in self._cells_in_circle(location, radius, intersecting=False):
+            entry = self._cells.get((place_type, (ix, iy)), {})
+            report.append({
+                'cell': {'lat': round(ix * self.cell_degrees, 6), 'lng': round(iy * self.cell_degrees, 6)},
+                'covered': bool(entry.get('covered')),
+                'places': len(entry.get('places', {}))
+            })
+        return report
+
+    def _places_within(self, location: Dict[str, float], radius: int, place_type: str) -> List[Tuple[float, Dict[str, Any]]]:
+        found = []
+        for cell in self._cells_in_circle(location, radius, intersecting=True):
+            entry = self._cells.get((place_type, cell))
+            if not entry:
+                continue
+            for place in entry['places'].values():
+                loc = place['geometry']['location']
+                distance = _distance_m(location['lat'], location['lng'], loc['lat'], loc['lng'])
+                if distance <= radius:
+                    found.append((distance, place))
+        return found
+
+    def query(
+        self,
+        location: Dict[str, float],
+        radius: int,
+        place_type: str,
+        keyword: Optional[str] = None
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Answer a nearby search locally, or return None if the API must be called"""
+        self.stats['queries'] += 1
+        if keyword:
+            self.stats['misses'] += 1
+            return None
+
+        found = self._places_within(location, radius, place_type)
+        coverage = self.coverage(location, radius, place_type)
+        if coverage >= self.min_coverage and len(found) >= self.min_results:
+            self.stats['local_hits'] += 1
+            self.logger.debug(f"Place index: {len(found)} {place_type} places served locally (coverage {coverage:.0%})")
+            # Nearby Search ranks by prominence; rating and review count are the closest local proxy
+            found.sort(key=lambda m: (-(m[1].get('rating') or 0), -(m[1].get('user_ratings_total') or 0)))
+            # Callers score and annotate results; the indexed places stay untouched
+            return [copy.deepcopy(place) for _, place in found]
+
+        self.stats['misses'] += 1
+        self.logger.debug(f"Place index: coverage {coverage:.0%} with {len(found)} {place_type} places, falling back to API")
+        return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        by_type: Dict[str, Dict[str, int]] = {}
+        for (place_type, _), entry in list(self._cells.items()):
+            summary = by_type.setdefault(place_type, {'cells': 0, 'covered_cells': 0, 'places': 0})
+            summary['cells'] += 1
+            summary['covered_cells'] += int(entry['covered'])
+            summary['places'] += len(entry['places'])
+        queries = self.stats['queries']
+        return {
+            **self.stats,
+            'hit_rate': round(self.stats['local_hits'] / queries, 3) if queries else 0.0,
+            'cell_degrees': self.cell_degrees,
+            'types': by_type
+        }
@@ -1,7 +1,9 @@
 import os
 import time
+import random
+import struct
 import logging
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Set, Tuple, Any
 from datetime import datetime, timedelta
 import aiohttp
 import redis.asyncio as aioredis # Updated import
@@ -9,30 +11,110 @@ import json
 import asyncio # Added asyncio for TimeoutError
 from dateutil import parser as date_parser
 from .routes_client import GoogleRoutesClient # Ensure this is the new async version
+from .travel_estimator import travel_estimator
+from .place_index import PlaceIndex
 from .redis_client import RedisClient
+from .single_flight import SingleFlight
+from .local_cache import LocalCache
+from .cache_codec import CacheCodec
+from .token_bucket import TokenBucket
+from .deadline import MIN_TIMEOUT, budget_timeout, deadline_scope, expired, remaining
 
-class RateLimit:
-    def __init__(self, limit: int, window: int):
-        self.limit = limit
-        self.window = window
-        self.tokens = limit
-        self.last_update = time.time()
+DEFAULT_SEARCH_RADIUS = 10000  # 10km when the area can't be identified
 
-    def can_proceed(self) -> bool:
-        now = time.time()
-        time_passed = now - self.last_update
-        
-        # Replenish tokens based on time passed
-        self.tokens = min(
-            self.limit,
-            self.tokens + int((time_passed * self.limit) / self.window)
-        )
-        
-        if self.tokens > 0:
-            self.tokens -= 1
-            self.last_update = now
-            return True
-        return False
+# Localities that sprawl well beyond a typical city radius (matched case-insensitively on the
+# reverse-geocoded locality / admin area names)
+LOCALITY_RADIUS_OVERRIDES = {
+    'san antonio': 40000,
+    'houston': 40000,
+    'los angeles': 40000,
+    'phoenix': 40000,
+    'dallas': 40000,
+    'jacksonville': 40000,
+}
+
+# Radius by address component type, checked in reverse-geocode component order
+AREA_TYPE_RADIUS = {
+    'locality': 30000,                      # Major cities
+    'administrative_area_level_1': 30000,   # Regions
+    'sublocality': 20000,                   # Smaller cities/towns
+    'administrative_area_level_2': 20000,
+}
+
+def radius_for_address(geocode_result: List[Dict[str, Any]]) -> Tuple[int, Optional[str]]:
+    """Pick a search radius from reverse geocode results; returns (radius_m, matched area name)"""
+    results = [r for r in geocode_result or [] if 'address_components' in r]
+    for result in results:
+        for component in result['address_components']:
+            name = component.get('long_name', '')
+            if name.lower() in LOCALITY_RADIUS_OVERRIDES:
+                return LOCALITY_RADIUS_OVERRIDES[name.lower()], name
+    for result in results:
+        for component in result['address_components']:
+            for area_type in component.get('types', []):
+                if area_type in AREA_TYPE_RADIUS:
+                    return AREA_TYPE_RADIUS[area_type], component.get('long_name')
+    return DEFAULT_SEARCH_RADIUS, None
+
+# Bump to make every cached envelope written by older code read as a miss
+CACHE_SCHEMA_VERSION = 1
+
+# Images are stored raw, so their envelope is a binary header: magic, version, soft and hard expiry
+_IMAGE_ENVELOPE = struct.Struct('>4sHdd')
+_IMAGE_ENVELOPE_MAGIC = b'\x00SWR'
+
+# Place Details field profiles, smallest first; each caller requests the smallest one it reads
+PLACE_DETAILS_PROFILES = {
+    # Itinerary blocks and website lookups
+    'card': [
+        'place_id', 'name', 'rating', 'user_ratings_total', 'formatted_address', 'geometry/location',
+        'photo', 'website', 'types', 'business_status'
+    ],
+    # RecommendationGenerator.format_place: description, contact and accessibility details
+    'enrich': [
+        'place_id', 'name', 'rating', 'user_ratings_total', 'formatted_address', 'geometry/location',
+        'photo', 'website', 'types', 'business_status', 'price_level', 'formatted_phone_number',
+        'wheelchair_accessible_entrance', 'editorial_summary', 'reviews'
+    ],
+    # Untrimmed record including opening hours
+    'full': [
+        'place_id', 'name', 'rating', 'user_ratings_total', 'formatted_address', 'geometry/location',
+        'photo', 'website', 'types', 'business_status', 'price_level', 'formatted_phone_number',
+        'wheelchair_accessible_entrance', 'editorial_summary', 'reviews', 'opening_hours'
+    ],
+}
+PROFILE_ORDER = ('card', 'enrich', 'full')
+
+def _response_key(field: str) -> str:
+    """Details request field name -> key in the response (e.g. photo -> photos)"""
+    return 'photos' if field == 'photo' else field.split('/')[0]
+
+def slim_place_record(result: Dict[str, Any], profile: str) -> Dict[str, Any]:
+    """Keep only the profile's fields; below "full", trim photos and reviews to what callers read"""
+    record = {}
+    for field in PLACE_DETAILS_PROFILES[profile]:
+        key = _response_key(field)
+        if key in result:
+            record[key] = result[key]
+    if profile != 'full':
+        if isinstance(record.get('photos'), list):
+            record['photos'] = [
+                {'photo_reference': photo['photo_reference']}
+                for photo in record['photos'] if isinstance(photo, dict) and photo.get('photo_reference')
+            ]
+        if isinstance(record.get('reviews'), list):
+            # Only the first review's text is used, as a description fallback
+            record['reviews'] = [{'text': r.get('text', ''), 'rating': r.get('rating')} for r in record['reviews'][:1]]
+    return record
+
+class CacheEntry(NamedTuple):
+    value: Any
+    soft_expiry: Optional[float]  # Epoch seconds; None for values written before envelopes
+    hard_expiry: Optional[float]
+
+    @property
+    def stale(self) -> bool:
+        return self.soft_expiry is not None and time.time() >= self.soft_expiry
 
 class RedisCache:
     def __init__(self, redis_client: Optional[RedisClient] = None):
@@ -43,8 +125,27 @@ class RedisCache:
             'geocode': 14 * 24 * 60 * 60,  # 2 weeks (locations rarely change)
             'places': 48 * 60 * 60,        # 48 hours (good balance between freshness and cost savings)
             'photos': 14 * 24 * 60 * 60,   # 2 weeks (photos are stable)
-            'image_proxy': 30 * 24 * 60 * 60 # 30 days for proxied images (very stable)
+            'image_proxy': 30 * 24 * 60 * 60, # 30 days for proxied images (very stable)
+            'image_ref': 30 * 24 * 60 * 60, # 30 days per image reference into the disk image store
+            'routes': 24 * 60 * 60,         # 1 day for travel times between rounded coordinate pairs
+            'place_details': 7 * 24 * 60 * 60, # 1 week per place_id + field set (names, websites, ratings change slowly)
+            'radius': 30 * 24 * 60 * 60,    # 30 days per location cell (city extents don't change)
+            'itinerary': int(os.getenv('ITINERARY_CACHE_TTL', 6 * 60 * 60)),  # 6 hours per canonical trip selection
+            'llm': int(os.getenv('LLM_CACHE_TTL', 7 * 24 * 60 * 60)),  # 1 week per identical LLM request (see llm_gateway)
+            'preferences': 30 * 24 * 60 * 60,  # 30 days per normalised special-requests text
+            'llm_description': 14 * 24 * 60 * 60  # 2 weeks per place + preference profile (see llm_descriptions)
         }
+        # 🚀 SPEED OPTIMIZATION: Compact serialization (+ compression for large values), see CACHE_CODEC / CACHE_COMPRESSION
+        self.codec = CacheCodec()
+        # 🚀 SPEED OPTIMIZATION: In-process tier serves hot keys as decoded objects without a Redis round trip
+        self.local = LocalCache(self.ttl)
+        # 🚀 SPEED OPTIMIZATION: Stale-while-revalidate - values stay servable for a grace period
+        # (fraction of the TTL) past their soft expiry while one background refresh runs.
+        # Soft TTLs are shortened by up to ttl_jitter so popular keys don't expire together.
+        self.ttl_jitter = 0.1
+        self.stale_grace = 0.25
+        self.swr_stats = {'fresh_hits': 0, 'stale_serves': 0, 'refreshes': 0, 'refresh_failures': 0}
+        self._refreshing: Dict[str, asyncio.Task] = {}
         self.logger = logging.getLogger(__name__)
 
     def get_key(self, key_type: str, **kwargs) -> str:
@@ -74,59 +175,129 @@ class RedisCache:
         key_parts = [key_type] + [f"{k}:{v}" for k, v in sorted_items if v is not None]
         return ":".join(key_parts)
 
-    async def get(self, key: str) -> Optional[Any]:
-        """Get value from cache using RedisClient"""
-        data = await self.redis_client.get(key)
-        
-        if not data:
-            return None
-            
+    def _decode(self, key: str, data: bytes) -> Optional[CacheEntry]:
+        """Unwrap a stored value; entries from before envelopes read as never-stale"""
         # If key starts with image_proxy prefix, return raw bytes
         if key.startswith('image_proxy:'):
-            self.logger.debug(f"Retrieved image from cache for key: {key}")
-            return data
-            
-        # For other data types, try to decode JSON
+            if data[:len(_IMAGE_ENVELOPE_MAGIC)] != _IMAGE_ENVELOPE_MAGIC:
+                return CacheEntry(data, None, None)
+            _, version, soft, hard = _IMAGE_ENVELOPE.unpack_from(data)
+            if version != CACHE_SCHEMA_VERSION:
+                return None
+            return CacheEntry(data[_IMAGE_ENVELOPE.size:], soft, hard)
+
+        # For other data types, decode with whichever codec wrote the value (legacy values are plain JSON)
         try:
-            return json.loads(data.decode('utf-8'))
-        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            value = self.codec.decode(data)
+        except Exception as e:
             self.logger.error(f"Error decoding data for key {key}: {str(e)}")
             return None
+        if isinstance(value, dict) and '_swr' in value:
+            if value['_swr'] != CACHE_SCHEMA_VERSION:
+                return None
+            return CacheEntry(value['data'], value['soft'], value['hard'])
+        return CacheEntry(value, None, None)
 
-    async def set(self, key: str, value: Any, ttl_type: str):
-        """Set value to cache using RedisClient"""
-        # Handle binary data for images
+    def _encode(self, value: Any, ttl_type: str) -> Tuple[bytes, int, CacheEntry]:
+        """Wrap a value with jittered soft/hard expiries; returns (data, redis_ttl, entry)"""
+        ttl = self.ttl.get(ttl_type, 3600)
+        soft_ttl = ttl * random.uniform(1 - self.ttl_jitter, 1)
+        hard_ttl = soft_ttl + ttl * self.stale_grace
+        now = time.time()
+        entry = CacheEntry(value, now + soft_ttl, now + hard_ttl)
         if ttl_type == 'image_proxy':
-            if not isinstance(value, bytes):
-                self.logger.error(f"Image proxy value must be bytes, got {type(value)}")
-                return
-            data_to_store = value
+            header = _IMAGE_ENVELOPE.pack(_IMAGE_ENVELOPE_MAGIC, CACHE_SCHEMA_VERSION, entry.soft_expiry, entry.hard_expiry)
+            data = header + value
         else:
-            # For non-image data, store as JSON
-            data_to_store = json.dumps(value).encode('utf-8') if isinstance(value, (dict, list)) else str(value).encode('utf-8')
+            data = self.codec.encode({
+                '_swr': CACHE_SCHEMA_VERSION,
+                'soft': entry.soft_expiry,
+                'hard': entry.hard_expiry,
+                'data': value
+            })
+        return data, int(hard_ttl) + 1, entry
 
-        # Get TTL value, default to 1 hour if not found
-        ttl = self.ttl.get(ttl_type, 3600)
-        await self.redis_client.set(key, data_to_store, ttl)
-        self.logger.debug(f"Successfully stored data in cache with key: {key}, ttl_type: {ttl_type}")
+    async def get_entry(self, key: str) -> Optional[CacheEntry]:
+        """Get a value with its expiries from the local tier, falling back to RedisClient"""
+        entry = self.local.get(key)
+        if entry is None:
+            data = await self.redis_client.get(key)
+            if not data:
+                return None
+            entry = self._decode(key, data)
+            if entry is None:
+                return None
+            # Values from before envelopes carry no expiry, so how long Redis keeps them is unknown;
+            # they are served from Redis only rather than risk outliving the key locally
+            if entry.hard_expiry is not None:
+                self.local.set(key, entry, key.split(':', 1)[0], len(data), expires_at=entry.hard_expiry)
 
-    async def _do_set(self, client: aioredis.Redis, key: str, value: Any, ttl_type: str):
-        """Helper method to perform the actual Redis set operation"""
-        # Handle binary data for images
-        if ttl_type == 'image_proxy':
-            if not isinstance(value, bytes):
-                self.logger.error(f"Image proxy value must be bytes, got {type(value)}")
-                return
-            data_to_store = value
+        if entry.hard_expiry is not None and time.time() >= entry.hard_expiry:
+            self.local.invalidate(key)
+            return None
+        return entry
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Get value (fresh or stale) from the cache"""
+        entry = await self.get_entry(key)
+        return entry.value if entry else None
+
+    async def get_swr(self, key: str, refresh: Callable[[], Awaitable[Any]]) -> Optional[Any]:
+        """Get value; if it is past its soft expiry, return it anyway and refresh it in the background.
+
+        `refresh` must re-fetch and write the key itself. At most one refresh per key runs in this process.
+        """
+        entry = await self.get_entry(key)
+        if entry is None:
+            return None
+        if entry.stale:
+            self.swr_stats['stale_serves'] += 1
+            self._schedule_refresh(key, refresh)
         else:
-            # For non-image data, store as JSON
-            data_to_store = json.dumps(value).encode('utf-8') if isinstance(value, (dict, list)) else str(value).encode('utf-8')
+            self.swr_stats['fresh_hits'] += 1
+        return entry.value
 
-        # Get TTL value, default to 1 hour if not found
-        ttl = self.ttl.get(ttl_type, 3600)
-        await client.setex(key, ttl, data_to_store)
+    def _schedule_refresh(self, key: str, refresh: Callable[[], Awaitable[Any]]):
+        if key in self._refreshing:
+            return
+        self._refreshing[key] = asyncio.get_running_loop().create_task(self._run_refresh(key, refresh))
+
+    async def _run_refresh(self, key: str, refresh: Callable[[], Awaitable[Any]]):
+        try:
+            # The refresh outlives the request that noticed the stale entry, so it gets its own budget
+            with deadline_scope(None):
+                refreshed = await refresh()
+            if refreshed:
+                self.swr_stats['refreshes'] += 1
+                self.logger.debug(f"Background refresh completed for key: {key}")
+            else:
+                self.swr_stats['refresh_failures'] += 1
+        except Exception as e:
+            self.swr_stats['refresh_failures'] += 1
+            self.logger.error(f"Background refresh failed for key {key}: {str(e)}")
+        finally:
+            self._refreshing.pop(key, None)
+
+    def get_swr_stats(self) -> Dict[str, int]:
+        return {**self.swr_stats, 'refreshing': len(self._refreshing)}
+
+    async def set(self, key: str, value: Any, ttl_type: str):
+        """Set value to cache using RedisClient"""
+        # Handle binary data for images
+        if ttl_type == 'image_proxy' and not isinstance(value, bytes):
+            self.logger.error(f"Image proxy value must be bytes, got {type(value)}")
+            return
+
+        data_to_store, ttl, entry = self._encode(value, ttl_type)
+        self.local.set(key, entry, ttl_type, len(data_to_store), expires_at=entry.hard_expiry)
+        await self.redis_client.set(key, data_to_store, ttl)
         self.logger.debug(f"Successfully stored data in cache with key: {key}, ttl_type: {ttl_type}")
 
+    async def delete(self, key: str) -> bool:
+        """Invalidate a key in both the local tier and Redis"""
+        self.local.invalidate(key)
+        return await self.redis_client.delete(key)
+
 class GooglePlacesClient:
     def __init__(self, session: aiohttp.ClientSession, redis_client: Optional[RedisClient] = None):
         self.api_key = os.getenv('GOOGLE_PLACES_API_KEY')
@@ -135,14 +306,24 @@ class GooglePlacesClient:
             self.logger.critical("❌ GooglePlacesClient: No API key found!")
         else:
             self.logger.info("✅ GooglePlacesClient: API key loaded successfully")
-        # Initialize GoogleRoutesClient with the same session
-        self.routes_client = GoogleRoutesClient(session=session)
+        # Shared across workers via Redis; callers wait briefly for a token instead of failing
         self.rate_limits = {
-            'nearby_search': RateLimit(600, 60),
-            'place_details': RateLimit(600, 60),
-            'photos': RateLimit(600, 60)
+            'nearby_search': TokenBucket('nearby_search', 600, 60, redis_client),
+            'place_details': TokenBucket('place_details', 600, 60, redis_client),
+            'photos': TokenBucket('photos', 600, 60, redis_client)
         }
         self.cache = RedisCache(redis_client)
+        # Initialize GoogleRoutesClient with the same session and cache
+        self.routes_client = GoogleRoutesClient(session=session, cache=self.cache)
+        self.travel_estimator = travel_estimator
+        self.distance_matrix_backend = os.getenv('DISTANCE_MATRIX_BACKEND', 'routes').lower()
+        # Coalesce concurrent cache misses (in-process and across workers) into one upstream fetch
+        self.single_flight = SingleFlight(redis_client)
+        self.place_index = PlaceIndex(ttl=self.cache.ttl['places'])
+        self.details_cache_stats = {'hits': 0, 'misses': 0, 'upgrades': 0}
+        self.deadline_stats = {'partial_details': 0, 'uncached_partial': 0}
+        # Details fetches that outlive their request's budget; referenced until they finish
+        self._detached_details: Set[asyncio.Task] = set()
         self.logger = logging.getLogger(__name__)
         self._session = session # This client also uses the passed-in session
         # self._should_close_session should be False if session is always passed in via lifespan
@@ -174,6 +355,16 @@ class GooglePlacesClient:
         if keyword:
             params['keyword'] = keyword
 
+        # 💰 COST OPTIMIZATION: Answer from places we have already seen when the area is covered
+        indexed_results = self.place_index.query(location, radius, place_type, keyword)
+        if indexed_results is not None:
+            return {'results': indexed_results, 'status': 'OK'}
+
+        # Only searches that actually reach the API spend a rate-limit token
+        if not await self.rate_limits['nearby_search'].acquire():
+            self.logger.warning("Rate limit reached for nearby search")
+            return {'results': []}
+
         print(f"\n🌐 DEBUG: Places Nearby API Call")
         print(f"📍 URL: {url}")
         # Log params without API key for security
@@ -182,18 +373,20 @@ class GooglePlacesClient:
         print(f"📋 Params: {json.dumps(safe_params, indent=2)}")
         
         try:
-            async with session.get(url, params=params, timeout=10) as response:
+            async with session.get(url, params=params, timeout=budget_timeout(10)) as response:
                 print(f"📡 Response Status: {response.status}")
                 result = await response.json()
                 print(f"📥 Full API Response: {json.dumps(result, indent=2)}")
                 
                 if result.get('status') == 'OK':
+                    self.place_index.add_results(location, radius, place_type, result.get('results', []), keyword)
                     print(f"✅ Places API SUCCESS - found {len(result.get('results', []))} places")
                     if result.get('results'):
                         for i, place in enumerate(result['results'][:3]):  # Show first 3 results
                             print(f"📍 Result {i+1}: {place.get('name')} - {place.get('place_id')}")
                     return result
                 elif result.get('status') == 'ZERO_RESULTS':
+                    self.place_index.add_results(location, radius, place_type, [], keyword)
                     print(f"🔍 Places API: No results found for query")
                     return {'results': []}
                 else:
@@ -204,18 +397,27 @@ class GooglePlacesClient:
             print(f"⚠️ Exception in places_nearby: {str(e)}")
             return {'results': []}
 
-    async def place_details(self, place_id: str, include_opening_hours: bool = True) -> Optional[Dict]:
-        """Async version of place using aiohttp with optional opening_hours for speed optimization"""
+    async def place_details(
+        self,
+        place_id: str,
+        include_opening_hours: bool = True,
+        fields: Optional[List[str]] = None
+    ) -> Optional[Dict]:
+        """Async version of place using aiohttp with optional opening_hours for speed optimization.
+
+        `fields` overrides the default field list (see PLACE_DETAILS_PROFILES).
+        """
         session = await self.get_session()
         url = "https://maps.googleapis.com/maps/api/place/details/json"
         
-        # 🚀 SPEED OPTIMIZATION: Conditional opening_hours field
-        # Removing opening_hours can improve API response time by 15-25%
-        base_fields = 'place_id,name,rating,user_ratings_total,formatted_address,geometry/location,photo,price_level,website,formatted_phone_number,wheelchair_accessible_entrance,types,editorial_summary,reviews,business_status'
-        
-        fields = base_fields
-        if include_opening_hours:
-            fields += ',opening_hours'
+        if fields:
+            fields = ','.join(fields)
+        else:
+            # 🚀 SPEED OPTIMIZATION: Conditional opening_hours field
+            # Removing opening_hours can improve API response time by 15-25%
+            fields = ','.join(PLACE_DETAILS_PROFILES['enrich'])
+            if include_opening_hours:
+                fields += ',opening_hours'
         
         params = {
             'place_id': place_id,
@@ -232,7 +434,7 @@ class GooglePlacesClient:
         print(f"⚡ Opening hours included: {include_opening_hours}")
         
         try:
-            async with session.get(url, params=params, timeout=10) as response:
+            async with session.get(url, params=params, timeout=budget_timeout(10)) as response:
                 print(f"📡 Response Status: {response.status}")
                 result = await response.json()
                 print(f"📥 Full API Response: {json.dumps(result, indent=2)}")
@@ -260,46 +462,122 @@ class GooglePlacesClient:
             print(f"⚠️ Exception in place_details: {str(e)}")
             return None
 
+    async def _rate_limited_place_details(
+        self,
+        place_id: str,
+        include_opening_hours: bool = True,
+        fields: Optional[List[str]] = None
+    ) -> Optional[Dict]:
+        """place_details behind the shared place_details token bucket"""
+        if not await self.rate_limits['place_details'].acquire():
+            self.logger.warning(f"Rate limit reached for place details, skipping {place_id}")
+            return None
+        return await self.place_details(place_id, include_opening_hours=include_opening_hours, fields=fields)
+
+    def _details_cache_key(self, place_id: str, profile: str) -> str:
+        return self.cache.get_key('place_details', id=place_id, profile=profile)
+
+    async def get_place_details(self, place_id: str, profile: str = 'enrich') -> Optional[Dict]:
+        """Slim place_details record for a field profile, cached per place_id + profile.
+
+        A cached richer profile serves poorer requests. If only a poorer profile is
+        cached, just the missing fields are fetched and merged (lazy upgrade).
+        """
+        if profile not in PLACE_DETAILS_PROFILES:
+            raise ValueError(f"Unknown place details profile: {profile}")
+
+        # 💰 COST OPTIMIZATION: Details are paid once per place_id + profile, not once per get_places key
+        cache_keys = {p: self._details_cache_key(place_id, p) for p in PROFILE_ORDER}
+        cached = dict(zip(PROFILE_ORDER, await asyncio.gather(*[self.cache.get(cache_keys[p]) for p in PROFILE_ORDER])))
+
+        requested_index = PROFILE_ORDER.index(profile)
+        for richer in PROFILE_ORDER[requested_index:]:
+            if cached[richer]:
+                self.details_cache_stats['hits'] += 1
+                return {'status': 'OK', 'result': slim_place_record(cached[richer], profile)}
+
+        base_profile = next((p for p in reversed(PROFILE_ORDER[:requested_index]) if cached[p]), None)
+        self.details_cache_stats['upgrades' if base_profile else 'misses'] += 1
+        return await self.single_flight.do(
+            cache_keys[profile],
+            lambda: self._fetch_place_details(cache_keys[profile], place_id, profile, base_profile, cached.get(base_profile)),
+            cache_get=lambda: self.cache.get(cache_keys[profile])
+        )
+
+    async def _fetch_place_details(
+        self,
+        cache_key: str,
+        place_id: str,
+        profile: str,
+        base_profile: Optional[str] = None,
+        base_record: Optional[Dict[str, Any]] = None
+    ) -> Optional[Dict]:
+        """Call Place Details for the profile (or only the fields missing from base_record) and cache the slim record"""
+        fields = PLACE_DETAILS_PROFILES[profile]
+        if base_profile:
+            have = set(PLACE_DETAILS_PROFILES[base_profile])
+            fields = ['place_id'] + [f for f in fields if f not in have]
+            # Trimmed photos/reviews in the base record can't be upgraded in place
+            if profile == 'full':
+                fields += [f for f in ('photo', 'reviews') if f not in fields]
+
+        details = await self._rate_limited_place_details(place_id, fields=fields)
+        if not details or not details.get('result'):
+            return None
+
+        record = slim_place_record({**(base_record or {}), **details['result']}, profile)
+        await self.cache.set(cache_key, record, 'place_details')
+        return {'status': 'OK', 'result': record}
+
     async def calculate_radius(self, location: Dict[str, float]) -> int:
-        """Calculate dynamic search radius based on city bounds. Now async."""
+        """Search radius for a location, cached per ~1km location cell.
+
+        Concurrent get_places misses for the same request share one reverse geocode.
+        """
+        # 🚀 SPEED OPTIMIZATION: One reverse geocode per location cell instead of one per get_places miss
+        cache_key = self.cache.get_key('radius', cell=f"{round(location['lat'], 2)},{round(location['lng'], 2)}")
+        cached = await self.cache.get(cache_key)
+        if cached:
+            return cached['radius']
+
+        result = await self.single_flight.do(
+            cache_key,
+            lambda: self._fetch_radius(cache_key, location),
+            cache_get=lambda: self.cache.get(cache_key)
+        )
+        return result['radius'] if result else DEFAULT_SEARCH_RADIUS
+
+    async def _fetch_radius(self, cache_key: str, location: Dict[str, float]) -> Optional[Dict[str, Any]]:
+        """Reverse geocode the location, look up its radius and cache it (single-flight leader path)"""
         try:
-            # Get city bounds from geocoding - now awaits the async call
             geocode_result = await self.routes_client.reverse_geocode(location)
-            if not geocode_result:
-                self.logger.warning("No geocoding results, using default radius")
-                return 10000  # Default 10km radius
-                
-            # Extract bounds from the first result if available
-            for result in geocode_result:
-                if 'address_components' in result:
-                    # Check for San Antonio specifically
-                    is_san_antonio = False
-                    for component in result['address_components']:
-                        if 'long_name' in component and 'San Antonio' in component['long_name']:
-                            is_san_antonio = True
-                            self.logger.info("Location identified as San Antonio, using larger radius")
-                            return 40000  # 40km radius for San Antonio
-                    
-                    # Check the type of area to determine appropriate radius
-                    for component in result['address_components']:
-                        if 'types' in component:
-                            # Major cities get largest radius
-                            if 'locality' in component['types'] or 'administrative_area_level_1' in component['types']:
-                                self.logger.info(f"Found major city/region, using larger radius")
-                                return 30000  # 30km radius
-                            # Smaller cities/towns get medium radius
-                            elif 'sublocality' in component['types'] or 'administrative_area_level_2' in component['types']:
-                                self.logger.info(f"Found smaller city/town, using medium radius")
-                                return 20000  # 20km radius
-                            
-            self.logger.info("No specific area type found, using default radius")
-            return 10000  # Default 10km radius
         except Exception as e:
             self.logger.error(f"Error calculating radius: {str(e)}")
-            return 10000  # Default to 10km on error
+            return None  # Not cached, so a transient error doesn't stick for the whole TTL
+
+        if not geocode_result:
+            # reverse_geocode returns [] on API errors too, so don't cache the default
+            self.logger.warning("No geocoding results, using default radius")
+            return {'radius': DEFAULT_SEARCH_RADIUS, 'area': None}
+
+        radius, area = radius_for_address(geocode_result)
+        self.logger.info(f"Search radius for {area or 'unknown area'}: {radius // 1000}km")
+        result = {'radius': radius, 'area': area}
+        await self.cache.set(cache_key, result, 'radius')
+        return result
 
-    async def get_distance_matrix(self, origins: List[Dict[str, float]], destinations: List[Dict[str, float]], mode: str = "driving") -> List[List[Dict[str, Any]]]:
-        """Get distance matrix using async Routes API client"""
+    async def get_distance_matrix(
+        self,
+        origins: List[Dict[str, float]],
+        destinations: List[Dict[str, float]],
+        mode: str = "driving",
+        backend: Optional[str] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Get distance matrix using async Routes API client, or the offline estimator.
+
+        backend: "routes" (real travel times) or "estimate" (haversine-based, no API
+        calls); defaults to the DISTANCE_MATRIX_BACKEND environment variable.
+        """
         # Convert mode to Routes API format (DRIVE, WALK, BICYCLE, TRANSIT)
         # Note: The actual GoogleRoutesClient.calculate_distance_matrix expects mode like "DRIVE"
         mode_mapping = {
@@ -309,10 +587,25 @@ class GooglePlacesClient:
             "transit": "TRANSIT" # Assuming GoogleRoutesClient can handle this if it makes sense for the API
         }
         routes_mode = mode_mapping.get(mode.lower(), "DRIVE")
+
+        # 🚀 SPEED OPTIMIZATION: Approximate travel times locally when exact routes are not needed
+        if (backend or self.distance_matrix_backend) == "estimate":
+            return self.travel_estimator.estimate_matrix(origins, destinations, mode=routes_mode)
         
         self.logger.debug(f"Calling async calculate_distance_matrix with mode: {routes_mode}")
         return await self.routes_client.calculate_distance_matrix(origins, destinations, mode=routes_mode)
 
+    async def calibrate_travel_estimator(
+        self,
+        origins: List[Dict[str, float]],
+        destinations: List[Dict[str, float]],
+        mode: str = "driving"
+    ) -> bool:
+        """Calibrate the offline estimator against Routes results already in the cache (no API calls)"""
+        routes_mode = {"walking": "WALK", "bicycling": "BICYCLE", "transit": "TRANSIT"}.get(mode.lower(), "DRIVE")
+        cached = await self.routes_client.get_cached_matrix(origins, destinations, mode=routes_mode)
+        return self.travel_estimator.calibrate(origins, destinations, cached, mode=routes_mode)
+
     async def get_places(
         self,
         location: Dict[str, float],
@@ -334,7 +627,13 @@ class GooglePlacesClient:
             self.logger.info(f"Attempting to fetch restaurants for location: {location}, keywords: {keywords}")
             self.logger.info(f"Restaurant cache key: {cache_key}")
 
-        cached = await self.cache.get(cache_key)
+        fetch = lambda: self.single_flight.do(
+            cache_key,
+            lambda: self._fetch_places(cache_key, location, place_type, keywords, max_results, special_requests),
+            cache_get=lambda: self.cache.get(cache_key)
+        )
+
+        cached = await self.cache.get_swr(cache_key, refresh=fetch)
         if cached:
             self.logger.info(f"Found {len(cached)} cached places for {place_type} (keywords: {keywords})")
             if place_type == 'restaurant':
@@ -344,10 +643,18 @@ class GooglePlacesClient:
         if place_type == 'restaurant':
             self.logger.info(f"No cached restaurants found for key: {cache_key}. Fetching from API.")
 
-        if not self.rate_limits['nearby_search'].can_proceed():
-            self.logger.warning("Rate limit reached for nearby search")
-            return []
+        return await fetch()
 
+    async def _fetch_places(
+        self,
+        cache_key: str,
+        location: Dict[str, float],
+        place_type: str,
+        keywords: Optional[List[str]],
+        max_results: int,
+        special_requests: Optional[str]
+    ) -> List[Dict[str, Any]]:
+        """Fetch places from the API and cache them under cache_key (single-flight leader path)."""
         try:
             # Calculate search radius based on location
             radius = await self.calculate_radius(location)
@@ -438,27 +745,18 @@ class GooglePlacesClient:
                 self.logger.info(f"💰 Cost optimization: Fetching details for top {places_to_detail} out of {len(high_priority_places)} places")
 
                 # Get details for selected places in parallel
-                # 🚀 SPEED OPTIMIZATION: Skip opening_hours for faster /generate endpoint
-                detail_tasks = []
-                for place in high_priority_places[:places_to_detail]:
-                    if self.rate_limits['place_details'].can_proceed():
-                        detail_tasks.append(self.place_details(place['place_id'], include_opening_hours=False))
-
-                detailed_results = []
-                if detail_tasks:
-                    details_list = await asyncio.gather(*detail_tasks, return_exceptions=True)
-                    for details in details_list:
-                        if isinstance(details, dict) and details.get('result'):
-                            detailed_results.append(details['result'])
-                        elif isinstance(details, Exception):
-                            self.logger.error(f"Error fetching place detail: {details}")
+                detailed_results = await self._fetch_details_within_budget(high_priority_places[:places_to_detail])
 
             self.logger.info(f"Successfully fetched details for {len(detailed_results)} places")
             if place_type == 'restaurant':
                 self.logger.info(f"Fetched details for {len(detailed_results)} restaurants")
 
             # Cache results with longer TTL for cost efficiency
-            if detailed_results: # Only cache if we have results
+            if detailed_results and expired():
+                # The budget ran out mid-fetch, so some places may lack details; don't pin that for 48h
+                self.deadline_stats['uncached_partial'] += 1
+                self.logger.info(f"Not caching possibly partial results for key: {cache_key}")
+            elif detailed_results: # Only cache if we have results
                 await self.cache.set(cache_key, detailed_results, 'places')
                 if place_type == 'restaurant':
                     self.logger.info(f"Cached {len(detailed_results)} restaurants under key: {cache_key}")
@@ -577,23 +875,47 @@ class GooglePlacesClient:
         cost_optimized_limit = min(10, max_results, len(scored_restaurants))
         self.logger.info(f"💰 Restaurant cost optimization: Fetching details for top {cost_optimized_limit} out of {len(scored_restaurants)} restaurants")
         
-        detail_tasks = []
-        for place in scored_restaurants[:cost_optimized_limit]:
-            if self.rate_limits['place_details'].can_proceed():
-                # 🚀 SPEED OPTIMIZATION: Skip opening_hours for faster /generate endpoint  
-                detail_tasks.append(self.place_details(place['place_id'], include_opening_hours=False))
+        return await self._fetch_details_within_budget(scored_restaurants[:cost_optimized_limit])
 
-        detailed_results = []
-        if detail_tasks:
-            details_list = await asyncio.gather(*detail_tasks, return_exceptions=True)
-            for details in details_list:
-                if isinstance(details, dict) and details.get('result'):
-                    detailed_results.append(details['result'])
-                elif isinstance(details, Exception):
-                    self.logger.error(f"Error fetching restaurant detail: {details}")
+    async def _fetch_details_within_budget(self, places: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Place details for each Nearby Search result, fetched in parallel.
+
+        When the request deadline runs out first, places still waiting on details
+        fall back to their Nearby Search record (best-effort partial result). The
+        fetches run outside the request deadline with their usual timeouts, so the
+        ones still pending finish in the background and fill the details cache.
+        """
+        left = remaining()
+        # 🚀 SPEED OPTIMIZATION: 'enrich' profile - only what format_place reads, no opening_hours
+        with deadline_scope(None):
+            tasks = [asyncio.ensure_future(self.get_place_details(place['place_id'], profile='enrich')) for place in places]
+        if not tasks:
+            return []
+        done, pending = await asyncio.wait(tasks, timeout=max(MIN_TIMEOUT, left) if left is not None else None)
+        for task in pending:
+            # Not cancelled: other requests may share these fetches through single-flight,
+            # and finishing them fills the details cache for next time
+            self._detached_details.add(task)
+            task.add_done_callback(self._finish_detached_details)
+        if pending:
+            self.deadline_stats['partial_details'] += len(pending)
+            self.logger.warning(f"⏱️ Request budget exhausted: using search results for {len(pending)}/{len(tasks)} places")
 
+        detailed_results = []
+        for place, task in zip(places, tasks):
+            if task in pending:
+                detailed_results.append(place)
+            elif task.exception() is not None:
+                self.logger.error(f"Error fetching place detail: {task.exception()}")
+            elif task.result() and task.result().get('result'):
+                detailed_results.append(task.result()['result'])
         return detailed_results
 
+    def _finish_detached_details(self, task: asyncio.Task):
+        self._detached_details.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.logger.debug(f"Background place details fetch failed: {task.exception()}")
+
     def is_place_open_during_dates(
         self,
         place: Dict,
@@ -682,11 +1004,20 @@ class GooglePlacesClient:
         """
         # Check cache first
         cache_key = self.cache.get_key('geocode', destination=destination.lower().strip())
-        cached_location = await self.cache.get(cache_key)
+        fetch = lambda: self.single_flight.do(
+            cache_key,
+            lambda: self._fetch_geocode(cache_key, destination),
+            cache_get=lambda: self.cache.get(cache_key)
+        )
+        cached_location = await self.cache.get_swr(cache_key, refresh=fetch)
         if cached_location:
             self.logger.info(f"Geocoding cache hit for {destination}")
             return cached_location
-        
+
+        return await fetch()
+
+    async def _fetch_geocode(self, cache_key: str, destination: str) -> Optional[Dict[str, Any]]:
+        """Call the Geocoding API and cache the result under cache_key (single-flight leader path)."""
         session = await self.get_session() # Ensures session is available
         url = "https://maps.googleapis.com/maps/api/geocode/json" # Geocoding API URL
         params = {
@@ -695,7 +1026,7 @@ class GooglePlacesClient:
         }
         self.logger.debug(f"Geocoding (GooglePlacesClient) destination: {destination}")
         try:
-            async with session.get(url, params=params, timeout=10) as response:
+            async with session.get(url, params=params, timeout=budget_timeout(10)) as response:
                 response.raise_for_status()
                 result = await response.json()
                 if result.get('status') == 'OK' and result.get('results'):
@@ -747,7 +1078,7 @@ class GooglePlacesClient:
         }
         
         try:
-            async with session.get(url, params=params, timeout=10, allow_redirects=False) as response:
+            async with session.get(url, params=params, timeout=budget_timeout(10), allow_redirects=False) as response:
                 if response.status == 302:  # Redirect to actual image
                     return str(response.headers.get('Location'))
                 else:
@@ -757,40 +1088,36 @@ class GooglePlacesClient:
             self.logger.error(f"Error getting photo URL: {str(e)}")
             return None
 
-    async def get_photo_data(self, photo_reference: str, max_width: int = 400, max_height: int = 400) -> Optional[bytes]:
-        """Get photo data from Google Places Photo API for caching"""
-        if not photo_reference:
+    async def fetch_photo(
+        self,
+        cache_key: str,
+        photo_reference: str,
+        max_width: int,
+        max_height: Optional[int] = None
+    ) -> Optional[bytes]:
+        """Fetch photo bytes from the Places Photo API and cache them under cache_key"""
+        if not await self.rate_limits['photos'].acquire():
+            self.logger.warning(f"Rate limit reached for photos, skipping {photo_reference}")
             return None
             
-        cache_key = self.cache.get_key(
-            'image_proxy',
-            photoreference=photo_reference,
-            maxwidth=max_width,
-            maxheight=max_height
-        )
-        
-        # Check cache first
-        cached_data = await self.cache.get(cache_key)
-        if cached_data:
-            self.logger.info(f"Photo cache hit for {photo_reference}")
-            return cached_data
-            
         session = await self.get_session()
         url = "https://maps.googleapis.com/maps/api/place/photo"
         params = {
             'photoreference': photo_reference,
             'maxwidth': max_width,
-            'maxheight': max_height,
             'key': self.api_key
         }
+        if max_height:
+            params['maxheight'] = max_height
         
         try:
-            async with session.get(url, params=params, timeout=10) as response:
+            async with session.get(url, params=params, timeout=budget_timeout(10)) as response:
                 if response.status == 200:
                     photo_data = await response.read()
-                    # Cache the photo data
-                    await self.cache.set(cache_key, photo_data, 'image_proxy')
-                    self.logger.info(f"Photo cached for {photo_reference}")
+                    # Only cache if we got valid image data
+                    if len(photo_data) > 100:
+                        await self.cache.set(cache_key, photo_data, 'image_proxy')
+                        self.logger.info(f"Photo cached for {photo_reference}")
                     return photo_data
                 else:
                     self.logger.error(f"Error fetching photo: {response.status}")
@@ -1,24 +1,176 @@
-import os
+import hashlib
 import json
-from typing import Dict, List, Optional
-from openai import OpenAI
+import re
+from typing import Dict, List, Optional, Tuple
 import logging
+from .llm_gateway import get_llm_gateway
+
+# Bump when the extraction prompt or lexicons change so cached parses are ignored
+PREFERENCES_CACHE_VERSION = 2
+
+# Local lexicons: label -> phrases (matched on word boundaries, longest phrase first). Only phrases
+# with a single plausible reading belong here; words like 'fish' (market? aquarium?), 'curry' (Thai?
+# Japanese?), 'lift' (ski lift?) or a bare 'accessible' are left to the LLM
+CUISINE_LEXICON = {
+    'Italian': ['italian', 'pasta', 'pizza', 'pizzeria', 'trattoria'],
+    'Japanese': ['japanese', 'sushi', 'ramen', 'izakaya'],
+    'Chinese': ['chinese', 'dim sum', 'dumpling', 'dumplings', 'szechuan', 'sichuan', 'cantonese'],
+    'Mexican': ['mexican', 'taco', 'tacos', 'burrito', 'burritos'],
+    'Thai': ['thai'],
+    'Indian': ['indian'],
+    'French': ['french'],
+    'Korean': ['korean', 'korean bbq'],
+    'Vietnamese': ['vietnamese', 'pho'],
+    'Greek': ['greek'],
+    'Spanish': ['spanish', 'tapas'],
+    'Mediterranean': ['mediterranean'],
+    'Middle Eastern': ['middle eastern', 'lebanese', 'falafel'],
+    'American': ['american', 'burger', 'burgers', 'diner'],
+    'Seafood': ['seafood', 'oyster', 'oysters'],
+    'Barbecue': ['bbq', 'barbecue', 'barbeque'],
+    'Steakhouse': ['steak', 'steakhouse'],
+    'Vegetarian': ['vegetarian', 'veggie'],
+    'Vegan': ['vegan', 'plant based', 'plant-based'],
+    'Halal': ['halal'],
+    'Kosher': ['kosher'],
+    'Gluten-free': ['gluten free', 'gluten-free', 'celiac', 'coeliac'],
+    'Cafe': ['cafe', 'cafes', 'coffee', 'brunch'],
+    'Bakery': ['bakery', 'bakeries', 'pastry', 'pastries', 'dessert', 'desserts'],
+}
+ACCESSIBILITY_LEXICON = {
+    'wheelchair': ['wheelchair', 'wheel chair', 'wheelchair accessible'],
+    'stroller': ['stroller', 'strollers', 'pram'],
+    'limited walking': ['limited walking', 'not much walking', 'less walking', 'minimal walking',
+                        "can't walk far", 'cannot walk far', 'bad knees', 'walking difficulties'],
+    'elevator': ['elevator', 'elevators', 'no stairs', 'avoid stairs'],
+    'hearing': ['hearing impaired', 'deaf'],
+    'visual': ['visually impaired', 'low vision'],
+    'seating': ['benches', 'rest stops'],
+}
+KEYWORD_LEXICON = {
+    'museum': ['museum', 'museums'],
+    'art': ['art', 'arts', 'gallery', 'galleries'],
+    'history': ['history', 'historic', 'historical', 'heritage'],
+    'park': ['park', 'parks'],
+    'beach': ['beach', 'beaches'],
+    'hiking': ['hiking', 'hike', 'hikes', 'trail', 'trails'],
+    'nature': ['nature', 'wildlife', 'outdoors', 'outdoor'],
+    'zoo': ['zoo', 'zoos'],
+    'aquarium': ['aquarium', 'aquariums'],
+    'shopping': ['shopping', 'shops', 'boutiques', 'mall', 'malls'],
+    'market': ['market', 'markets', 'farmers market'],
+    'nightlife': ['nightlife', 'bars', 'clubs', 'cocktails'],
+    'live music': ['live music', 'concert', 'concerts', 'jazz'],
+    'quiet': ['quiet', 'peaceful', 'relaxing', 'calm'],
+    'garden': ['garden', 'gardens', 'botanical'],
+    'architecture': ['architecture'],
+    'science': ['science', 'planetarium'],
+    'theme park': ['theme park', 'theme parks', 'amusement park', 'roller coaster', 'roller coasters'],
+    'scenic views': ['views', 'viewpoint', 'viewpoints', 'scenic', 'sunset', 'lookout'],
+    'sports': ['sports', 'stadium', 'baseball', 'football', 'basketball'],
+    'wine': ['wine', 'winery', 'wineries', 'vineyard', 'vineyards'],
+    'brewery': ['brewery', 'breweries', 'craft beer', 'beer'],
+    'photography': ['photography', 'photo spots', 'instagrammable'],
+    'family-friendly': ['family friendly', 'family-friendly', 'kid friendly', 'kid-friendly', 'kids', 'children'],
+    'water activities': ['kayaking', 'snorkeling', 'boat', 'boating', 'surfing', 'sailing'],
+    'food tour': ['food tour', 'food tours', 'street food'],
+}
+# Words that carry no preference of their own ("I would love some ... food")
+FILLER_WORDS = frozenset("""
+    a an and also any are as at be but by can could do eat eating enjoy for from good great have i i'm im in
+    interested into is it like lots love loves maybe me much my need needs nice of on or our options place
+    places please prefer preferably really require requires required restaurant restaurants cuisine dining
+    food foods see should some spots that the things this to trip us very visit want wants we we're with
+    would looking look friendly access activities travel traveling travelling
+""".split())
+# Anything that changes the meaning of a match is left to the LLM ("no seafood", "not too touristy")
+NEGATION_WORDS = frozenset(['no', 'not', 'avoid', 'without', 'except', 'allergic', 'allergy', 'hate', 'dislike', "don't", 'dont', 'never'])
+
+_LEXICONS = (('cuisine_types', CUISINE_LEXICON), ('accessibility', ACCESSIBILITY_LEXICON), ('keywords', KEYWORD_LEXICON))
+_PHRASES = {
+    phrase: (field, label)
+    for field, lexicon in _LEXICONS
+    for label, phrases in lexicon.items()
+    for phrase in phrases
+}
+_PHRASE_PATTERN = re.compile(
+    r"(?<![\w'-])(" + '|'.join(re.escape(p) for p in sorted(_PHRASES, key=len, reverse=True)) + r")(?![\w'-])"
+)
+
+
+def normalize_request(text: str) -> str:
+    """Lowercase, unify apostrophes and collapse whitespace and trailing punctuation"""
+    text = text.lower().replace('\u2019', "'")
+    return ' '.join(text.split()).strip(' .!?,;')
+
+
+def extract_preferences(normalized: str) -> Tuple[Dict[str, List[str]], List[str]]:
+    """Rule-based extraction; returns (preferences, words the lexicons could not classify)"""
+    result = {'keywords': [], 'cuisine_types': [], 'accessibility': []}
+    for match in _PHRASE_PATTERN.finditer(normalized):
+        field, label = _PHRASES[match.group(1)]
+        if label not in result[field]:
+            result[field].append(label)
+    leftover = _PHRASE_PATTERN.sub(' ', normalized)
+    unclassified = [
+        word for word in re.findall(r"[a-z]+(?:'[a-z]+)?", leftover)
+        if word not in FILLER_WORDS or word in NEGATION_WORDS
+    ]
+    return result, unclassified
+
 
 class PreferencesParser:
-    def __init__(self):
-        self.client = OpenAI(
-            api_key=os.getenv('OPENAI_API_KEY'),
-            timeout=30.0,
-            max_retries=2,
-            **({"base_url": os.getenv("OPENAI_BASE_URL")} if os.getenv("OPENAI_BASE_URL") else {})  # Use base_url if set, otherwise use
-        )
+    def __init__(self, cache=None):
+        # RedisCache (optional): LLM parses shared across workers, keyed by normalised text
+        self.cache = cache
         self.logger = logging.getLogger(__name__)
+        self.stats = {'rules': 0, 'llm': 0, 'cache_hits': 0, 'llm_failures': 0}
+
+    @staticmethod
+    def cache_key(normalized: str) -> str:
+        digest = hashlib.sha256(normalized.encode()).hexdigest()
+        return f"preferences:v{PREFERENCES_CACHE_VERSION}:{digest}"
 
     async def parse_special_requests(self, text: Optional[str]) -> Dict:
-        """Parse special requests using GPT-3.5-turbo"""
-        if not text:
+        """Parse special requests: local lexicons first, GPT-3.5-turbo only for what they can't classify"""
+        if not text or not text.strip():
             return self.default_preferences()
 
+        normalized = normalize_request(text)
+        # 🚀 SPEED OPTIMIZATION: Common phrasings are answered locally with no LLM round trip
+        extracted, unclassified = extract_preferences(normalized)
+        if not unclassified:
+            self.stats['rules'] += 1
+            self.logger.info(f"Parsed preferences locally from text: {text} -> {extracted}")
+            return extracted
+
+        key = self.cache_key(normalized)
+        if self.cache:
+            cached = await self.cache.get(key)
+            if cached:
+                self.stats['cache_hits'] += 1
+                # Cached values are shared (local tier), hand out a copy
+                return {field: list(values) for field, values in cached.items()}
+
+        self.stats['llm'] += 1
+        self.logger.info(f"Unclassified words {unclassified} - asking the LLM")
+        # A negation can invert a lexicon match ("no seafood"), so then only the model's reading counts
+        negated = bool(NEGATION_WORDS.intersection(unclassified))
+        parsed = await self._parse_with_llm(text)
+        if parsed is None:
+            self.stats['llm_failures'] += 1
+            return self.default_preferences() if negated else extracted
+
+        if not negated:
+            # Keep anything the lexicons found that the model left out
+            for field, values in extracted.items():
+                parsed[field] = list(dict.fromkeys(parsed[field] + values))
+        if self.cache:
+            await self.cache.set(key, parsed, 'preferences')
+        return {field: list(values) for field, values in parsed.items()}
+
+    async def _parse_with_llm(self, text: str) -> Optional[Dict]:
+        """Parse special requests using GPT-3.5-turbo; None if the call or its JSON fails"""
         try:
             prompt = """
             Extract travel preferences from the text below as JSON with these keys only:
@@ -28,42 +180,44 @@ class PreferencesParser:
             
             Example inputs and outputs:
             Input: "Looking for Japanese food and quiet museums, need wheelchair access"
-            Output: {
+            Output: {{
                 "keywords": ["quiet", "museum"],
                 "cuisine_types": ["Japanese"],
                 "accessibility": ["wheelchair"]
-            }
+            }}
 
             Input: "I would prefer Chinese restaurants"
-            Output: {
+            Output: {{
                 "keywords": [],
                 "cuisine_types": ["Chinese"],
                 "accessibility": []
-            }
+            }}
 
             Input: "I prefer Italian food"
-            Output: {
+            Output: {{
                 "keywords": [],
                 "cuisine_types": ["Italian"],
                 "accessibility": []
-            }
+            }}
 
             Text: {text}
             
             Return only the JSON, no other text.
             """
 
-            response = await self.client.chat.completions.create(
+            response = await get_llm_gateway().complete(
                 model="gpt-3.5-turbo",
                 messages=[{
                     "role": "user",
                     "content": prompt.format(text=text)
                 }],
                 temperature=0.3,
-                max_tokens=150
+                max_tokens=150,
+                timeout=30.0,
+                purpose="preferences"
             )
 
-            content = response.choices[0].message.content.strip()
+            content = response.content.strip()
             # Remove any non-JSON text that might be around the JSON object
             json_start = content.find('{')
             json_end = content.rfind('}') + 1
@@ -84,11 +238,19 @@ class PreferencesParser:
                 return result
             except json.JSONDecodeError as e:
                 self.logger.error(f"Error parsing JSON response: {str(e)}, content: {content}")
-                return self.default_preferences()
+                return None
 
         except Exception as e:
             self.logger.error(f"Error parsing preferences: {str(e)}")
-            return self.default_preferences()
+            return None
+
+    def get_stats(self) -> Dict:
+        """How special requests were answered: locally, by the LLM or from cache"""
+        total = self.stats['rules'] + self.stats['llm'] + self.stats['cache_hits']
+        return {
+            **self.stats,
+            'rule_share': round(self.stats['rules'] / total, 3) if total else 0.0
+        }
 
     def default_preferences(self) -> Dict:
         """Return default preferences when none are specified"""
@@ -129,7 +291,8 @@ class PreferencesParser:
         start_date: Optional[str]
     ) -> Dict:
         """Enhance preferences based on user parameters"""
-        enhanced = preferences.copy()
+        # Copy the lists too: parsed preferences may be shared cache values
+        enhanced = {key: list(value) if isinstance(value, list) else value for key, value in preferences.items()}
         
         # Add kid-friendly keywords
         if with_kids and kids_age:
@@ -1,18 +1,27 @@
 import logging
-from typing import Dict, List, Optional, Any
+from typing import AsyncIterator, Dict, List, Optional, Any
 from .places_client import GooglePlacesClient
 from .preferences import PreferencesParser
+from .stage_graph import StageGraph, StageStats
+from .streaming import events_from_callback
+from .deadline import budget_timeout
 import asyncio
 import json
 import aiohttp
 from fastapi import HTTPException
 
+# Per-search budget in generate_recommendations' stage graph
+SEARCH_STAGE_TIMEOUT = 5.0
+# Per-search budget in the streaming variant
+STREAM_SEARCH_TIMEOUT = 10.0
+
 class RecommendationGenerator:
     def __init__(self, places_client: Optional[GooglePlacesClient] = None):
         self.places_client = places_client if places_client else GooglePlacesClient()
-        self.preferences_parser = PreferencesParser()
+        self.preferences_parser = PreferencesParser(cache=self.places_client.cache)
         self.logger = logging.getLogger(__name__)
         self.default_photo_max_width = 800 # Default max width for photos
+        self.stage_stats = StageStats()
 
     def format_place(self, place: Dict[str, Any], photo_max_width: Optional[int] = None) -> Dict[str, Any]:
         """Format a Google Place into our standard format, including full photo URLs."""
@@ -212,6 +221,334 @@ class RecommendationGenerator:
         
         return "Local establishment"
 
+    def _validate_dates(self, start_date: Optional[str], end_date: Optional[str]) -> Optional[str]:
+        """Return an error message if the trip dates are not YYYY-MM-DD"""
+        if start_date and end_date:
+            try:
+                from datetime import datetime
+                datetime.strptime(start_date, "%Y-%m-%d")
+                datetime.strptime(end_date, "%Y-%m-%d")
+            except ValueError as e:
+                self.logger.error(f"Invalid date format: {str(e)}")
+                return "Invalid date format. Please use YYYY-MM-DD format."
+        return None
+
+    async def _resolve_preferences(
+        self,
+        special_requests: Optional[str],
+        with_kids: bool,
+        kids_age: Optional[List[int]],
+        with_elderly: bool,
+        start_date: Optional[str]
+    ) -> Dict[str, Any]:
+        """Parse special requests and enhance them with the trip parameters"""
+        # 1. Parse special requests
+        preferences = await self.preferences_parser.parse_special_requests(special_requests)
+        
+        # 2. Enhance preferences based on user parameters
+        return self.preferences_parser.enhance_preferences(
+            preferences,
+            with_kids,
+            kids_age,
+            with_elderly,
+            start_date
+        )
+
+    async def _geocode_destination(self, destination: str) -> Dict[str, float]:
+        # 3. Get location coordinates using the client's geocode method
+        location = await self.places_client.geocode(destination)
+        if not location:
+            self.logger.error(f"Could not geocode destination: {destination}")
+            raise HTTPException(status_code=404, detail=f"Could not find location for destination: {destination}")
+        return location
+
+    def _landmark_types_config(self, destination: str, with_kids: bool, special_requests: Optional[str]) -> List[Dict[str, Any]]:
+        # 4. Refined search for landmarks and restaurants
+        # 🎯 COST OPTIMIZED: Reduced landmark types configuration
+        # Consolidate similar types to reduce API calls
+        base_landmark_configs = [
+            # Combine tourist attractions and theme parks into one search
+            {'type': 'tourist_attraction', 'keywords': ['famous', 'popular', 'top attraction', 'must visit']},
+            # Museums and cultural sites
+            {'type': 'museum', 'keywords': ['art', 'history', 'science', 'cultural']},
+            # Parks and outdoor spaces (combine park types)
+            {'type': 'park', 'keywords': ['national park', 'botanical garden', 'famous park']},
+            # Family entertainment (combine zoo/aquarium for efficiency)
+            {'type': 'zoo', 'keywords': ['zoo', 'aquarium', 'wildlife']},
+        ]
+
+        # Destination-specific adjustments (simple heuristic)
+        landmark_types_config = list(base_landmark_configs) # Start with a copy
+
+        # Remove hardcoded city logic - let Google Places API handle relevance
+        if special_requests and "farm" in special_requests.lower() and with_kids: # If user mentions farm
+            landmark_types_config.append({'type': 'tourist_attraction', 'keywords': ['farm', 'petting zoo']})
+        
+        # Adjust types based on company (kids/elderly) - but keep it minimal
+        if with_kids:
+            # Only add playground if not already covered by parks
+            landmark_types_config.append({'type': 'amusement_park', 'keywords': ['theme park', 'amusement park']})
+        else:
+            # Add art galleries for adults, but combine with museum search for efficiency
+            if any(c['type'] == 'museum' for c in landmark_types_config):
+                # Add art gallery keywords to existing museum search
+                for config in landmark_types_config:
+                    if config['type'] == 'museum':
+                        config['keywords'].extend(['art gallery', 'gallery'])
+                        break
+            else:
+                landmark_types_config.append({'type': 'art_gallery', 'keywords': ['art', 'gallery']})
+
+        # Remove duplicates that might have been added, prioritizing earlier entries
+        unique_landmark_configs = []
+        seen_types = set()
+        for config in landmark_types_config:
+            if config['type'] not in seen_types:
+                unique_landmark_configs.append(config)
+                seen_types.add(config['type'])
+        landmark_types_config = unique_landmark_configs
+
+        self.logger.info(f"💰 Cost-optimized landmark_types_config for {destination}: {json.dumps(landmark_types_config)}")
+        return landmark_types_config
+
+    def _restaurant_keywords(self, enhanced_preferences: Dict[str, Any]) -> List[str]:
+        restaurant_keywords = enhanced_preferences.get('cuisine_types', [])
+        self.logger.info(f"Initial restaurant keywords: {restaurant_keywords}")
+        
+        # Simplify cuisine keywords for better API results
+        simplified_keywords = []
+        if restaurant_keywords:
+            for keyword in restaurant_keywords:
+                # Just use the basic cuisine type, not complex combinations
+                simplified_keywords.append(keyword.lower())
+            
+            # For Chinese specifically, just use 'chinese' - don't add extra terms
+            # The API works better with simple keywords
+            if any('chinese' in kw.lower() for kw in simplified_keywords):
+                simplified_keywords = ['chinese']  # Use only 'chinese' for best results
+                self.logger.info("Simplified Chinese restaurant search to use only 'chinese' keyword")
+        
+        self.logger.info(f"Final restaurant keywords for search: {simplified_keywords}")
+        return simplified_keywords
+
+    def _search_landmarks(self, location: Dict[str, float], config: Dict[str, Any], enhanced_preferences: Dict[str, Any]):
+        # Combine base keywords from preferences with type-specific keywords
+        current_keywords = list(set(enhanced_preferences.get('keywords', []) + config.get('keywords', [])))
+        self.logger.info(f"Searching for type: {config['type']} with keywords: {current_keywords}")
+        return self.places_client.get_places(
+            location=location,
+            place_type=config['type'],
+            keywords=current_keywords if current_keywords else None, # Pass None if no keywords
+            max_results=12  # Get more results per type to have a larger pool for popularity ranking
+        )
+
+    def _search_restaurants(self, location: Dict[str, float], keywords: List[str], special_requests: Optional[str]):
+        return self.places_client.get_places(
+            location=location,
+            place_type='restaurant',
+            keywords=keywords if keywords else None,
+            max_results=20,  # 💰 Increased from 10 to 20 to get more restaurant options
+            special_requests=special_requests  # Pass special_requests to affect caching
+        )
+
+    def _format_landmarks(self, result_sets: List[Any]) -> Dict[str, Dict[str, Any]]:
+        """Format get_places landmark results into {name: place}, skipping failed searches"""
+        landmarks = {}
+        for result_set in result_sets:
+            if isinstance(result_set, Exception):
+                self.logger.error(f"Error fetching places: {str(result_set)}")
+                continue
+                
+            if not result_set:  # Skip empty results
+                continue
+                
+            for place in result_set:
+                try:
+                    if not isinstance(place, dict):
+                        self.logger.warning(f"Skipping invalid place data: {place}")
+                        continue
+                        
+                    # Get the actual place data, whether it's nested or not
+                    place_data = place.get('result', place)
+                    
+                    # Check for name in both top level and nested result
+                    name = place_data.get('name') or place.get('name')
+                    if not name:
+                        self.logger.warning(f"Skipping place without name: {place}")
+                        continue
+                        
+                    # 🚀 SPEED OPTIMIZATION: Skip opening hours date check for faster /generate
+                    # Note: Date filtering removed for speed optimization in /generate endpoint
+                    # This functionality can be added back in /complete-itinerary if needed
+                            
+                    formatted_place = self.format_place(place)
+                    landmarks[formatted_place['name']] = formatted_place
+                except Exception as e:
+                    self.logger.error(f"Error processing place: {str(e)}")
+                    continue
+        return landmarks
+
+    def _format_restaurants(self, restaurant_results: Any, enhanced_preferences: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """Format and priority-sort get_places restaurant results into {name: place}"""
+        restaurants = {}
+        
+        if isinstance(restaurant_results, Exception):
+            self.logger.error(f"Restaurant search failed with exception: {str(restaurant_results)}")
+        elif not restaurant_results:
+            self.logger.warning("No restaurant results returned from Google Places API.")
+        else:
+            self.logger.info(f"Processing {len(restaurant_results)} restaurants.")
+            
+            for place_container in restaurant_results:
+                try:
+                    if not isinstance(place_container, dict):
+                        continue
+                        
+                    place_data = place_container.get('result', place_container)
+                    name = place_data.get('name')
+                    if not name:
+                        continue
+                    
+                    # Format the place
+                    formatted_place = self.format_place(place_container)
+                    
+                    # Add types from the original place data
+                    formatted_place['types'] = place_data.get('types', [])
+                    
+                    # Calculate priority score
+                    priority_score = self._calculate_restaurant_priority(
+                        formatted_place,
+                        enhanced_preferences.get('cuisine_types', [])
+                    )
+                    formatted_place['_priority_score'] = priority_score
+                    
+                    # Add to restaurants dictionary
+                    restaurants[name] = formatted_place
+                    
+                except Exception as e:
+                    self.logger.exception(f"Error processing restaurant: {str(e)}")
+                    continue
+            
+            # Sort restaurants by priority score
+            if restaurants:
+                sorted_restaurants = dict(
+                    sorted(
+                        restaurants.items(),
+                        key=lambda x: x[1].get('_priority_score', 0),
+                        reverse=True
+                    )
+                )
+                restaurants = sorted_restaurants
+                self.logger.info(f"Successfully processed {len(restaurants)} restaurants.")
+        return restaurants
+
+    def _rank_landmarks(self, landmarks: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Keep the most popular landmarks, ordered by popularity score"""
+        # --- Start: Enhanced Popularity Ranking Logic for Landmarks ---
+        if landmarks:
+            # Convert landmarks dict to a list for sorting
+            landmark_list = list(landmarks.values())
+            
+            # Calculate popularity score for each landmark
+            for landmark in landmark_list:
+                popularity_score = self._calculate_landmark_popularity_score(landmark)
+                landmark['_popularity_score'] = popularity_score
+            
+            # Sort by popularity score (descending)
+            landmark_list.sort(key=lambda x: x.get('_popularity_score', 0), reverse=True)
+            
+            # Log top landmarks for debugging
+            self.logger.info(f"Top 5 most popular landmarks by score:")
+            for i, landmark in enumerate(landmark_list[:5]):
+                score = landmark.get('_popularity_score', 0)
+                reviews = landmark.get('user_ratings_total', 0)
+                rating = landmark.get('rating', 0)
+                self.logger.info(f"  {i+1}. {landmark.get('name')} - Score: {score:.1f} (Reviews: {reviews}, Rating: {rating})")
+            
+            # Select top 15 most popular landmarks
+            max_ranked_landmarks = 15
+            ranked_landmarks_list = landmark_list[:max_ranked_landmarks]
+            
+            # Convert back to a dictionary for consistency
+            landmarks = {lm['name']: lm for lm in ranked_landmarks_list}
+            self.logger.info(f"Selected top {len(landmarks)} most popular landmarks from {len(landmark_list)} total.")
+        # --- End: Enhanced Popularity Ranking Logic for Landmarks ---
+        return landmarks
+
+    def _build_stage_graph(
+        self,
+        destination: str,
+        with_kids: bool,
+        kids_age: Optional[List[int]],
+        with_elderly: bool,
+        special_requests: Optional[str],
+        start_date: Optional[str],
+        search_timeout: float = SEARCH_STAGE_TIMEOUT
+    ) -> StageGraph:
+        """preferences, geocode -> radius -> per-type searches -> ranking.
+
+        Place details are fetched inside each search (get_places enriches its
+        results), so they run per type rather than as one separate stage.
+        """
+        graph = StageGraph("generate_recommendations")
+        landmark_types_config = self._landmark_types_config(destination, with_kids, special_requests)
+
+        async def preferences(_):
+            return await self._resolve_preferences(special_requests, with_kids, kids_age, with_elderly, start_date)
+
+        async def geocode(_):
+            return await self._geocode_destination(destination)
+
+        async def radius(inputs):
+            # Warms the per-cell radius cache so the searches don't each reverse geocode
+            return await self.places_client.calculate_radius(inputs["geocode"])
+
+        def search(start_search):
+            async def run(inputs):
+                try:
+                    return await asyncio.wait_for(start_search(inputs), timeout=budget_timeout(search_timeout))
+                except asyncio.CancelledError:
+                    if asyncio.current_task().cancelling():
+                        raise  # The request itself is being cancelled
+                    # Something inside the search was cancelled: a failed search like any other
+                    self.logger.error(f"Search stage cancelled for {destination}")
+                    return RuntimeError("search cancelled")
+                except Exception as e:
+                    # Same contract as gather(return_exceptions=True): ranking skips failed searches
+                    self.logger.error(f"Search stage failed for {destination}: {type(e).__name__} {str(e)}")
+                    return e
+            return run
+
+        search_deps = ["preferences", "geocode", "radius"]
+        graph.add("preferences", preferences)
+        graph.add("geocode", geocode)
+        graph.add("radius", radius, deps=["geocode"])
+        landmark_stages = []
+        for config in landmark_types_config:
+            name = f"search:{config['type']}"
+            graph.add(name, search(
+                lambda inputs, config=config: self._search_landmarks(inputs["geocode"], config, inputs["preferences"])
+            ), deps=search_deps)
+            landmark_stages.append(name)
+        graph.add("search:restaurant", search(
+            lambda inputs: self._search_restaurants(
+                inputs["geocode"], self._restaurant_keywords(inputs["preferences"]), special_requests
+            )
+        ), deps=search_deps)
+
+        async def ranking(inputs):
+            restaurant_results = inputs["search:restaurant"]
+            landmark_results = [inputs[name] for name in landmark_stages]
+            if isinstance(restaurant_results, asyncio.TimeoutError) and all(isinstance(r, Exception) for r in landmark_results):
+                raise HTTPException(status_code=504, detail="Request timed out. Please try again.")
+            return {
+                "landmarks": self._rank_landmarks(self._format_landmarks(landmark_results)),
+                "restaurants": self._format_restaurants(restaurant_results, inputs["preferences"])
+            }
+
+        graph.add("ranking", ranking, deps=["preferences", "search:restaurant"] + landmark_stages)
+        return graph
+
     async def generate_recommendations(
         self,
         destination: str,
@@ -225,277 +562,26 @@ class RecommendationGenerator:
     ) -> Dict[str, Any]:
         try:
             # Validate dates if provided
-            if start_date and end_date:
-                try:
-                    from datetime import datetime
-                    datetime.strptime(start_date, "%Y-%m-%d")
-                    datetime.strptime(end_date, "%Y-%m-%d")
-                except ValueError as e:
-                    self.logger.error(f"Invalid date format: {str(e)}")
-                    return {
-                        "error": "Invalid date format. Please use YYYY-MM-DD format.",
-                        "landmarks": {},
-                        "restaurants": {}
-                    }
+            date_error = self._validate_dates(start_date, end_date)
+            if date_error:
+                return {
+                    "error": date_error,
+                    "landmarks": {},
+                    "restaurants": {}
+                }
 
-            # 1. Parse special requests
-            preferences = await self.preferences_parser.parse_special_requests(special_requests)
-            
-            # 2. Enhance preferences based on user parameters
-            enhanced_preferences = self.preferences_parser.enhance_preferences(
-                preferences,
-                with_kids,
-                kids_age,
-                with_elderly,
-                start_date
-            )
-            
-            # 3. Get location coordinates using the client's geocode method
-            location = await self.places_client.geocode(destination)
-            if not location:
-                self.logger.error(f"Could not geocode destination: {destination}")
-                raise HTTPException(status_code=404, detail=f"Could not find location for destination: {destination}")
-                
-            # 4. Refined search for landmarks and restaurants
-            # 🎯 COST OPTIMIZED: Reduced landmark types configuration
-            # Consolidate similar types to reduce API calls
-            base_landmark_configs = [
-                # Combine tourist attractions and theme parks into one search
-                {'type': 'tourist_attraction', 'keywords': ['famous', 'popular', 'top attraction', 'must visit']},
-                # Museums and cultural sites
-                {'type': 'museum', 'keywords': ['art', 'history', 'science', 'cultural']},
-                # Parks and outdoor spaces (combine park types)
-                {'type': 'park', 'keywords': ['national park', 'botanical garden', 'famous park']},
-                # Family entertainment (combine zoo/aquarium for efficiency)
-                {'type': 'zoo', 'keywords': ['zoo', 'aquarium', 'wildlife']},
-            ]
-
-            # Destination-specific adjustments (simple heuristic)
-            landmark_types_config = list(base_landmark_configs) # Start with a copy
-
-            # Remove hardcoded city logic - let Google Places API handle relevance
-            if special_requests and "farm" in special_requests.lower() and with_kids: # If user mentions farm
-                landmark_types_config.append({'type': 'tourist_attraction', 'keywords': ['farm', 'petting zoo']})
-            
-            # Adjust types based on company (kids/elderly) - but keep it minimal
-            if with_kids:
-                # Only add playground if not already covered by parks
-                landmark_types_config.append({'type': 'amusement_park', 'keywords': ['theme park', 'amusement park']})
-            else:
-                # Add art galleries for adults, but combine with museum search for efficiency
-                if any(c['type'] == 'museum' for c in landmark_types_config):
-                    # Add art gallery keywords to existing museum search
-                    for config in landmark_types_config:
-                        if config['type'] == 'museum':
-                            config['keywords'].extend(['art gallery', 'gallery'])
-                            break
-                else:
-                    landmark_types_config.append({'type': 'art_gallery', 'keywords': ['art', 'gallery']})
-
-            # Remove duplicates that might have been added, prioritizing earlier entries
-            unique_landmark_configs = []
-            seen_types = set()
-            for config in landmark_types_config:
-                if config['type'] not in seen_types:
-                    unique_landmark_configs.append(config)
-                    seen_types.add(config['type'])
-            landmark_types_config = unique_landmark_configs
-
-            self.logger.info(f"💰 Cost-optimized landmark_types_config for {destination}: {json.dumps(landmark_types_config)}")
-
-            landmark_tasks = []
-            for config in landmark_types_config:
-                # Combine base keywords from preferences with type-specific keywords
-                current_keywords = list(set(enhanced_preferences.get('keywords', []) + config.get('keywords', [])))
-                self.logger.info(f"Searching for type: {config['type']} with keywords: {current_keywords}")
-                landmark_tasks.append(
-                    self.places_client.get_places(
-                        location=location,
-                        place_type=config['type'],
-                        keywords=current_keywords if current_keywords else None, # Pass None if no keywords
-                        max_results=12  # Get more results per type to have a larger pool for popularity ranking
-                    )
-                )
-            
-            restaurant_keywords = enhanced_preferences.get('cuisine_types', [])
-            self.logger.info(f"Initial restaurant keywords: {restaurant_keywords}")
-            
-            # Simplify cuisine keywords for better API results
-            simplified_keywords = []
-            if restaurant_keywords:
-                for keyword in restaurant_keywords:
-                    # Just use the basic cuisine type, not complex combinations
-                    simplified_keywords.append(keyword.lower())
-                
-                # For Chinese specifically, just use 'chinese' - don't add extra terms
-                # The API works better with simple keywords
-                if any('chinese' in kw.lower() for kw in simplified_keywords):
-                    simplified_keywords = ['chinese']  # Use only 'chinese' for best results
-                    self.logger.info("Simplified Chinese restaurant search to use only 'chinese' keyword")
-            
-            self.logger.info(f"Final restaurant keywords for search: {simplified_keywords}")
-            restaurant_task = self.places_client.get_places(
-                location=location,
-                place_type='restaurant',
-                keywords=simplified_keywords if simplified_keywords else None,
-                max_results=20,  # 💰 Increased from 10 to 20 to get more restaurant options
-                special_requests=special_requests  # Pass special_requests to affect caching
-            )
-            
-            # Execute all tasks in parallel with timeout
+            # 🚀 SPEED OPTIMIZATION: Each stage starts as soon as its inputs are ready,
+            # so the preferences LLM call no longer delays geocoding and the searches
+            graph = self._build_stage_graph(destination, with_kids, kids_age, with_elderly, special_requests, start_date)
             try:
-                # First try to get restaurants since that's the primary request
-                restaurant_result = await asyncio.wait_for(
-                    restaurant_task,
-                    timeout=5  # 5 seconds timeout for restaurants
-                )
-                
-                # Then get landmarks in parallel, but limit concurrent requests
-                landmark_results = await asyncio.wait_for(
-                    asyncio.gather(*landmark_tasks, return_exceptions=True),  # Use all landmark tasks
-                    timeout=5  # 5 seconds timeout for landmarks
-                )
-                
-                all_results = list(landmark_results)
-                all_results.append(restaurant_result)
-                
-            except asyncio.TimeoutError:
-                self.logger.error(f"API timeout for {destination}. Restaurant result: {restaurant_result if 'restaurant_result' in locals() else 'None'}")
-                # If we have restaurant results but landmarks timed out, continue with what we have
-                if 'restaurant_result' in locals() and restaurant_result:
-                    all_results = [restaurant_result]
-                    self.logger.info("Continuing with restaurant results only")
-                else:
-                    raise HTTPException(
-                        status_code=504,
-                        detail="Request timed out. Please try again."
-                    )
-            except Exception as e:
-                self.logger.error(f"Error in parallel API calls: {str(e)}")
-                # If we have any results, continue with those
-                if 'restaurant_result' in locals() and restaurant_result:
-                    all_results = [restaurant_result]
-                    self.logger.info("Continuing with restaurant results after error")
-                else:
-                    raise HTTPException(status_code=500, detail="Failed to fetch place data from Google Places API")
-            
-            # Process landmark results
-            landmarks = {}
-            for result_set in all_results[:-1]:  # All except the last one (restaurants)
-                if isinstance(result_set, Exception):
-                    self.logger.error(f"Error fetching places: {str(result_set)}")
-                    continue
-                    
-                if not result_set:  # Skip empty results
-                    continue
-                    
-                for place in result_set:
-                    try:
-                        if not isinstance(place, dict):
-                            self.logger.warning(f"Skipping invalid place data: {place}")
-                            continue
-                            
-                        # Get the actual place data, whether it's nested or not
-                        place_data = place.get('result', place)
-                        
-                        # Check for name in both top level and nested result
-                        name = place_data.get('name') or place.get('name')
-                        if not name:
-                            self.logger.warning(f"Skipping place without name: {place}")
-                            continue
-                            
-                        # 🚀 SPEED OPTIMIZATION: Skip opening hours date check for faster /generate
-                        # Note: Date filtering removed for speed optimization in /generate endpoint
-                        # This functionality can be added back in /complete-itinerary if needed
-                                
-                        formatted_place = self.format_place(place)
-                        landmarks[formatted_place['name']] = formatted_place
-                    except Exception as e:
-                        self.logger.error(f"Error processing place: {str(e)}")
-                        continue
-            
-            # Process restaurant results
-            restaurants = {}
-            restaurant_results = all_results[-1]
-            
-            if isinstance(restaurant_results, Exception):
-                self.logger.error(f"Restaurant search failed with exception: {str(restaurant_results)}")
-            elif not restaurant_results:
-                self.logger.warning("No restaurant results returned from Google Places API.")
-            else:
-                self.logger.info(f"Processing {len(restaurant_results)} restaurants.")
-                
-                for place_container in restaurant_results:
-                    try:
-                        if not isinstance(place_container, dict):
-                            continue
-                            
-                        place_data = place_container.get('result', place_container)
-                        name = place_data.get('name')
-                        if not name:
-                            continue
-                        
-                        # Format the place
-                        formatted_place = self.format_place(place_container)
-                        
-                        # Add types from the original place data
-                        formatted_place['types'] = place_data.get('types', [])
-                        
-                        # Calculate priority score
-                        priority_score = self._calculate_restaurant_priority(
-                            formatted_place,
-                            enhanced_preferences.get('cuisine_types', [])
-                        )
-                        formatted_place['_priority_score'] = priority_score
-                        
-                        # Add to restaurants dictionary
-                        restaurants[name] = formatted_place
-                        
-                    except Exception as e:
-                        self.logger.exception(f"Error processing restaurant: {str(e)}")
-                        continue
-                
-                # Sort restaurants by priority score
-                if restaurants:
-                    sorted_restaurants = dict(
-                        sorted(
-                            restaurants.items(),
-                            key=lambda x: x[1].get('_priority_score', 0),
-                            reverse=True
-                        )
-                    )
-                    restaurants = sorted_restaurants
-                    self.logger.info(f"Successfully processed {len(restaurants)} restaurants.")
-
-            # --- Start: Enhanced Popularity Ranking Logic for Landmarks ---
-            if landmarks:
-                # Convert landmarks dict to a list for sorting
-                landmark_list = list(landmarks.values())
-                
-                # Calculate popularity score for each landmark
-                for landmark in landmark_list:
-                    popularity_score = self._calculate_landmark_popularity_score(landmark)
-                    landmark['_popularity_score'] = popularity_score
-                
-                # Sort by popularity score (descending)
-                landmark_list.sort(key=lambda x: x.get('_popularity_score', 0), reverse=True)
-                
-                # Log top landmarks for debugging
-                self.logger.info(f"Top 5 most popular landmarks by score:")
-                for i, landmark in enumerate(landmark_list[:5]):
-                    score = landmark.get('_popularity_score', 0)
-                    reviews = landmark.get('user_ratings_total', 0)
-                    rating = landmark.get('rating', 0)
-                    self.logger.info(f"  {i+1}. {landmark.get('name')} - Score: {score:.1f} (Reviews: {reviews}, Rating: {rating})")
-                
-                # Select top 15 most popular landmarks
-                max_ranked_landmarks = 15
-                ranked_landmarks_list = landmark_list[:max_ranked_landmarks]
-                
-                # Convert back to a dictionary for consistency
-                landmarks = {lm['name']: lm for lm in ranked_landmarks_list}
-                self.logger.info(f"Selected top {len(landmarks)} most popular landmarks from {len(landmark_list)} total.")
-            # --- End: Enhanced Popularity Ranking Logic for Landmarks ---
+                stage_results = await graph.run()
+            finally:
+                self.stage_stats.record(graph)
+                durations = {name: t['duration_ms'] for name, t in graph.timings.items()}
+                self.logger.info(f"⏱️ Stage timings (ms) for {destination}: {durations}")
+                self.logger.info(f"⏱️ Critical path: {' -> '.join(graph.critical_path())}")
+            landmarks = stage_results["ranking"]["landmarks"]
+            restaurants = stage_results["ranking"]["restaurants"]
 
             self.logger.info(f"Found {len(landmarks)} landmarks and {len(restaurants)} restaurants after ranking/trimming.")
             
@@ -520,6 +606,92 @@ class RecommendationGenerator:
             # For other general errors, return a 500. The RAG bug needs to be fixed regardless.
             raise HTTPException(status_code=500, detail=f"An unexpected error occurred while generating recommendations for {destination}.")
 
+    async def stream_recommendations(
+        self,
+        destination: str,
+        travel_days: int,
+        with_kids: bool = False,
+        kids_age: Optional[List[int]] = None,
+        with_elderly: bool = False,
+        special_requests: Optional[str] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        timeout: float = STREAM_SEARCH_TIMEOUT
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Same stage graph as generate_recommendations, yielded as events while it runs.
+
+        Emits a "start" event, one "landmarks"/"restaurants" event per finished
+        search (only places not already sent), then a "summary" event carrying the
+        ranked result in the /generate shape, or an "error" event. If the client
+        goes away the graph is cancelled; searches shared with other requests
+        through single-flight keep running for them.
+        """
+        date_error = self._validate_dates(start_date, end_date)
+        if date_error:
+            yield {"event": "error", "status_code": 400, "detail": date_error}
+            return
+
+        graph = self._build_stage_graph(
+            destination, with_kids, kids_age, with_elderly, special_requests, start_date, search_timeout=timeout
+        )
+        search_stages = [name for name in graph.stage_names if name.startswith("search:")]
+
+        async def run(emit):
+            planned: Dict[str, Any] = {}
+            sent: Dict[str, set] = {"landmarks": set(), "restaurants": set()}
+
+            # 🚀 SPEED OPTIMIZATION: Hand each search to the client as soon as it lands
+            # instead of waiting for the slowest one
+            def on_stage(name: str, result: Any):
+                if name in ("preferences", "geocode"):
+                    planned[name] = result
+                    if len(planned) == 2:
+                        emit({
+                            "event": "start",
+                            "destination": destination,
+                            "location": planned["geocode"],
+                            "searches": [stage.split(":", 1)[1] for stage in search_stages]
+                        })
+                    return
+                if not name.startswith("search:"):
+                    return
+                place_type = name.split(":", 1)[1]
+                if place_type == "restaurant":
+                    kind, formatted = "restaurants", self._format_restaurants(result, planned["preferences"])
+                else:
+                    kind, formatted = "landmarks", self._format_landmarks([result])
+                new_places = [place for place_name, place in formatted.items() if place_name not in sent[kind]]
+                sent[kind].update(place['name'] for place in new_places)
+                event = {"event": kind, "places": new_places}
+                if kind == "landmarks":
+                    event["place_type"] = place_type
+                emit(event)
+
+            try:
+                stage_results = await graph.run(on_stage=on_stage)
+            except HTTPException as e:
+                return {"event": "error", "status_code": e.status_code, "detail": e.detail}
+            except Exception as e:
+                self.logger.exception(f"Error streaming recommendations for {destination}: {str(e)}")
+                return {"event": "error", "status_code": 500, "detail": f"An unexpected error occurred while generating recommendations for {destination}."}
+            finally:
+                self.stage_stats.record(graph)
+
+            ranked = stage_results["ranking"]
+            if not ranked["landmarks"] and not ranked["restaurants"]:
+                self.logger.error(f"No landmarks or restaurants found for {destination}.")
+                return {"event": "error", "status_code": 404, "detail": f"Could not find sufficient information for {destination}"}
+            return {
+                "event": "summary",
+                "recommendations": {
+                    "landmarks": list(ranked["landmarks"].values()),
+                    "restaurants": list(ranked["restaurants"].values())
+                }
+            }
+
+        async for event in events_from_callback(run):
+            yield event
+
  
 
     def _calculate_landmark_popularity_score(self, landmark: Dict[str, Any]) -> float:
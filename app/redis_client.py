@@ -1,20 +1,39 @@
 import os
 import logging
 import asyncio
-from typing import Optional
+from typing import Any, Dict, List, Optional, Set, Tuple
 import redis.asyncio as aioredis
 from dotenv import load_dotenv
+from .deadline import budget_timeout
 
 load_dotenv()
 
+# Compare-and-delete so a lock holder never releases a lease that has
+# already expired and been re-acquired by another worker
+_DELETE_IF_EQUALS_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
 class RedisClient:
     """Redis client connection manager with async support"""
     
-    def __init__(self, redis_url: Optional[str] = None):
+    def __init__(self, redis_url: Optional[str] = None, auto_pipeline: Optional[bool] = None):
         self.redis_url = redis_url or os.getenv('REDIS_URL')
         self.client: Optional[aioredis.Redis] = None
         self.logger = logging.getLogger(__name__)
         self._connection_lock = asyncio.Lock()
+        # 🚀 SPEED OPTIMIZATION: Commands issued in the same event-loop tick share one pipeline round trip
+        # (opt-in, enabled in cloudbuild.yaml and render.yaml)
+        if auto_pipeline is None:
+            auto_pipeline = os.getenv('REDIS_AUTO_PIPELINE', 'false').lower() == 'true'
+        self.auto_pipeline = auto_pipeline
+        self._pending: List[Tuple[str, tuple, dict, asyncio.Future]] = []
+        # The event loop only keeps weak references to tasks; hold flushes until they finish
+        self._flushes: Set[asyncio.Task] = set()
+        self.pipeline_stats = {'flushes': 0, 'commands': 0}
 
     async def get_client(self) -> aioredis.Redis:
         """Get Redis client instance, create new connection if not exists"""
@@ -44,26 +63,110 @@ class RedisClient:
             self.logger.error(f"Failed to create Redis connection: {str(e)}")
             raise
 
+    async def _command(self, name: str, *args, **kwargs) -> Any:
+        """Run a single Redis command, batching it into the current tick's pipeline when auto-pipelining"""
+        if not self.auto_pipeline:
+            client = await self.get_client()
+            return await getattr(client, name)(*args, **kwargs)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((name, args, kwargs, future))
+        if len(self._pending) == 1:
+            # First command of this tick schedules the flush; later ones just join the batch
+            task = asyncio.get_running_loop().create_task(self._flush_pending())
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+        return await future
+
+    async def _flush_pending(self):
+        """Send every command queued during the previous tick as one non-transactional pipeline"""
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        try:
+            client = await self.get_client()
+            pipe = client.pipeline(transaction=False)
+            for name, args, kwargs, _ in batch:
+                getattr(pipe, name)(*args, **kwargs)
+            results = await pipe.execute(raise_on_error=False)
+            self.pipeline_stats['flushes'] += 1
+            self.pipeline_stats['commands'] += len(batch)
+        except Exception as e:
+            for _, _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, _, _, future), result in zip(batch, results):
+            if future.done():
+                continue  # Caller already timed out
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def pipeline(self, transaction: bool = False) -> Any:
+        """Get an explicit redis-py pipeline for callers that build their own batch.
+
+        Queue commands on the returned object and ``await pipe.execute()``.
+        """
+        client = await self.get_client()
+        return client.pipeline(transaction=transaction)
+
+    async def mget(self, keys: List[str], timeout: float = 2.0) -> List[Optional[bytes]]:
+        """Get many raw values in one round trip; missing keys (or errors) yield None"""
+        if not keys:
+            return []
+        try:
+            values = await asyncio.wait_for(
+                self._command('mget', keys),
+                timeout=budget_timeout(timeout)
+            )
+            return list(values)
+        except asyncio.TimeoutError:
+            self.logger.warning(f"Redis mget timeout for {len(keys)} keys (timeout: {timeout}s)")
+            return [None] * len(keys)
+        except Exception as e:
+            self.logger.error(f"Redis mget error for {len(keys)} keys: {str(e)}")
+            return [None] * len(keys)
+
+    async def mset_with_ttl(self, items: Dict[str, Tuple[bytes, int]], timeout: float = 2.0) -> bool:
+        """Set many raw values, each with its own TTL in seconds, in one round trip"""
+        if not items:
+            return True
+        try:
+            pipe = await self.pipeline()
+            for key, (value, ttl) in items.items():
+                pipe.setex(key, ttl, value)
+            await asyncio.wait_for(pipe.execute(), timeout=budget_timeout(timeout))
+            self.logger.debug(f"Stored {len(items)} keys in Redis with one pipeline")
+            return True
+        except asyncio.TimeoutError:
+            self.logger.warning(f"Redis mset_with_ttl timeout for {len(items)} keys (timeout: {timeout}s)")
+            return False
+        except Exception as e:
+            self.logger.error(f"Redis mset_with_ttl error for {len(items)} keys: {str(e)}")
+            return False
+
     async def is_connected(self, timeout: float = 2.0) -> bool:
         """Check if Redis connection is healthy"""
         if self.client is None:
             return False
         
         try:
-            await asyncio.wait_for(self.client.ping(), timeout=timeout)
+            await asyncio.wait_for(self.client.ping(), timeout=budget_timeout(timeout))
             return True
         except Exception as e:
             self.logger.warning(f"Redis connection check failed: {str(e)}")
             return False
 
     async def get(self, key: str, timeout: float = 2.0) -> Optional[bytes]:
-        """Get raw value from Redis with timeout and error handling"""
-        client = await self.get_client()
+        """Get raw value from Redis with timeout (capped by the request deadline) and error handling"""
         try:
             # Add timeout to Redis get operation
             data = await asyncio.wait_for(
-                client.get(key),
-                timeout=timeout
+                self._command('get', key),
+                timeout=budget_timeout(timeout)
             )
             return data
                 
@@ -76,12 +179,11 @@ class RedisClient:
 
     async def set(self, key: str, value: bytes, ttl: int, timeout: float = 2.0):
         """Set raw value in Redis with TTL and error handling"""
-        client = await self.get_client()
         try:
             # Add timeout to Redis set operation
             await asyncio.wait_for(
-                client.setex(key, ttl, value),
-                timeout=timeout
+                self._command('setex', key, ttl, value),
+                timeout=budget_timeout(timeout)
             )
             self.logger.debug(f"Successfully stored data in Redis with key: {key}, ttl: {ttl}")
         except asyncio.TimeoutError:
@@ -91,11 +193,10 @@ class RedisClient:
 
     async def delete(self, key: str, timeout: float = 2.0) -> bool:
         """Delete key from Redis"""
-        client = await self.get_client()
         try:
             result = await asyncio.wait_for(
-                client.delete(key),
-                timeout=timeout
+                self._command('delete', key),
+                timeout=budget_timeout(timeout)
             )
             self.logger.debug(f"Deleted key from Redis: {key}")
             return bool(result)
@@ -108,11 +209,10 @@ class RedisClient:
 
     async def exists(self, key: str, timeout: float = 2.0) -> bool:
         """Check if key exists in Redis"""
-        client = await self.get_client()
         try:
             result = await asyncio.wait_for(
-                client.exists(key),
-                timeout=timeout
+                self._command('exists', key),
+                timeout=budget_timeout(timeout)
             )
             return bool(result)
         except asyncio.TimeoutError:
@@ -124,11 +224,10 @@ class RedisClient:
 
     async def expire(self, key: str, seconds: int, timeout: float = 2.0) -> bool:
         """Set expiration time for a key in Redis"""
-        client = await self.get_client()
         try:
             result = await asyncio.wait_for(
-                client.expire(key, seconds),
-                timeout=timeout
+                self._command('expire', key, seconds),
+                timeout=budget_timeout(timeout)
             )
             self.logger.debug(f"Set expiration for Redis key: {key}, seconds: {seconds}")
             return bool(result)
@@ -141,11 +240,10 @@ class RedisClient:
 
     async def decr(self, key: str, timeout: float = 2.0) -> Optional[int]:
         """Decrement the value of a key in Redis"""
-        client = await self.get_client()
         try:
             result = await asyncio.wait_for(
-                client.decr(key),
-                timeout=timeout
+                self._command('decr', key),
+                timeout=budget_timeout(timeout)
             )
             self.logger.debug(f"Decremented Redis key: {key}, new value: {result}")
             return result
@@ -156,6 +254,54 @@ class RedisClient:
             self.logger.error(f"Redis decr error for key {key}: {str(e)}")
             return None
 
+    async def set_nx(self, key: str, value: bytes, ttl_ms: int, timeout: float = 2.0) -> Optional[bool]:
+        """Set key only if it does not already exist, with a TTL in milliseconds.
+
+        Used to acquire short-lived locks/leases. Returns True if the key was set,
+        False if it already existed and None if Redis could not be reached.
+        """
+        try:
+            result = await asyncio.wait_for(
+                self._command('set', key, value, nx=True, px=ttl_ms),
+                timeout=budget_timeout(timeout)
+            )
+            return bool(result)
+        except asyncio.TimeoutError:
+            self.logger.warning(f"Redis set_nx timeout for key {key} (timeout: {timeout}s)")
+            return None
+        except Exception as e:
+            self.logger.error(f"Redis set_nx error for key {key}: {str(e)}")
+            return None
+
+    async def delete_if_equals(self, key: str, value: bytes, timeout: float = 2.0) -> bool:
+        """Delete key only if it still holds the given value (safe lock/lease release)"""
+        try:
+            result = await asyncio.wait_for(
+                self._command('eval', _DELETE_IF_EQUALS_SCRIPT, 1, key, value),
+                timeout=budget_timeout(timeout)
+            )
+            return bool(result)
+        except asyncio.TimeoutError:
+            self.logger.warning(f"Redis delete_if_equals timeout for key {key} (timeout: {timeout}s)")
+            return False
+        except Exception as e:
+            self.logger.error(f"Redis delete_if_equals error for key {key}: {str(e)}")
+            return False
+
+    async def eval(self, script: str, keys: List[str], args: List[Any], timeout: float = 2.0) -> Any:
+        """Run a Lua script atomically on the server; returns None on timeout or error"""
+        try:
+            return await asyncio.wait_for(
+                self._command('eval', script, len(keys), *keys, *args),
+                timeout=budget_timeout(timeout)
+            )
+        except asyncio.TimeoutError:
+            self.logger.warning(f"Redis eval timeout for keys {keys} (timeout: {timeout}s)")
+            return None
+        except Exception as e:
+            self.logger.error(f"Redis eval error for keys {keys}: {str(e)}")
+            return None
+
     async def close(self):
         """Close Redis connection"""
         if self.client:
@@ -1,12 +1,17 @@
 import os
 import json
+import asyncio
 import logging
 from typing import Dict, List, Optional, Tuple, Any
 import aiohttp
 from datetime import datetime
+from .deadline import budget_timeout, expired
 
 class GoogleRoutesClient:
-    def __init__(self, session: aiohttp.ClientSession):
+    # computeRouteMatrix accepts at most 625 origin x destination elements per request
+    MAX_MATRIX_ELEMENTS = 625
+
+    def __init__(self, session: aiohttp.ClientSession, cache: Optional[Any] = None, max_concurrency: int = 8):
         self.api_key = os.getenv('GOOGLE_PLACES_API_KEY')
         self.logger = logging.getLogger(__name__)
         if not self.api_key:
@@ -14,8 +19,12 @@ class GoogleRoutesClient:
             raise ValueError("GOOGLE_PLACES_API_KEY environment variable is required")
         self.logger.info("✅ GoogleRoutesClient: API key loaded successfully")
         self.base_url = "https://routes.googleapis.com/directions/v2:computeRoutes"
+        self.matrix_url = "https://routes.googleapis.com/distanceMatrix/v2:computeRouteMatrix"
         self.geocoding_url = "https://maps.googleapis.com/maps/api/geocode/json"
         self._session = session
+        # RedisCache for per-pair results; optional so the client also works standalone
+        self.cache = cache
+        self.max_concurrency = max_concurrency
 
     async def reverse_geocode(self, location: Dict[str, float]) -> List[Dict[str, Any]]:
         """
@@ -31,7 +40,7 @@ class GoogleRoutesClient:
         }
         self.logger.debug(f"Async reverse_geocode: Requesting {self.geocoding_url} with params: {params}")
         try:
-            async with self._session.get(self.geocoding_url, params=params, timeout=10) as response:
+            async with self._session.get(self.geocoding_url, params=params, timeout=budget_timeout(10)) as response:
                 response.raise_for_status()
                 result = await response.json()
                 self.logger.debug(f"Async reverse_geocode: Response status {result.get('status')}")
@@ -67,55 +76,191 @@ class GoogleRoutesClient:
         Returns:
             Matrix of distances and durations, or empty list on error.
         """
+        mode = mode.upper()
+        self.logger.debug(f"Async calculate_distance_matrix: Processing {len(origins)} origins and {len(destinations)} destinations.")
+
+        # 💰 COST OPTIMIZATION: Reuse cached pair results (rounded coordinates + mode)
+        results_matrix = await self.get_cached_matrix(origins, destinations, mode)
+        pair_keys = [[self._pair_cache_key(o, d, mode) for d in destinations] for o in origins]
+
+        missing = [(i, j) for i in range(len(origins)) for j in range(len(destinations)) if results_matrix[i][j] is None]
+        if missing:
+            self.logger.debug(f"Async calculate_distance_matrix: {len(missing)} pairs not cached, fetching")
+            fetched = await self._compute_route_matrix(origins, destinations, missing, mode)
+            if fetched is None and expired():
+                # No request budget left for per-pair retries; missing pairs come back as errors
+                fetched = {}
+            elif fetched is None:
+                # Matrix endpoint unavailable - fall back to per-pair computeRoutes with bounded concurrency
+                fetched = await self._compute_routes_per_pair(origins, destinations, missing, mode)
+
+            cache_writes = []
+            for (i, j), element in fetched.items():
+                results_matrix[i][j] = element
+                if self.cache and not element.get('error'):
+                    cache_writes.append(self.cache.set(pair_keys[i][j], element, 'routes'))
+            if cache_writes:
+                await asyncio.gather(*cache_writes)
+
+        return [
+            [element or {'distance_meters': None, 'duration_seconds': None, 'error': 'No route found'} for element in row]
+            for row in results_matrix
+        ]
+
+    async def get_cached_matrix(
+        self,
+        origins: List[Dict[str, float]],
+        destinations: List[Dict[str, float]],
+        mode: str = "DRIVE"
+    ) -> List[List[Optional[Dict[str, Any]]]]:
+        """Cached pair results only (no API calls); uncached pairs are None"""
+        mode = mode.upper()
+        results_matrix: List[List[Optional[Dict[str, Any]]]] = [[None] * len(destinations) for _ in origins]
+        if not self.cache:
+            return results_matrix
+        cached_values = await asyncio.gather(*[
+            self.cache.get(self._pair_cache_key(o, d, mode)) for o in origins for d in destinations
+        ])
+        for flat_index, value in enumerate(cached_values):
+            if value:
+                results_matrix[flat_index // len(destinations)][flat_index % len(destinations)] = value
+        return results_matrix
+
+    def _pair_cache_key(self, origin: Dict[str, float], destination: Dict[str, float], mode: str) -> str:
+        """~100m precision so nearby points share cached travel times"""
+        return (
+            f"routes:{mode}:{round(origin['lat'], 3)},{round(origin['lng'], 3)}"
+            f":{round(destination['lat'], 3)},{round(destination['lng'], 3)}"
+        )
+
+    def _format_element(self, distance_meters: Optional[int], duration: Optional[str]) -> Dict[str, Any]:
+        """Convert Routes API distance/duration fields into our matrix element format"""
+        duration_str = (duration or '0s').rstrip('s')
+        return {
+            'distance_meters': distance_meters or 0,
+            'duration_seconds': int(float(duration_str)) if duration_str else 0,
+            'distance_km': float(distance_meters) / 1000 if distance_meters is not None else 0,
+            'duration_text': f"{int(float(duration_str) / 60)} mins" if duration_str else "N/A"
+        }
+
+    def _waypoint(self, location: Dict[str, float]) -> Dict[str, Any]:
+        return {'location': {'latLng': {'latitude': location['lat'], 'longitude': location['lng']}}}
+
+    async def _compute_route_matrix(
+        self,
+        origins: List[Dict[str, float]],
+        destinations: List[Dict[str, float]],
+        pairs: List[Tuple[int, int]],
+        mode: str
+    ) -> Optional[Dict[Tuple[int, int], Dict[str, Any]]]:
+        """Fetch the given pairs with computeRouteMatrix, one request per chunk of origin rows.
+
+        Returns None if any request fails so the caller can fall back to per-pair calls.
+        """
+        headers = {
+            'Content-Type': 'application/json',
+            'X-Goog-Api-Key': self.api_key,
+            'X-Goog-FieldMask': 'originIndex,destinationIndex,duration,distanceMeters,status,condition'
+        }
+        origin_rows = sorted({i for i, _ in pairs})
+        dest_cols = sorted({j for _, j in pairs})
+        rows_per_request = max(1, self.MAX_MATRIX_ELEMENTS // len(dest_cols))
+        wanted = set(pairs)
+
+        async def fetch_chunk(chunk: List[int]) -> Dict[Tuple[int, int], Dict[str, Any]]:
+            data = {
+                'origins': [{'waypoint': self._waypoint(origins[i])} for i in chunk],
+                'destinations': [{'waypoint': self._waypoint(destinations[j])} for j in dest_cols],
+                'travelMode': mode
+            }
+            if mode == 'DRIVE':
+                # routingPreference is only valid for driving modes
+                data['routingPreference'] = 'TRAFFIC_AWARE'
+            async with self._session.post(self.matrix_url, headers=headers, json=data, timeout=budget_timeout(10)) as response:
+                response.raise_for_status()
+                elements = await response.json()
+
+            chunk_results = {}
+            for element in elements:
+                i = chunk[element.get('originIndex', 0)]
+                j = dest_cols[element.get('destinationIndex', 0)]
+                if (i, j) not in wanted:
+                    continue
+                if element.get('condition') == 'ROUTE_EXISTS':
+                    chunk_results[(i, j)] = self._format_element(element.get('distanceMeters'), element.get('duration'))
+                else:
+                    chunk_results[(i, j)] = {'distance_meters': None, 'duration_seconds': None, 'error': 'No route found'}
+            return chunk_results
+
+        chunks = [origin_rows[k:k + rows_per_request] for k in range(0, len(origin_rows), rows_per_request)]
+        try:
+            chunk_results = await asyncio.gather(*[fetch_chunk(chunk) for chunk in chunks])
+        except aiohttp.ClientResponseError as e:
+            self.logger.error(f"Async computeRouteMatrix: HTTP error {e.status} {e.message}, falling back to per-pair routes")
+            return None
+        except asyncio.TimeoutError:
+            self.logger.error("Async computeRouteMatrix: Timeout, falling back to per-pair routes")
+            return None
+        except Exception as e:
+            self.logger.error(f"Async computeRouteMatrix: Unexpected error: {str(e)}, falling back to per-pair routes")
+            return None
+
+        results = {}
+        for chunk_result in chunk_results:
+            results.update(chunk_result)
+        return results
+
+    async def _compute_routes_per_pair(
+        self,
+        origins: List[Dict[str, float]],
+        destinations: List[Dict[str, float]],
+        pairs: List[Tuple[int, int]],
+        mode: str
+    ) -> Dict[Tuple[int, int], Dict[str, Any]]:
+        """Fallback: one computeRoutes call per pair, at most max_concurrency in flight"""
         headers = {
             'Content-Type': 'application/json',
             'X-Goog-Api-Key': self.api_key,
             'X-Goog-FieldMask': 'routes.duration,routes.distanceMeters'
         }
+        semaphore = asyncio.Semaphore(self.max_concurrency)
 
-        results_matrix = []
-        self.logger.debug(f"Async calculate_distance_matrix: Processing {len(origins)} origins and {len(destinations)} destinations.")
+        async def fetch_pair(i: int, j: int) -> Dict[str, Any]:
+            origin_loc, dest_loc = origins[i], destinations[j]
+            data = {
+                'origin': self._waypoint(origin_loc),
+                'destination': self._waypoint(dest_loc),
+                'travelMode': mode
+            }
+            if mode == 'DRIVE':
+                data['routingPreference'] = 'TRAFFIC_AWARE'
 
-        for origin_loc in origins:
-            row = []
-            for dest_loc in destinations:
-                data = {
-                    'origin': {'location': {'latLng': {'latitude': origin_loc['lat'], 'longitude': origin_loc['lng']}}},
-                    'destination': {'location': {'latLng': {'latitude': dest_loc['lat'], 'longitude': dest_loc['lng']}}},
-                    'travelMode': mode.upper(),
-                    'routingPreference': 'TRAFFIC_AWARE'
-                }
-                
-                self.logger.debug(f"Async calculate_distance_matrix: Requesting {self.base_url} for origin {origin_loc} to dest {dest_loc}")
+            self.logger.debug(f"Async calculate_distance_matrix: Requesting {self.base_url} for origin {origin_loc} to dest {dest_loc}")
+            async with semaphore:
+                if expired():
+                    return {'distance_meters': None, 'duration_seconds': None, 'error': 'Deadline exceeded'}
                 try:
-                    async with self._session.post(self.base_url, headers=headers, json=data, timeout=10) as response:
+                    async with self._session.post(self.base_url, headers=headers, json=data, timeout=budget_timeout(10)) as response:
                         response.raise_for_status()
                         result = await response.json()
 
                         if 'routes' in result and result['routes']:
                             route = result['routes'][0]
-                            duration_str = route.get('duration', '0s').rstrip('s')
-                            row.append({
-                                'distance_meters': route.get('distanceMeters', 0),
-                                'duration_seconds': int(float(duration_str)) if duration_str else 0,
-                                'distance_km': float(route.get('distanceMeters', 0)) / 1000 if route.get('distanceMeters') is not None else 0,
-                                'duration_text': f"{int(float(duration_str) / 60)} mins" if duration_str else "N/A"
-                            })
-                        else:
-                            self.logger.warning(f"Async calculate_distance_matrix: No routes found for origin {origin_loc} to dest {dest_loc}. API response: {result}")
-                            row.append({'distance_meters': None, 'duration_seconds': None, 'error': 'No route found'})
+                            return self._format_element(route.get('distanceMeters'), route.get('duration'))
+                        self.logger.warning(f"Async calculate_distance_matrix: No routes found for origin {origin_loc} to dest {dest_loc}. API response: {result}")
+                        return {'distance_meters': None, 'duration_seconds': None, 'error': 'No route found'}
                 except aiohttp.ClientResponseError as e:
                     self.logger.error(f"Async calculate_distance_matrix: HTTP error for origin {origin_loc} to dest {dest_loc}: {e.status} {e.message}")
-                    row.append({'distance_meters': None, 'duration_seconds': None, 'error': f"HTTP {e.status}"})
+                    return {'distance_meters': None, 'duration_seconds': None, 'error': f"HTTP {e.status}"}
                 except asyncio.TimeoutError:
                     self.logger.error(f"Async calculate_distance_matrix: Timeout for origin {origin_loc} to dest {dest_loc}")
-                    row.append({'distance_meters': None, 'duration_seconds': None, 'error': 'Timeout'})
+                    return {'distance_meters': None, 'duration_seconds': None, 'error': 'Timeout'}
                 except Exception as e:
                     self.logger.error(f"Async calculate_distance_matrix: Unexpected error for origin {origin_loc} to dest {dest_loc}: {str(e)}")
-                    row.append({'distance_meters': None, 'duration_seconds': None, 'error': 'Unexpected error'})
-            results_matrix.append(row)
-        
-        return results_matrix
+                    return {'distance_meters': None, 'duration_seconds': None, 'error': 'Unexpected error'}
+
+        elements = await asyncio.gather(*[fetch_pair(i, j) for i, j in pairs])
+        return dict(zip(pairs, elements))
 
     async def close(self):
         self.logger.info("GoogleRoutesClient close called (session managed externally).")
@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+from cachetools import LRUCache
+from .redis_client import RedisClient
+
+class SingleFlight:
+    """Collapse concurrent cache misses for the same key into one upstream fetch.
+
+    In-process callers for a key share a single detached fetch task. Across workers a
+    Redis lease (``singleflight:<key>``) elects one leader; other workers poll the
+    shared cache until the leader has filled it, or the lease disappears.
+    """
+
+    def __init__(
+        self,
+        redis_client: Optional[RedisClient] = None,
+        lease_ms: int = 10000,
+        poll_interval: float = 0.1,
+        max_tracked_keys: int = 1024
+    ):
+        self.redis_client = redis_client
+        self.lease_ms = lease_ms
+        self.poll_interval = poll_interval
+        self.logger = logging.getLogger(__name__)
+        self._inflight: Dict[str, asyncio.Task] = {}
+        # Bounded so that long-running workers don't accumulate stats for every key ever seen
+        self._stats: LRUCache = LRUCache(maxsize=max_tracked_keys)
+
+    def _key_stats(self, key: str) -> Dict[str, int]:
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = {'calls': 0, 'fetches': 0, 'collapsed': 0, 'remote_waits': 0, 'remote_hits': 0}
+            self._stats[key] = stats
+        return stats
+
+    async def do(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable[Any]],
+        cache_get: Optional[Callable[[], Awaitable[Any]]] = None
+    ) -> Any:
+        """Run ``fetch`` once for all concurrent callers of ``key`` and share its result.
+
+        Args:
+            key: Cache key being filled (usually ``RedisCache.get_key`` output).
+            fetch: Coroutine factory doing the upstream call; expected to write the cache itself.
+            cache_get: Coroutine factory reading the shared cache, used while another
+                worker holds the lease. Without it only in-process coalescing applies.
+        """
+        stats = self._key_stats(key)
+        stats['calls'] += 1
+
+        task = self._inflight.get(key)
+        if task is not None:
+            stats['collapsed'] += 1
+            self.logger.debug(f"Single-flight: joined in-flight fetch for key {key}")
+        else:
+            # The fetch belongs to SingleFlight, not to the first caller, so no caller's
+            # cancellation or timeout can cancel it for the others
+            task = asyncio.get_running_loop().create_task(self._lead(key, fetch, cache_get, stats))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark retrieved so a failure nobody awaited doesn't log "exception never retrieved"
+            task.exception()
+
+    async def _lead(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable[Any]],
+        cache_get: Optional[Callable[[], Awaitable[Any]]],
+        stats: Dict[str, int]
+    ) -> Any:
+        """Fetch for this process, coordinating with other workers through a Redis lease"""
+        if self.redis_client is None or cache_get is None:
+            stats['fetches'] += 1
+            return await fetch()
+
+        lock_key = f"singleflight:{key}"
+        token = uuid.uuid4().hex.encode('utf-8')
+        acquired = await self.redis_client.set_nx(lock_key, token, self.lease_ms)
+
+        if acquired is False:
+            # Another worker is already fetching this key - wait for it to fill the cache
+            stats['remote_waits'] += 1
+            result = await self._wait_for_remote(lock_key, cache_get)
+            if result:
+                stats['remote_hits'] += 1
+                return result
+            self.logger.info(f"Single-flight: remote fetch for {key} produced no cached value, fetching locally")
+
+        # Lease acquired, or Redis unavailable (None), or the remote leader failed
+        stats['fetches'] += 1
+        try:
+            return await fetch()
+        finally:
+            if acquired:
+                await self.redis_client.delete_if_equals(lock_key, token)
+
+    async def _wait_for_remote(self, lock_key: str, cache_get: Callable[[], Awaitable[Any]]) -> Any:
+        """Poll the shared cache until it is filled, the lease is released, or the lease time elapses"""
+        deadline = time.monotonic() + self.lease_ms / 1000
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            cached = await cache_get()
+            if cached:
+                return cached
+            if not await self.redis_client.exists(lock_key):
+                # Leader finished; check once more in case the write landed after our read
+                return await cache_get()
+        return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-key counters plus totals; ``collapsed`` + ``remote_hits`` are fetches saved"""
+        per_key = {key: dict(value) for key, value in self._stats.items()}
+        totals = {'calls': 0, 'fetches': 0, 'collapsed': 0, 'remote_waits': 0, 'remote_hits': 0}
+        for value in per_key.values():
+            for name in totals:
+                totals[name] += value[name]
+        return {
+            'in_flight': len(self._inflight),
+            'totals': totals,
+            'keys': per_key
+        }
@@ -0,0 +1,140 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+StageFunc = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+class StageCancelled(Exception):
+    """A stage's task ended cancelled without run() itself being cancelled"""
+
+
+class StageGraph:
+    """Run async stages as soon as the stages they depend on have finished.
+
+    Each stage is ``func(inputs)`` where ``inputs`` maps dependency names to
+    their results. A stage that raises (or is cancelled) fails every stage
+    downstream of it and run() re-raises the first failure. Per-stage start/end times (ms since run()
+    started) are kept so the critical path of a request can be reported.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._stages: Dict[str, Dict[str, Any]] = {}
+        self.timings: Dict[str, Dict[str, float]] = {}
+
+    def add(self, name: str, func: StageFunc, deps: Optional[List[str]] = None) -> "StageGraph":
+        deps = list(deps or [])
+        if name in self._stages:
+            raise ValueError(f"Stage {name} already defined")
+        unknown = [d for d in deps if d not in self._stages]
+        if unknown:
+            # Requiring dependencies to be added first also rules out cycles
+            raise ValueError(f"Stage {name} depends on undefined stages: {unknown}")
+        self._stages[name] = {'func': func, 'deps': deps}
+        return self
+
+    @property
+    def stage_names(self) -> List[str]:
+        """Stage names in definition order"""
+        return list(self._stages)
+
+    async def run(self, on_stage: Optional[Callable[[str, Any], None]] = None) -> Dict[str, Any]:
+        """Run every stage; returns {stage name: result}.
+
+        ``on_stage(name, result)`` is called as each stage succeeds, e.g. to stream partial results.
+        """
+        started = time.perf_counter()
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run_stage(name: str, stage: Dict[str, Any]) -> Any:
+            inputs = {}
+            for dep in stage['deps']:
+                inputs[dep] = await tasks[dep]
+            start_ms = (time.perf_counter() - started) * 1000
+            try:
+                result = await stage['func'](inputs)
+            finally:
+                end_ms = (time.perf_counter() - started) * 1000
+                self.timings[name] = {
+                    'start_ms': round(start_ms, 1),
+                    'end_ms': round(end_ms, 1),
+                    'duration_ms': round(end_ms - start_ms, 1)
+                }
+            if on_stage is not None:
+                on_stage(name, result)
+            return result
+
+        for name, stage in self._stages.items():
+            tasks[name] = asyncio.ensure_future(run_stage(name, stage))
+        try:
+            # Wait for everything so each failed task's exception is retrieved, not just the first
+            await asyncio.wait(tasks.values())
+        finally:
+            for task in tasks.values():
+                if not task.done():
+                    task.cancel()
+        failures = []
+        for name, task in tasks.items():
+            # task.exception() would raise CancelledError for a cancelled stage
+            if task.cancelled():
+                failures.append(StageCancelled(f"Stage {name} was cancelled"))
+            elif task.exception() is not None:
+                failures.append(task.exception())
+        if failures:
+            raise failures[0]
+        return {name: task.result() for name, task in tasks.items()}
+
+    def critical_path(self) -> List[str]:
+        """Chain of stages that determined the total run time, first stage first"""
+        if not self.timings:
+            return []
+        # On ties prefer later-defined stages, i.e. the downstream one
+        finished = [n for n in self._stages if n in self.timings]
+        current = max(reversed(finished), key=lambda n: self.timings[n]['end_ms'])
+        path = [current]
+        while True:
+            deps = [d for d in self._stages[current]['deps'] if d in self.timings]
+            if not deps:
+                break
+            current = max(deps, key=lambda n: self.timings[n]['end_ms'])
+            path.append(current)
+        return list(reversed(path))
+
+
+class StageStats:
+    """Rolling per-stage timing totals across graph runs, for /api/v1/metrics"""
+
+    def __init__(self):
+        self.runs = 0
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.critical_path_counts: Dict[str, int] = {}
+        self.last_critical_path: List[str] = []
+
+    def record(self, graph: StageGraph):
+        self.runs += 1
+        for name, timing in graph.timings.items():
+            # Collapse per-type stages ("search:museum") into one bucket per stage kind
+            bucket = self.stages.setdefault(name.split(':')[0], {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            bucket['count'] += 1
+            bucket['total_ms'] += timing['duration_ms']
+            bucket['max_ms'] = max(bucket['max_ms'], timing['duration_ms'])
+        self.last_critical_path = graph.critical_path()
+        for name in self.last_critical_path:
+            kind = name.split(':')[0]
+            self.critical_path_counts[kind] = self.critical_path_counts.get(kind, 0) + 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'runs': self.runs,
+            'stages': {
+                name: {
+                    'count': s['count'],
+                    'avg_ms': round(s['total_ms'] / s['count'], 1) if s['count'] else 0.0,
+                    'max_ms': round(s['max_ms'], 1)
+                }
+                for name, s in self.stages.items()
+            },
+            'critical_path_counts': dict(self.critical_path_counts),
+            'last_critical_path': list(self.last_critical_path)
+        }
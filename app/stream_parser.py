@@ -0,0 +1,71 @@
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class IncrementalArrayParser:
+    """Pull complete array items out of a JSON document while it is still streaming.
+
+    Built for LLM output shaped like ``{"itinerary": [{...day...}, {...day...}]}``:
+    every object that closes directly inside an array of the top-level object is
+    returned by feed() as soon as its closing brace arrives. Text before the first
+    brace (e.g. a ```json fence) is ignored. Only the structure is tracked here;
+    the full document should still be parsed normally once the stream ends.
+    """
+
+    def __init__(self):
+        self._buffer: List[str] = []
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escaped = False
+        self._item_start: Optional[int] = None
+        self._length = 0
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """Consume the next chunk; returns the array items completed by it"""
+        completed = []
+        for char in text:
+            position = self._length
+            self._buffer.append(char)
+            self._length += 1
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in '{[':
+                if char == '{' and self._stack == ['{', '[']:
+                    self._item_start = position
+                self._stack.append(char)
+            elif char in '}]':
+                if not self._stack:
+                    continue
+                self._stack.pop()
+                if char == '}' and self._stack == ['{', '['] and self._item_start is not None:
+                    item = self._decode(''.join(self._buffer[self._item_start:]))
+                    self._item_start = None
+                    if item is not None:
+                        completed.append(item)
+        return completed
+
+    def _decode(self, text: str) -> Optional[Dict[str, Any]]:
+        try:
+            item = json.loads(text)
+        except ValueError as e:
+            logger.debug(f"Skipping undecodable streamed item: {str(e)}")
+            return None
+        return item if isinstance(item, dict) else None
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far"""
+        return ''.join(self._buffer)
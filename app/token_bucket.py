@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+from .redis_client import RedisClient
+from .deadline import budget_timeout
+
+# After Redis fails (timeout or error), use the per-process bucket for this long instead of
+# paying the eval timeout again on every attempt
+REDIS_RETRY_COOLDOWN = float(os.getenv('TOKEN_BUCKET_REDIS_COOLDOWN_SECONDS', 5.0))
+
+# Refill by elapsed server time, then try to take one token. Returns
+# {allowed (0/1), wait_ms until a token is available, tokens left (as string)}.
+_TOKEN_BUCKET_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait = math.ceil((1 - tokens) / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate) * 2)
+return {allowed, wait, tostring(tokens)}
+"""
+
+class TokenBucket:
+    """Token bucket shared by all workers through Redis, with a waiting acquire().
+
+    Holds `capacity` tokens refilled continuously at capacity/window. Callers
+    await acquire() and queue briefly when the bucket is empty instead of failing
+    outright. If Redis is unreachable the bucket degrades to a per-process one,
+    and Redis is not tried again for REDIS_RETRY_COOLDOWN seconds.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        capacity: int,
+        window: int,
+        redis_client: Optional[RedisClient] = None,
+        max_wait: Optional[float] = None
+    ):
+        self.name = name
+        self.capacity = capacity
+        self.window = window
+        self.redis_client = redis_client
+        self.key = f"token_bucket:{name}"
+        self.max_wait = max_wait if max_wait is not None else float(os.getenv('PLACES_RATE_LIMIT_MAX_WAIT', 2.0))
+        self._rate_per_ms = capacity / (window * 1000)
+        # Per-process fallback state
+        self._local_tokens = float(capacity)
+        self._local_ts = time.monotonic()
+        self._redis_retry_at = 0.0
+        self.logger = logging.getLogger(__name__)
+        self.stats = {
+            'acquired': 0,
+            'rejected': 0,
+            'waited': 0,
+            'total_wait_ms': 0.0,
+            'max_wait_ms': 0.0,
+            'tokens': float(capacity),
+            'fallback_local': 0
+        }
+
+    async def _try_take(self) -> Any:
+        """One attempt; returns (allowed, wait_ms, tokens_left)"""
+        if self.redis_client is not None:
+            if time.monotonic() >= self._redis_retry_at:
+                result = await self.redis_client.eval(
+                    _TOKEN_BUCKET_SCRIPT,
+                    keys=[self.key],
+                    args=[self.capacity, self._rate_per_ms]
+                )
+                if result is not None:
+                    allowed, wait_ms, tokens = result
+                    return bool(allowed), int(wait_ms), float(tokens)
+                # 🚀 SPEED OPTIMIZATION: A hanging Redis costs one eval timeout, not one per retry
+                self._redis_retry_at = time.monotonic() + REDIS_RETRY_COOLDOWN
+                self.logger.warning(f"Token bucket {self.name}: Redis unavailable, using local bucket for {REDIS_RETRY_COOLDOWN:.0f}s")
+            self.stats['fallback_local'] += 1
+        return self._try_take_local()
+
+    def _try_take_local(self) -> Any:
+        now = time.monotonic()
+        elapsed_ms = (now - self._local_ts) * 1000
+        self._local_ts = now
+        self._local_tokens = min(self.capacity, self._local_tokens + elapsed_ms * self._rate_per_ms)
+        if self._local_tokens >= 1:
+            self._local_tokens -= 1
+            return True, 0, self._local_tokens
+        return False, int((1 - self._local_tokens) / self._rate_per_ms) + 1, self._local_tokens
+
+    async def acquire(self, deadline: Optional[float] = None) -> bool:
+        """Take one token, waiting until `deadline` (a time.monotonic() value) if needed.
+
+        Defaults to waiting at most `max_wait` seconds, or less if the request
+        deadline is closer. Returns False if no token became available in time.
+        """
+        start = time.monotonic()
+        if deadline is None:
+            deadline = start + budget_timeout(self.max_wait)
+
+        while True:
+            allowed, wait_ms, tokens = await self._try_take()
+            self.stats['tokens'] = round(tokens, 2)
+            if allowed:
+                waited_ms = (time.monotonic() - start) * 1000
+                self.stats['acquired'] += 1
+                if waited_ms >= 1:
+                    self.stats['waited'] += 1
+                    self.stats['total_wait_ms'] += waited_ms
+                    self.stats['max_wait_ms'] = max(self.stats['max_wait_ms'], waited_ms)
+                return True
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.stats['rejected'] += 1
+                self.logger.warning(f"Token bucket {self.name}: no token available before deadline")
+                return False
+            await asyncio.sleep(min(remaining, max(wait_ms, 1) / 1000))
+
+    def get_stats(self) -> Dict[str, Any]:
+        waited = self.stats['waited']
+        return {
+            'capacity': self.capacity,
+            'fill_level': round(self.stats['tokens'] / self.capacity, 3),
+            'tokens': self.stats['tokens'],
+            'acquired': self.stats['acquired'],
+            'rejected': self.stats['rejected'],
+            'waited': waited,
+            'avg_wait_ms': round(self.stats['total_wait_ms'] / waited, 1) if waited else 0.0,
+            'max_wait_ms': round(self.stats['max_wait_ms'], 1),
+            'fallback_local': self.stats['fallback_local']
+        }
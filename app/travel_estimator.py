@@ -0,0 +1,128 @@
+import logging
+from typing import Any, Dict, List, Optional
+import numpy as np
+
+EARTH_RADIUS_M = 6371008.8
+
+# Typical urban door-to-door figures per Routes API travel mode:
+# speed along the road network (m/s), road distance / great-circle distance,
+# and a fixed overhead (parking, waiting for transit) in seconds
+DEFAULT_MODE_PROFILES = {
+    'DRIVE': {'speed_mps': 8.3, 'detour_factor': 1.4, 'overhead_s': 180},
+    'WALK': {'speed_mps': 1.3, 'detour_factor': 1.3, 'overhead_s': 0},
+    'BICYCLE': {'speed_mps': 4.2, 'detour_factor': 1.35, 'overhead_s': 60},
+    'TRANSIT': {'speed_mps': 5.5, 'detour_factor': 1.5, 'overhead_s': 300},
+}
+
+def haversine_matrix(origins: List[Dict[str, float]], destinations: List[Dict[str, float]]) -> np.ndarray:
+    """Great-circle distances in meters between every origin and destination (N x M)"""
+    if not origins or not destinations:
+        return np.zeros((len(origins), len(destinations)))
+    o = np.radians(np.array([[p['lat'], p['lng']] for p in origins], dtype=float))
+    d = np.radians(np.array([[p['lat'], p['lng']] for p in destinations], dtype=float))
+    lat1, lng1 = o[:, 0:1], o[:, 1:2]
+    lat2, lng2 = d[:, 0], d[:, 1]
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+class TravelTimeEstimator:
+    """Approximate travel times from great-circle distance, with no API calls.
+
+    Road distance is the haversine distance times a per-mode detour factor and
+    duration follows from a per-mode speed. Both can be calibrated against real
+    Routes API results (see calibrate()).
+    """
+
+    def __init__(self, profiles: Optional[Dict[str, Dict[str, float]]] = None):
+        self.profiles = {mode: dict(p) for mode, p in (profiles or DEFAULT_MODE_PROFILES).items()}
+        self.calibration_samples = {mode: 0 for mode in self.profiles}
+        self.logger = logging.getLogger(__name__)
+
+    def _profile(self, mode: str) -> Dict[str, float]:
+        return self.profiles.get(mode.upper(), self.profiles['DRIVE'])
+
+    def estimate_arrays(self, origins: List[Dict[str, float]], destinations: List[Dict[str, float]], mode: str = "DRIVE"):
+        """Vectorised estimate; returns (distance_meters, duration_seconds) N x M arrays"""
+        profile = self._profile(mode)
+        distance = haversine_matrix(origins, destinations) * profile['detour_factor']
+        duration = distance / profile['speed_mps'] + np.where(distance > 0, profile['overhead_s'], 0)
+        return distance, duration
+
+    def estimate_matrix(
+        self,
+        origins: List[Dict[str, float]],
+        destinations: List[Dict[str, float]],
+        mode: str = "DRIVE"
+    ) -> List[List[Dict[str, Any]]]:
+        """Same element format as GoogleRoutesClient.calculate_distance_matrix, flagged as estimated"""
+        distance, duration = self.estimate_arrays(origins, destinations, mode)
+        distance_m = np.rint(distance).astype(int).tolist()
+        duration_s = np.rint(duration).astype(int).tolist()
+        return [
+            [
+                {
+                    'distance_meters': d,
+                    'duration_seconds': s,
+                    'distance_km': d / 1000,
+                    'duration_text': f"{s // 60} mins",
+                    'estimated': True
+                }
+                for d, s in zip(distance_row, duration_row)
+            ]
+            for distance_row, duration_row in zip(distance_m, duration_s)
+        ]
+
+    def estimate_minutes(self, origin: Dict[str, float], destination: Dict[str, float], mode: str = "DRIVE") -> int:
+        """Travel time in whole minutes for a single pair"""
+        _, duration = self.estimate_arrays([origin], [destination], mode)
+        return int(np.ceil(duration[0, 0] / 60))
+
+    def calibrate(
+        self,
+        origins: List[Dict[str, float]],
+        destinations: List[Dict[str, float]],
+        matrix: List[List[Optional[Dict[str, Any]]]],
+        mode: str = "DRIVE",
+        min_samples: int = 3
+    ) -> bool:
+        """Fit the mode's detour factor and speed from real Routes results for the same pairs.
+
+        Elements that are missing, failed or estimated are ignored. Uses medians so
+        a few odd routes (ferries, one-way detours) do not skew the profile.
+        """
+        mode = mode.upper()
+        straight = haversine_matrix(origins, destinations)
+        straight_m, route_m, route_s = [], [], []
+        for i, row in enumerate(matrix):
+            for j, element in enumerate(row):
+                if not element or element.get('error') or element.get('estimated'):
+                    continue
+                if element.get('distance_meters') and element.get('duration_seconds') and straight[i, j] > 100:
+                    straight_m.append(straight[i, j])
+                    route_m.append(element['distance_meters'])
+                    route_s.append(element['duration_seconds'])
+
+        if len(route_m) < min_samples:
+            self.logger.debug(f"Travel estimator: only {len(route_m)} samples for {mode}, not calibrating")
+            return False
+
+        profile = self.profiles.setdefault(mode, dict(DEFAULT_MODE_PROFILES['DRIVE']))
+        route_m, route_s = np.array(route_m, dtype=float), np.array(route_s, dtype=float)
+        profile['detour_factor'] = float(np.median(route_m / np.array(straight_m)))
+        moving_s = np.maximum(route_s - profile['overhead_s'], 1.0)
+        profile['speed_mps'] = float(np.median(route_m / moving_s))
+        self.calibration_samples[mode] = self.calibration_samples.get(mode, 0) + len(route_m)
+        self.logger.info(
+            f"Travel estimator calibrated {mode} from {len(route_m)} routes: "
+            f"detour {profile['detour_factor']:.2f}, speed {profile['speed_mps']:.1f} m/s"
+        )
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            mode: {**{k: round(v, 3) for k, v in profile.items()}, 'calibration_samples': self.calibration_samples.get(mode, 0)}
+            for mode, profile in self.profiles.items()
+        }
+
+# globally shared estimator so calibration benefits every caller
+travel_estimator = TravelTimeEstimator()
@@ -1,56 +1,131 @@
 import functools
 import datetime
-from fastapi import HTTPException
+import logging
+import os
+import uuid
+from typing import Optional
+from fastapi import HTTPException, Request
 from app.redis_client import redis_client
 
-def rate_limit(endpoint: str, limit: int):
+logger = logging.getLogger(__name__)
+
+# Initialise (first request of the day), check and decrement in one atomic call.
+# Returns the remaining quota after this request, or -1 when the limit is exhausted
+# (the counter is never decremented below zero, so concurrent workers cannot overshoot).
+DAILY_LIMIT_SCRIPT = """
+local remaining = redis.call('GET', KEYS[1])
+if not remaining then
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+    remaining = tonumber(ARGV[1])
+else
+    remaining = tonumber(remaining)
+end
+if remaining <= 0 then
+    return -1
+end
+return redis.call('DECR', KEYS[1])
+"""
+
+# Sliding window over a sorted set of request timestamps (server clock, milliseconds).
+# ARGV: window_ms, limit, unique member. Returns remaining quota or -1 when limited.
+SLIDING_WINDOW_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local window = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], 0, now - window)
+local count = redis.call('ZCARD', KEYS[1])
+if count >= limit then
+    return -1
+end
+redis.call('ZADD', KEYS[1], now, ARGV[3])
+redis.call('PEXPIRE', KEYS[1], window)
+return limit - count - 1
+"""
+
+# Reverse proxies in front of the app that append to X-Forwarded-For; 0 uses the socket peer
+TRUSTED_PROXY_HOPS = int(os.getenv('RATE_LIMIT_TRUSTED_PROXY_HOPS', 1))
+
+def _seconds_until_midnight() -> int:
+    tomorrow = datetime.datetime.now() + datetime.timedelta(days=1)
+    midnight = datetime.datetime.combine(tomorrow.date(), datetime.time.min)
+    return max(1, int((midnight - datetime.datetime.now()).total_seconds()))
+
+def _client_id(args, kwargs) -> str:
+    """Identify the caller from a starlette Request among the endpoint arguments.
+
+    Clients can send any X-Forwarded-For they like, so only the entry appended by
+    the outermost trusted proxy (TRUSTED_PROXY_HOPS from the right) is used.
+    """
+    request = next((a for a in list(args) + list(kwargs.values()) if isinstance(a, Request)), None)
+    if request is None:
+        return "global"
+    forwarded = request.headers.get("x-forwarded-for")
+    if forwarded and TRUSTED_PROXY_HOPS > 0:
+        hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+        if hops:
+            return hops[max(0, len(hops) - TRUSTED_PROXY_HOPS)]
+    return request.client.host if request.client else "global"
+
+async def check_daily_limit(endpoint: str, limit: int) -> Optional[int]:
+    """Atomically consume one request from the endpoint's daily quota.
+
+    Returns the remaining quota, -1 if exhausted, or None if Redis is unavailable.
     """
-    Decorator to globally limit an API endpoint's requests per day using a decrementing counter.
-    
-    This decorator initializes a daily limit in Redis and decrements it on each request.
-    When the counter reaches zero or below, further requests are blocked until the next day.
+    return await redis_client.eval(
+        DAILY_LIMIT_SCRIPT,
+        keys=[f"rate_limit:api:{endpoint}"],
+        args=[limit, _seconds_until_midnight()]
+    )
+
+async def check_sliding_window(endpoint: str, limit: int, window_seconds: int, client_id: str = "global") -> Optional[int]:
+    """Atomically record one request in a sliding window for this endpoint and client.
+
+    Returns the remaining quota, -1 if limited, or None if Redis is unavailable.
+    """
+    return await redis_client.eval(
+        SLIDING_WINDOW_SCRIPT,
+        keys=[f"rate_limit:sliding:{endpoint}:{client_id}"],
+        args=[window_seconds * 1000, limit, uuid.uuid4().hex]
+    )
+
+def rate_limit(endpoint: str, limit: int, window_seconds: Optional[int] = None, per_client: bool = False):
+    """
+    Decorator to limit an API endpoint's requests using a single atomic Redis script call.
+
+    By default this is a global daily limit: a decrementing counter initialised to `limit`
+    that expires at midnight. When `window_seconds` is set, a sliding window over a Redis
+    sorted set is used instead, optionally keyed per client (taken from a `Request`
+    parameter of the endpoint: the X-Forwarded-For entry added by the trusted
+    proxy, see TRUSTED_PROXY_HOPS, or the socket peer address).
+    If Redis is unavailable the request is allowed (fail open).
 
     Args:
         endpoint (str): Redis key identifier for the specific endpoint.
-        limit (int): Maximum allowed requests per day (shared globally across all users).
-    
+        limit (int): Maximum allowed requests per day, or per window in sliding-window mode.
+        window_seconds (Optional[int]): Sliding window length; None selects the daily counter.
+        per_client (bool): Track sliding-window usage per client instead of globally.
+
     Raises:
-        HTTPException: When daily limit is exceeded (HTTP 429 - Too Many Requests).
+        HTTPException: When the limit is exceeded (HTTP 429 - Too Many Requests).
     """
     def decorator(func):
         @functools.wraps(func)
         async def wrapper(*args, **kwargs):
-            
-            # Create a unique daily key for this endpoint
-            redis_key = f"rate_limit:api:{endpoint}"
-
-            # Get current remaining count, initialize with limit if key doesn't exist
-            current_count = await redis_client.get(redis_key)
-            
-            if current_count is None:
-                # First request of the day: initialize counter with the limit
-                await redis_client.set(redis_key, str(limit).encode(), ttl=86400)  # 24 hours TTL
-                current_count = limit
-                
-                # Set expiration to midnight of next day
-                tomorrow = datetime.datetime.now() + datetime.timedelta(days=1)
-                midnight = datetime.datetime.combine(tomorrow.date(), datetime.time.min)
-                expire_seconds = int((midnight - datetime.datetime.now()).total_seconds())
-                await redis_client.expire(redis_key, expire_seconds)
+            if window_seconds is None:
+                remaining = await check_daily_limit(endpoint, limit)
+                detail = f"Daily limit of {limit} requests exceeded for this endpoint. Try again tomorrow."
             else:
-                current_count = int(current_count.decode())
-
-            # Check if we have remaining requests
-            if current_count <= 0:
-                raise HTTPException(
-                    status_code=429,
-                    detail=f"Daily limit of {limit} requests exceeded for this endpoint. Try again tomorrow."
-                )
+                client_id = _client_id(args, kwargs) if per_client else "global"
+                remaining = await check_sliding_window(endpoint, limit, window_seconds, client_id)
+                detail = f"Limit of {limit} requests per {window_seconds}s exceeded for this endpoint. Try again later."
 
-            # Decrement the counter for this request
-            await redis_client.decr(redis_key)
+            if remaining is None:
+                logger.warning(f"Rate limit check unavailable for {endpoint}, allowing request")
+            elif remaining < 0:
+                raise HTTPException(status_code=429, detail=detail)
 
             # Execute the original function
             return await func(*args, **kwargs)
         return wrapper
-    return decorator
\ No newline at end of file
+    return decorator
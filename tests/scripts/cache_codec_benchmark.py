@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Cache Codec Benchmark
+
+Compares RedisCache value codecs (json / orjson / msgpack, each with and without
+zstd) on real cached place lists. For each codec it reports:
+- Average bytes per key
+- Encode and decode time per value (microseconds)
+
+Values are sampled from Redis (REDIS_URL, default redis://localhost:6379) by
+scanning places:* keys. If Redis is unreachable, pass one or more JSON files
+containing place lists instead.
+
+Usage:
+    python tests/scripts/cache_codec_benchmark.py [max_keys]
+    python tests/scripts/cache_codec_benchmark.py --files places1.json places2.json
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379")
+
+from app import cache_codec  # noqa: E402
+from app.cache_codec import CacheCodec  # noqa: E402
+from app.places_client import RedisCache  # noqa: E402
+from app.redis_client import redis_client  # noqa: E402
+
+
+async def sample_cached_places(max_keys: int) -> list:
+    """Decode up to max_keys places:* values exactly as RedisCache would"""
+    client = await redis_client.get_client()
+    if not await redis_client.is_connected():
+        return []
+    cache = RedisCache(redis_client)
+    values = []
+    async for key in client.scan_iter(match="places:*", count=200):
+        key = key.decode() if isinstance(key, bytes) else key
+        data = await client.get(key)
+        entry = cache._decode(key, data) if data else None
+        if entry and entry.value:
+            values.append(entry.value)
+        if len(values) >= max_keys:
+            break
+    await redis_client.close()
+    return values
+
+
+def load_files(paths: list) -> list:
+    values = []
+    for path in paths:
+        with open(path) as f:
+            values.append(json.load(f))
+    return values
+
+
+def bench(codec: CacheCodec, values: list, rounds: int = 20) -> dict:
+    encoded = [codec.encode(v) for v in values]
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for v in values:
+            codec.encode(v)
+    encode_us = (time.perf_counter() - start) / (rounds * len(values)) * 1e6
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for data in encoded:
+            codec.decode(data)
+    decode_us = (time.perf_counter() - start) / (rounds * len(values)) * 1e6
+
+    return {
+        "bytes": sum(len(e) for e in encoded) / len(encoded),
+        "encode_us": encode_us,
+        "decode_us": decode_us,
+    }
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--files":
+        values = load_files(sys.argv[2:])
+        source = f"{len(values)} file(s)"
+    else:
+        max_keys = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+        values = asyncio.run(sample_cached_places(max_keys))
+        source = f"{len(values)} places:* keys from {os.environ['REDIS_URL']}"
+
+    if not values:
+        print("❌ No cached place lists found - populate Redis or pass --files")
+        return
+
+    serializers = ["json", "orjson"] + (["msgpack"] if cache_codec.msgpack else [])
+    compressions = ["none"] + (["zstd"] if cache_codec.zstandard else [])
+
+    print(f"📦 Cache codec benchmark on {source}")
+    print("-" * 66)
+    print(f"{'codec':<20}{'bytes/key':>12}{'vs json':>10}{'encode µs':>12}{'decode µs':>12}")
+    baseline = None
+    for serializer in serializers:
+        for compression in compressions:
+            codec = CacheCodec(serializer=serializer, compression=compression, compress_min_bytes=0)
+            r = bench(codec, values)
+            baseline = baseline or r["bytes"]
+            name = serializer + ("+zstd" if compression == "zstd" else "")
+            print(f"{name:<20}{r['bytes']:>12.0f}{r['bytes'] / baseline:>9.0%}{r['encode_us']:>12.1f}{r['decode_us']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
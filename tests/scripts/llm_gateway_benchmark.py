@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+LLM Gateway Benchmark (offline)
+
+Runs concurrent /complete-itinerary LLM stages plus description batches through
+the shared LLM gateway with the deterministic stub backend, so no OpenAI key or
+network is needed. Places enrichment is skipped. It reports:
+- Wall time and p50 / p95 latency per itinerary
+- Gateway accounting per purpose (calls, tokens, latency)
+
+Tune with LLM_STUB_LATENCY_MS (simulated model latency) and LLM_MAX_CONCURRENCY.
+
+Usage:
+    python tests/scripts/llm_gateway_benchmark.py [requests] [concurrency]
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+os.environ["LLM_BACKEND"] = "stub"
+os.environ.setdefault("OPENAI_API_KEY", "offline")
+os.environ.setdefault("GOOGLE_PLACES_API_KEY", "offline")
+
+from app.complete_itinerary import complete_itinerary_from_selection  # noqa: E402
+from app.llm_descriptions import LLMDescriptionService  # noqa: E402
+from app.llm_gateway import get_llm_gateway  # noqa: E402
+from app.schema import LandmarkSelection  # noqa: E402
+
+DESTINATIONS = ["San Diego", "Austin", "Chicago", "Seattle", "Boston"]
+
+
+def selection(i: int) -> LandmarkSelection:
+    return LandmarkSelection(
+        details={"destination": DESTINATIONS[i % len(DESTINATIONS)], "travelDays": 3,
+                 "startDate": "2026-06-01", "endDate": "2026-06-03"},
+        itinerary=[
+            {"day": d, "attractions": [
+                {"name": f"Attraction {i}-{d}-{n}", "description": "", "location": {"lat": 32.7, "lng": -117.1}, "type": "landmark"}
+                for n in range(3)
+            ]}
+            for d in (1, 2, 3)
+        ]
+    )
+
+
+async def one_request(i: int, service: LLMDescriptionService) -> float:
+    start = time.perf_counter()
+    result = await complete_itinerary_from_selection(selection(i))
+    landmarks = [
+        {"name": b["name"], "types": ["tourist_attraction"], "rating": 4.5}
+        for day in result.get("itinerary", []) for b in day["blocks"]
+    ]
+    await service.generate_place_descriptions(landmarks, DESTINATIONS[i % len(DESTINATIONS)], batch_size=len(landmarks) or 1)
+    return time.perf_counter() - start
+
+
+async def main(requests: int, concurrency: int):
+    service = LLMDescriptionService()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(i: int) -> float:
+        async with semaphore:
+            return await one_request(i, service)
+
+    start = time.perf_counter()
+    latencies = sorted(await asyncio.gather(*(limited(i) for i in range(requests))))
+    wall = time.perf_counter() - start
+
+    print(f"\n{requests} requests, concurrency {concurrency}, stub latency {os.getenv('LLM_STUB_LATENCY_MS', '50')}ms")
+    print(f"Wall time: {wall:.2f}s ({requests / wall:.1f} req/s)")
+    print(f"p50: {latencies[len(latencies) // 2] * 1000:.0f}ms  p95: {latencies[int(len(latencies) * 0.95) - 1] * 1000:.0f}ms")
+    print("\nGateway stats:")
+    print(json.dumps(get_llm_gateway().get_stats(), indent=2))
+
+
+if __name__ == "__main__":
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    parallel = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    asyncio.run(main(total, parallel))
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Rate Limiter Benchmark
+
+Compares the original GET / SET+EXPIRE / DECR rate limit decorator against the
+atomic Lua daily limiter and the sliding-window limiter under concurrent load.
+For each mode it reports:
+- Throughput and per-call latency (p50 / p99)
+- How many requests were admitted vs the configured limit (overshoot)
+
+Requires a reachable Redis (REDIS_URL, default redis://localhost:6379).
+Keys are namespaced under rate_limit:*:bench_* and removed afterwards.
+
+Usage:
+    python tests/scripts/rate_limit_benchmark.py [concurrency] [limit]
+"""
+
+import asyncio
+import datetime
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379")
+
+from app.redis_client import redis_client  # noqa: E402
+from decorators.rate_limit import check_daily_limit, check_sliding_window  # noqa: E402
+
+
+async def legacy_check(endpoint: str, limit: int) -> bool:
+    """The pre-Lua decorator logic: 3-4 sequential round trips, racy under concurrency"""
+    redis_key = f"rate_limit:api:{endpoint}"
+    current_count = await redis_client.get(redis_key)
+    if current_count is None:
+        await redis_client.set(redis_key, str(limit).encode(), ttl=86400)
+        current_count = limit
+        tomorrow = datetime.datetime.now() + datetime.timedelta(days=1)
+        midnight = datetime.datetime.combine(tomorrow.date(), datetime.time.min)
+        await redis_client.expire(redis_key, int((midnight - datetime.datetime.now()).total_seconds()))
+    else:
+        current_count = int(current_count.decode())
+    if current_count <= 0:
+        return False
+    await redis_client.decr(redis_key)
+    return True
+
+
+async def lua_daily_check(endpoint: str, limit: int) -> bool:
+    remaining = await check_daily_limit(endpoint, limit)
+    return remaining is None or remaining >= 0
+
+
+async def sliding_window_check(endpoint: str, limit: int) -> bool:
+    remaining = await check_sliding_window(endpoint, limit, window_seconds=3600)
+    return remaining is None or remaining >= 0
+
+
+async def run_mode(name: str, check, concurrency: int, limit: int) -> dict:
+    endpoint = f"bench_{name}"
+    await redis_client.delete(f"rate_limit:api:{endpoint}")
+    await redis_client.delete(f"rate_limit:sliding:{endpoint}:global")
+
+    latencies = []
+
+    async def one_call() -> bool:
+        start = time.perf_counter()
+        allowed = await check(endpoint, limit)
+        latencies.append((time.perf_counter() - start) * 1000)
+        return allowed
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*[one_call() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+
+    await redis_client.delete(f"rate_limit:api:{endpoint}")
+    await redis_client.delete(f"rate_limit:sliding:{endpoint}:global")
+
+    latencies.sort()
+    admitted = sum(results)
+    return {
+        "mode": name,
+        "admitted": admitted,
+        "overshoot": max(0, admitted - limit),
+        "throughput_rps": round(concurrency / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1], 2),
+    }
+
+
+async def main():
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    await redis_client.get_client()
+    if not await redis_client.is_connected():
+        print(f"❌ Redis not reachable at {os.environ['REDIS_URL']}")
+        return
+
+    print(f"🚦 Rate limiter benchmark: {concurrency} concurrent requests, limit {limit}")
+    print("-" * 78)
+    print(f"{'mode':<16}{'admitted':>10}{'overshoot':>11}{'req/s':>12}{'p50 ms':>12}{'p99 ms':>12}")
+    for name, check in [
+        ("legacy", legacy_check),
+        ("lua_daily", lua_daily_check),
+        ("sliding_window", sliding_window_check),
+    ]:
+        r = await run_mode(name, check, concurrency, limit)
+        print(f"{r['mode']:<16}{r['admitted']:>10}{r['overshoot']:>11}{r['throughput_rps']:>12}{r['p50_ms']:>12}{r['p99_ms']:>12}")
+
+    await redis_client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,68 @@
+"""
+Unit tests for the RedisCache value codec (app/cache_codec.py).
+
+msgpack and zstandard are optional; their tests are skipped when not installed.
+"""
+
+import json
+import pytest
+
+from app import cache_codec
+from app.cache_codec import CacheCodec
+
+
+PLACES = [
+    {
+        "place_id": f"place_{i}",
+        "name": f"Museum {i}",
+        "rating": 4.5,
+        "types": ["museum", "tourist_attraction"],
+        "geometry": {"location": {"lat": 29.42 + i / 1000, "lng": -98.49}},
+        "reviews": [{"text": "Lovely place " * 20, "rating": 5}] * 3,
+    }
+    for i in range(10)
+]
+
+needs_msgpack = pytest.mark.skipif(cache_codec.msgpack is None, reason="msgpack not installed")
+needs_zstd = pytest.mark.skipif(cache_codec.zstandard is None, reason="zstandard not installed")
+
+
+class TestCacheCodec:
+    """Round trips, headers and legacy compatibility"""
+
+    @pytest.mark.parametrize("serializer", ["json", "orjson", pytest.param("msgpack", marks=needs_msgpack)])
+    def test_round_trip(self, serializer):
+        codec = CacheCodec(serializer=serializer, compression="none")
+        encoded = codec.encode(PLACES)
+        assert encoded[:1] == b"\x01"
+        assert codec.decode(encoded) == PLACES
+
+    def test_legacy_json_is_readable(self):
+        codec = CacheCodec(serializer="orjson", compression="none")
+        assert codec.decode(json.dumps(PLACES).encode()) == PLACES
+
+    def test_reads_do_not_depend_on_current_configuration(self):
+        written = CacheCodec(serializer="json", compression="none").encode({"lat": 1.5})
+        assert CacheCodec(serializer="orjson", compression="none").decode(written) == {"lat": 1.5}
+
+    @needs_zstd
+    def test_large_values_are_compressed(self):
+        codec = CacheCodec(serializer="orjson", compression="zstd", compress_min_bytes=100)
+        encoded = codec.encode(PLACES)
+        assert encoded[2:3] == b"z"
+        assert len(encoded) < len(json.dumps(PLACES))
+        assert codec.decode(encoded) == PLACES
+        # Small values skip compression
+        assert codec.encode({"lat": 1.0})[2:3] == b"-"
+
+    def test_missing_optional_dependencies_fall_back(self, monkeypatch):
+        monkeypatch.setattr(cache_codec, "orjson", None)
+        monkeypatch.setattr(cache_codec, "zstandard", None)
+        codec = CacheCodec(serializer="orjson", compression="zstd")
+        assert codec.describe()["serializer"] == "json"
+        assert codec.describe()["compression"] is None
+        assert codec.decode(codec.encode(PLACES)) == PLACES
+
+    def test_unknown_header_raises(self):
+        with pytest.raises(ValueError):
+            CacheCodec().decode(b"\x01?-payload")
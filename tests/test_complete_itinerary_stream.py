@@ -0,0 +1,180 @@
+"""
+Unit tests for the progressive /complete-itinerary stream
+(stream_complete_itinerary, enhance_itinerary_simultaneously progress events
+and events_from_callback in app/streaming.py).
+"""
+
+import asyncio
+from unittest.mock import MagicMock, patch
+
+from app import complete_itinerary as ci
+from app.schema import LandmarkSelection, StructuredItinerary, StructuredDayPlan, ItineraryBlock
+from app.llm_gateway import LLMGateway, StubBackend
+from app.streaming import events_from_callback
+
+
+def selection(days=2):
+    return LandmarkSelection(
+        details={"destination": "Austin", "travelDays": days, "startDate": "2026-06-01", "endDate": "2026-06-02"},
+        itinerary=[
+            {"day": d, "attractions": [{"name": f"Landmark {d}", "description": "", "location": {"lat": 30.0, "lng": -97.0}, "type": "landmark"}]}
+            for d in range(1, days + 1)
+        ]
+    )
+
+
+def skeleton(days=2):
+    return StructuredItinerary(itinerary=[
+        StructuredDayPlan(day=d, blocks=[ItineraryBlock(type="landmark", name=f"Landmark {d}", start_time="9:00 AM", duration="2h")])
+        for d in range(1, days + 1)
+    ])
+
+
+def stub_gateway(**responders):
+    return LLMGateway(backend=StubBackend(latency=0, responders=responders))
+
+
+def fail(message):
+    def respond(prompt):
+        raise RuntimeError(message)
+    return respond
+
+
+async def collect(events):
+    return [event async for event in events]
+
+
+class TestEventsFromCallback:
+    def test_emitted_events_then_result(self):
+        async def run(emit):
+            emit({"event": "a"})
+            await asyncio.sleep(0.01)
+            emit({"event": "b"})
+            return {"event": "done"}
+
+        events = asyncio.run(collect(events_from_callback(run)))
+        assert [e["event"] for e in events] == ["a", "b", "done"]
+
+    def test_consumer_closing_cancels_task(self):
+        async def scenario():
+            state = {"cancelled": False}
+
+            async def run(emit):
+                emit({"event": "first"})
+                try:
+                    await asyncio.sleep(5)
+                except asyncio.CancelledError:
+                    state["cancelled"] = True
+                    raise
+
+            stream = events_from_callback(run)
+            assert (await stream.__anext__())["event"] == "first"
+            await stream.aclose()
+            await asyncio.sleep(0)
+            return state["cancelled"]
+
+        assert asyncio.run(scenario())
+
+
+class TestStreamCompleteItinerary:
+    """Stages are reported as they finish, followed by the full response"""
+
+    def test_skeleton_timings_and_complete(self):
+        gateway = stub_gateway(itinerary=lambda prompt: "{}")
+        with patch.object(ci, "get_llm_gateway", return_value=gateway), patch.object(ci, "parser") as parser:
+            parser.parse = MagicMock(return_value=skeleton())
+            events = asyncio.run(collect(ci.stream_complete_itinerary(selection(), places_client=None)))
+
+        kinds = [e["event"] for e in events]
+        assert kinds[0] == "timing" and events[0]["stage"] == "llm_generation"
+        assert kinds[1] == "skeleton"
+        assert [d["day"] for d in events[1]["itinerary"]] == [1, 2]
+        assert kinds[-1] == "complete"
+        stages = [e["stage"] for e in events if e["event"] == "timing"]
+        assert stages == ["llm_generation", "duplicate_removal", "total_generation"]
+        assert events[-1]["performance_metrics"]["timings"].keys() >= set(stages)
+        assert events[-1]["itinerary"][0]["blocks"][0]["name"] == "Landmark 1"
+
+    def test_llm_failure_ends_with_error(self):
+        gateway = stub_gateway(itinerary=fail("primary down"), itinerary_backup=fail("backup down"))
+        with patch.object(ci, "get_llm_gateway", return_value=gateway):
+            events = asyncio.run(collect(ci.stream_complete_itinerary(selection(), places_client=None)))
+
+        assert events == [{"event": "error", "status_code": 500, "detail": "backup down"}]
+
+
+class TestSimultaneousProgress:
+    def test_restaurants_reported_per_day_as_they_finish(self):
+        delays = {1: 0.03, 2: 0.01}
+
+        async def add_restaurants(day_plan, places_client, destination, used, is_theme_park):
+            await asyncio.sleep(delays[day_plan.day])
+            lunch = ItineraryBlock(type="restaurant", name=f"Lunch {day_plan.day}", start_time="12:00 PM", duration="1h", mealtime="lunch")
+            return StructuredDayPlan(day=day_plan.day, blocks=day_plan.blocks + [lunch])
+
+        async def enhance(itinerary, places_client, destination, progress=None, **kwargs):
+            return itinerary, 0
+
+        async def describe(itinerary, destination, progress=None):
+            return None
+
+        events = []
+        with patch.object(ci, "add_restaurants_to_day_optimized", side_effect=add_restaurants), \
+                patch.object(ci, "enhance_landmarks_cost_efficiently", side_effect=enhance), \
+                patch.object(ci, "describe_landmarks", side_effect=describe):
+            itinerary, _ = asyncio.run(ci.enhance_itinerary_simultaneously(skeleton(), MagicMock(), "Austin", set(), events.append))
+
+        assert [(e["event"], e["day"]) for e in events] == [("restaurants", 2), ("restaurants", 1)]
+        assert events[0]["blocks"][0]["name"] == "Lunch 2"
+        assert [b.name for b in itinerary.itinerary[0].blocks] == ["Landmark 1", "Lunch 1"]
+
+
+class TestStreamedDayCleanup:
+    """Enrichment started while the LLM streams is cancelled and its restaurants freed when unused"""
+
+    def run_with_streamed_days(self, final_itinerary, cancel_after=None):
+        started, already_used = {}, []
+
+        async def enrich(day_plan, places_client, destination, used_restaurants, progress=None):
+            # Whether this day's restaurant was still taken when enrichment (re)started
+            already_used.append((day_plan.day, f"diner {day_plan.day}" in used_restaurants))
+            used_restaurants.add(f"diner {day_plan.day}")
+            started[day_plan.day] = asyncio.current_task()
+            await asyncio.sleep(10)
+
+        async def stream(prompt_text, on_day):
+            for day in skeleton().itinerary:
+                on_day(day)
+            await asyncio.sleep(0)
+            return "{}", None
+
+        async def scenario():
+            run = asyncio.ensure_future(ci.complete_itinerary_from_selection(selection(), places_client=MagicMock(), bypass_cache=True))
+            await asyncio.sleep(0.01 if cancel_after is None else cancel_after)
+            run.cancel()
+            try:
+                await run
+            except asyncio.CancelledError:
+                pass
+            await asyncio.sleep(0)
+
+        with patch.object(ci, "stream_itinerary_from_llm", side_effect=stream), \
+                patch.object(ci, "enrich_day", side_effect=enrich), \
+                patch.object(ci, "parser") as parser:
+            parser.parse = MagicMock(return_value=final_itinerary)
+            asyncio.run(scenario())
+        return started, already_used
+
+    def test_rewritten_day_is_cancelled_and_gives_back_restaurants(self):
+        final = skeleton()
+        final.itinerary[0].blocks[0].name = "Rewritten Landmark"
+        started, already_used = self.run_with_streamed_days(final)
+
+        # Day 1 was discarded: its early task is cancelled and "diner 1" is free for the redo
+        assert started[1].cancelled()
+        assert already_used == [(1, False), (2, False), (1, False)]
+
+    def test_client_disconnect_cancels_streamed_days(self):
+        started, _ = self.run_with_streamed_days(skeleton(), cancel_after=0.001)
+        assert set(started) == {1, 2}
+        assert all(task.cancelled() for task in started.values())
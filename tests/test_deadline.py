@@ -0,0 +1,141 @@
+"""
+Unit tests for per-request deadline propagation (app/deadline.py) and the
+best-effort behaviour of the clients when the budget runs out.
+"""
+
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+from app.deadline import (
+    MIN_TIMEOUT, budget_timeout, deadline_for_path, deadline_scope, expired, remaining
+)
+from app.places_client import GooglePlacesClient
+from app.routes_client import GoogleRoutesClient
+
+
+class TestDeadlineContext:
+    def test_no_deadline_keeps_defaults(self):
+        assert remaining() is None
+        assert not expired()
+        assert budget_timeout(10) == 10
+
+    def test_budget_caps_sub_call_timeouts(self):
+        with deadline_scope(2.0):
+            assert 1.9 < budget_timeout(10) <= 2.0
+            assert budget_timeout(0.5) == 0.5
+        assert remaining() is None
+
+    def test_inner_scope_cannot_extend_outer(self):
+        with deadline_scope(0.5):
+            with deadline_scope(30):
+                assert remaining() <= 0.5
+            with deadline_scope(None):
+                # Detached, e.g. for background refreshes
+                assert remaining() is None
+
+    def test_exhausted_budget_still_gives_minimum_slice(self):
+        with deadline_scope(0.0):
+            time.sleep(0.001)
+            assert expired()
+            assert budget_timeout(10) == MIN_TIMEOUT
+
+    def test_scope_is_per_task(self):
+        async def other_request():
+            return remaining()
+
+        async def scenario():
+            with deadline_scope(1.0):
+                task = asyncio.ensure_future(other_request())
+            # Tasks copy the context when created, so the budget follows the work
+            return await task, remaining()
+
+        inherited, after = asyncio.run(scenario())
+        assert inherited is not None and after is None
+
+    def test_path_budgets(self):
+        assert deadline_for_path("/generate/stream") == deadline_for_path("/generate")
+        assert deadline_for_path("/generatex") == deadline_for_path("/unknown")
+
+
+def make_places_client(details):
+    client = GooglePlacesClient.__new__(GooglePlacesClient)
+    client.logger = MagicMock()
+    client.deadline_stats = {'partial_details': 0, 'uncached_partial': 0}
+    client._detached_details = set()
+    client.get_place_details = AsyncMock(side_effect=details)
+    return client
+
+
+class TestPartialDetails:
+    """Places still waiting on details when the budget ends fall back to search records"""
+
+    def test_slow_details_fall_back_to_search_results(self):
+        async def details(place_id, profile='enrich'):
+            await asyncio.sleep(0.01 if place_id == 'fast' else 1)
+            return {'status': 'OK', 'result': {'place_id': place_id, 'name': 'Detailed', 'website': 'https://x'}}
+
+        async def scenario():
+            client = make_places_client(details)
+            places = [{'place_id': 'fast', 'name': 'Fast'}, {'place_id': 'slow', 'name': 'Slow'}]
+            with deadline_scope(0.2):
+                start = time.perf_counter()
+                results = await client._fetch_details_within_budget(places)
+                return client, results, time.perf_counter() - start
+
+        client, results, elapsed = asyncio.run(scenario())
+        assert elapsed < 0.5
+        assert results == [
+            {'place_id': 'fast', 'name': 'Detailed', 'website': 'https://x'},
+            {'place_id': 'slow', 'name': 'Slow'},
+        ]
+        assert client.deadline_stats['partial_details'] == 1
+
+    def test_late_details_finish_outside_the_request_budget(self):
+        budgets = {}
+
+        async def details(place_id, profile='enrich'):
+            budgets[place_id] = remaining()
+            await asyncio.sleep(0.3)
+            return {'status': 'OK', 'result': {'place_id': place_id}}
+
+        async def scenario():
+            client = make_places_client(details)
+            with deadline_scope(0.05):
+                results = await client._fetch_details_within_budget([{'place_id': 'slow'}])
+            late = list(client._detached_details)
+            await asyncio.gather(*late)
+            return client, results, late
+
+        client, results, late = asyncio.run(scenario())
+        assert results == [{'place_id': 'slow'}]
+        # Ran with its own timeouts, not the request's, and completed after the response
+        assert budgets == {'slow': None}
+        assert late[0].result() == {'status': 'OK', 'result': {'place_id': 'slow'}}
+        assert client._detached_details == set()
+
+    def test_no_deadline_waits_for_all(self):
+        async def details(place_id, profile='enrich'):
+            await asyncio.sleep(0.01)
+            return {'status': 'OK', 'result': {'place_id': place_id}}
+
+        results = asyncio.run(make_places_client(details)._fetch_details_within_budget([{'place_id': 'a'}, {'place_id': 'b'}]))
+        assert results == [{'place_id': 'a'}, {'place_id': 'b'}]
+
+
+class TestRoutesDeadline:
+    def test_expired_budget_skips_per_pair_fallback(self):
+        session = MagicMock()
+        client = GoogleRoutesClient(session=session)
+        client._compute_route_matrix = AsyncMock(return_value=None)
+        origins = [{'lat': 30.0, 'lng': -97.0}]
+        destinations = [{'lat': 30.1, 'lng': -97.1}]
+
+        async def scenario():
+            with deadline_scope(0.0):
+                await asyncio.sleep(0.001)
+                return await client.calculate_distance_matrix(origins, destinations)
+
+        matrix = asyncio.run(scenario())
+        assert matrix[0][0]['error']
+        session.post.assert_not_called()
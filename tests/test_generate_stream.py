@@ -0,0 +1,163 @@
+"""
+Unit tests for the streaming variant of /generate
+(RecommendationGenerator.stream_recommendations and app/streaming.py).
+"""
+
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+from app.recommendations import RecommendationGenerator
+from app.single_flight import SingleFlight
+from app.stage_graph import StageStats
+from app.streaming import encode_ndjson, encode_sse, wants_sse
+
+LOCATION = {"lat": 30.2672, "lng": -97.7431}
+
+
+def place(name, rating=4.5, reviews=1000):
+    return {
+        "place_id": name.lower().replace(" ", "_"),
+        "name": name,
+        "rating": rating,
+        "user_ratings_total": reviews,
+        "geometry": {"location": LOCATION},
+        "types": ["point_of_interest"],
+    }
+
+
+def make_generator(get_places, location=LOCATION):
+    generator = RecommendationGenerator.__new__(RecommendationGenerator)
+    generator.logger = MagicMock()
+    generator.default_photo_max_width = 800
+    generator.places_client = MagicMock()
+    generator.stage_stats = StageStats()
+    generator.places_client.geocode = AsyncMock(return_value=location)
+    generator.places_client.calculate_radius = AsyncMock(return_value=10000)
+    generator.places_client.get_places = AsyncMock(side_effect=get_places)
+    generator.preferences_parser = MagicMock()
+    generator.preferences_parser.parse_special_requests = AsyncMock(return_value={})
+    generator.preferences_parser.enhance_preferences = MagicMock(return_value={"keywords": [], "cuisine_types": []})
+    return generator
+
+
+async def collect(events):
+    return [event async for event in events]
+
+
+class TestStreamRecommendations:
+    """Events arrive per search, fastest first, followed by a ranked summary"""
+
+    def test_events_follow_completion_order(self):
+        delays = {"restaurant": 0.01, "museum": 0.03}
+
+        async def get_places(location, place_type, keywords=None, max_results=None, special_requests=None):
+            await asyncio.sleep(delays.get(place_type, 0.05))
+            return [place(f"{place_type} one"), place(f"{place_type} two")]
+
+        async def scenario():
+            generator = make_generator(get_places)
+            return await collect(generator.stream_recommendations("Austin", travel_days=2))
+
+        events = asyncio.run(scenario())
+        kinds = [event["event"] for event in events]
+        assert kinds[0] == "start"
+        assert kinds[-1] == "summary"
+        assert kinds[1] == "restaurants"
+        assert events[2]["place_type"] == "museum"
+        assert set(events[0]["searches"]) == {"tourist_attraction", "museum", "park", "zoo", "restaurant"}
+
+        summary = events[-1]["recommendations"]
+        assert len(summary["restaurants"]) == 2
+        assert len(summary["landmarks"]) == 8
+
+    def test_duplicate_landmarks_sent_once(self):
+        async def get_places(location, place_type, keywords=None, max_results=None, special_requests=None):
+            return [place("Shared Landmark")] if place_type != "restaurant" else [place("Cafe")]
+
+        events = asyncio.run(collect(make_generator(get_places).stream_recommendations("Austin", travel_days=1)))
+        sent = [p["name"] for e in events if e["event"] == "landmarks" for p in e["places"]]
+        assert sent == ["Shared Landmark"]
+        assert [p["name"] for p in events[-1]["recommendations"]["landmarks"]] == ["Shared Landmark"]
+
+    def test_failed_search_does_not_stop_stream(self):
+        async def get_places(location, place_type, keywords=None, max_results=None, special_requests=None):
+            if place_type == "museum":
+                raise RuntimeError("boom")
+            return [place(f"{place_type} spot")]
+
+        events = asyncio.run(collect(make_generator(get_places).stream_recommendations("Austin", travel_days=1)))
+        museum = next(e for e in events if e.get("place_type") == "museum")
+        assert museum["places"] == []
+        assert events[-1]["event"] == "summary"
+
+    def test_timeout_cancels_slow_searches(self):
+        cancelled = []
+
+        async def get_places(location, place_type, keywords=None, max_results=None, special_requests=None):
+            if place_type == "restaurant":
+                return [place("Fast Cafe")]
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(place_type)
+                raise
+            return []
+
+        async def scenario():
+            generator = make_generator(get_places)
+            events = await collect(generator.stream_recommendations("Austin", travel_days=1, timeout=0.05))
+            await asyncio.sleep(0)
+            return events
+
+        events = asyncio.run(scenario())
+        assert events[-1]["event"] == "summary"
+        assert events[-1]["recommendations"]["restaurants"][0]["name"] == "Fast Cafe"
+        assert len(cancelled) == 4
+
+    def test_disconnect_leaves_shared_searches_running(self):
+        flight = SingleFlight()
+        fetched = []
+
+        async def get_places(location, place_type, keywords=None, max_results=None, special_requests=None):
+            async def fetch():
+                await asyncio.sleep(0.05)
+                fetched.append(place_type)
+                return [place(f"{place_type} spot")]
+            return await flight.do(f"places:{place_type}", fetch)
+
+        async def scenario():
+            events = make_generator(get_places).stream_recommendations("Austin", travel_days=1)
+            assert (await events.__anext__())["event"] == "start"
+            # A concurrent /generate request shares the museum search
+            other_request = asyncio.ensure_future(get_places(LOCATION, "museum"))
+            await asyncio.sleep(0.01)
+            await events.aclose()  # client disconnected
+            return await other_request
+
+        assert asyncio.run(scenario()) == [place("museum spot")]
+        assert "museum" in fetched
+
+    def test_stage_timings_recorded(self):
+        async def get_places(location, place_type, keywords=None, max_results=None, special_requests=None):
+            return [place(f"{place_type} spot")]
+
+        generator = make_generator(get_places)
+        asyncio.run(collect(generator.stream_recommendations("Austin", travel_days=1)))
+        assert {"preferences", "geocode", "radius", "search", "ranking"} <= set(generator.stage_stats.get_stats()["stages"])
+
+    def test_geocode_failure_yields_error(self):
+        generator = make_generator(AsyncMock(return_value=[]), location=None)
+        events = asyncio.run(collect(generator.stream_recommendations("Nowhere", travel_days=1)))
+        assert events == [{"event": "error", "status_code": 404, "detail": "Could not find location for destination: Nowhere"}]
+        generator.places_client.get_places.assert_not_called()
+
+
+class TestEventEncoding:
+    def test_ndjson_and_sse_frames(self):
+        event = {"event": "restaurants", "places": []}
+        assert json.loads(encode_ndjson(event)) == event
+        assert encode_sse(event) == 'event: restaurants\ndata: {"event": "restaurants", "places": []}\n\n'
+        assert wants_sse("text/event-stream")
+        assert not wants_sse("application/json")
+        assert not wants_sse(None)
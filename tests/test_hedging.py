@@ -0,0 +1,147 @@
+"""
+Unit tests for hedged LLM calls (app/hedging.py) and their use for the
+primary/backup itinerary models in complete_itinerary_from_selection.
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app import complete_itinerary as ci
+from app.hedging import HEDGE_MIN_SAMPLES, HedgePolicy, LatencyTracker
+from app.llm_gateway import LLMGateway, StubBackend
+from app.schema import LandmarkSelection, StructuredItinerary, StructuredDayPlan, ItineraryBlock
+
+
+def call(result=None, delay=0.0, error=None, state=None, name=None):
+    async def run():
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            if state is not None:
+                state.append(f"{name} cancelled")
+            raise
+        if error:
+            raise error
+        return result
+    return run
+
+
+class TestLatencyTracker:
+    def test_percentiles(self):
+        tracker = LatencyTracker(window=100)
+        for i in range(1, 101):
+            tracker.record(i / 10)
+        assert tracker.percentile(50) == 5.0
+        assert tracker.percentile(99) == 9.9
+
+    def test_window_forgets_old_samples(self):
+        tracker = LatencyTracker(window=3)
+        for seconds in (10, 10, 1, 1, 1):
+            tracker.record(seconds)
+        assert tracker.percentile(99) == 1
+
+
+class TestHedgePolicy:
+    def test_fast_primary_never_hedges(self):
+        policy = HedgePolicy("test", initial_delay=0.1)
+        backup = AsyncMock()
+        assert asyncio.run(policy.run(call("primary"), backup)) == ("primary", "primary")
+        backup.assert_not_called()
+        assert policy.get_stats()["hedge_rate"] == 0.0
+
+    def test_slow_primary_races_backup_and_is_cancelled(self):
+        state = []
+        policy = HedgePolicy("test", initial_delay=0.05)
+
+        async def scenario():
+            return await policy.run(call("primary", delay=1, state=state, name="primary"), call("backup", delay=0.01))
+
+        assert asyncio.run(scenario()) == ("backup", "backup")
+        assert state == ["primary cancelled"]
+        stats = policy.get_stats()
+        assert stats["hedged"] == 1 and stats["backup_wins"] == 1 and stats["hedge_rate"] == 1.0
+
+    def test_hedged_primary_can_still_win(self):
+        state = []
+        policy = HedgePolicy("test", initial_delay=0.02)
+        result = asyncio.run(policy.run(call("primary", delay=0.05), call("backup", delay=1, state=state, name="backup")))
+        assert result == ("primary", "primary")
+        assert state == ["backup cancelled"]
+
+    def test_invalid_backup_does_not_beat_primary(self):
+        policy = HedgePolicy("test", initial_delay=0.02)
+        result = asyncio.run(policy.run(call("primary", delay=0.1), call(error=ValueError("unparseable"), delay=0.03)))
+        assert result == ("primary", "primary")
+
+    def test_failed_primary_falls_back_immediately(self):
+        policy = HedgePolicy("test", initial_delay=5)
+        result = asyncio.run(policy.run(call(error=RuntimeError("down")), call("backup")))
+        assert result == ("backup", "backup")
+        assert policy.stats["fallbacks"] == 1 and policy.stats["hedged"] == 0
+
+    def test_both_failing_raises_backup_error(self):
+        policy = HedgePolicy("test", initial_delay=5)
+        with pytest.raises(RuntimeError, match="backup down"):
+            asyncio.run(policy.run(call(error=RuntimeError("primary down")), call(error=RuntimeError("backup down"))))
+        assert policy.stats["failures"] == 1
+
+    def test_delay_adapts_to_observed_latency(self):
+        policy = HedgePolicy("test", percentile=95, initial_delay=10, min_delay=0.5, max_delay=20)
+        assert policy.hedge_delay() == 10
+        for _ in range(HEDGE_MIN_SAMPLES):
+            policy.latencies.record(3.0)
+        assert policy.hedge_delay() == 3.0
+        policy.latencies.record(0.01)
+        for _ in range(200):
+            policy.latencies.record(0.1)
+        assert policy.hedge_delay() == 0.5
+        assert policy.get_stats()["primary_p50_s"] == 0.1
+
+    def test_delay_does_not_decay_under_slow_primary(self):
+        policy = HedgePolicy("test", percentile=95, initial_delay=0.05, min_delay=0.01, max_delay=1)
+        for _ in range(HEDGE_MIN_SAMPLES):
+            policy.latencies.record(0.05)
+
+        async def scenario():
+            for _ in range(HEDGE_MIN_SAMPLES):
+                await policy.run(call("primary", delay=1), call("backup", delay=0.03))
+
+        asyncio.run(scenario())
+        # Each backup win records the primary as at least delay + backup time, so the delay
+        # moves towards the primary's real latency instead of staying at the old fast one
+        assert policy.stats["backup_wins"] == HEDGE_MIN_SAMPLES
+        assert len(policy.latencies.samples) == 2 * HEDGE_MIN_SAMPLES
+        assert policy.hedge_delay() >= 0.08
+
+    def test_fast_failing_primary_records_no_latency(self):
+        policy = HedgePolicy("test", initial_delay=5)
+        asyncio.run(policy.run(call(error=RuntimeError("down")), call("backup")))
+        assert len(policy.latencies.samples) == 0
+
+
+class TestItineraryHedging:
+    def test_slow_primary_stream_loses_to_backup(self):
+        sel = LandmarkSelection(
+            details={"destination": "Austin", "travelDays": 1, "startDate": "2026-06-01", "endDate": "2026-06-01"},
+            itinerary=[{"day": 1, "attractions": [{"name": "Capitol", "description": "", "location": {"lat": 30.2, "lng": -97.7}, "type": "landmark"}]}]
+        )
+        skeleton = StructuredItinerary(itinerary=[
+            StructuredDayPlan(day=1, blocks=[ItineraryBlock(type="landmark", name="Capitol", start_time="09:00", duration="2h")])
+        ])
+
+        class SlowPrimary(StubBackend):
+            async def stream(self, request, timeout, purpose):
+                await asyncio.sleep(5)
+                yield "{}", None
+
+        backend = SlowPrimary(latency=0, responders={"itinerary_backup": lambda prompt: skeleton.model_dump_json()})
+        with patch.object(ci, "get_llm_gateway", return_value=LLMGateway(backend=backend)), \
+                patch.object(ci, "itinerary_llm_hedge", HedgePolicy("itinerary_llm", initial_delay=0.05)) as policy:
+            result = asyncio.run(ci.complete_itinerary_from_selection(sel, places_client=None))
+
+        assert "llm_generation_backup" in result["performance_metrics"]["timings"]
+        assert result["performance_metrics"]["timings"]["llm_generation_backup"] < 1
+        assert result["itinerary"][0]["blocks"][0]["name"] == "Capitol"
+        assert policy.get_stats()["hedged"] == 1
@@ -0,0 +1,301 @@
+"""
+Unit tests for the streaming image proxy (app/image_proxy.py and serve_image in
+app/main.py): ETag revalidation, byte ranges on cached images, streaming
+upstream bytes to the client while teeing them into the cache, and the
+content-addressed disk image store (app/image_store.py).
+"""
+
+import asyncio
+import os
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi import HTTPException
+from fastapi.responses import FileResponse
+
+from app import image_proxy
+from app.image_proxy import (
+    RangeNotSatisfiable, cached_image_response, etag_matches, image_etag, parse_range, stream_upstream_image
+)
+from app.image_store import ImageStore, image_ref_key
+from app.main import serve_image
+
+IMAGE = bytes(range(256)) * 40  # 10240 bytes
+
+
+class FakeUpstream:
+    def __init__(self, body=IMAGE, status=200, chunk=1000, headers=None):
+        self.status = status
+        self.headers = headers if headers is not None else {"Content-Type": "image/png", "Content-Length": str(len(body))}
+        self.released = False
+        self.content = MagicMock()
+        self.content.iter_chunked = lambda size: self._chunks(body, chunk)
+
+    async def _chunks(self, body, chunk):
+        for i in range(0, len(body), chunk):
+            await asyncio.sleep(0)
+            yield body[i:i + chunk]
+
+    def release(self):
+        self.released = True
+
+
+def session_returning(upstream):
+    session = MagicMock()
+    session.get = AsyncMock(return_value=upstream)
+    return session
+
+
+async def read_body(response):
+    return b"".join([chunk async for chunk in response.body_iterator])
+
+
+def request_with(headers):
+    request = MagicMock()
+    request.headers = headers
+    return request
+
+
+class TestConditionalAndRange:
+    def test_etag_is_stable_and_matches_weak_or_listed_tags(self):
+        etag = image_etag("image_proxy:maxwidth:800:photoreference:abc")
+        assert etag == image_etag("image_proxy:maxwidth:800:photoreference:abc")
+        assert etag != image_etag("image_proxy:maxwidth:400:photoreference:abc")
+        assert etag_matches(f'"other", W/{etag}', etag)
+        assert etag_matches("*", etag)
+        assert not etag_matches(None, etag)
+
+    def test_parse_range(self):
+        assert parse_range("bytes=0-99", 1000) == (0, 99)
+        assert parse_range("bytes=900-", 1000) == (900, 999)
+        assert parse_range("bytes=-100", 1000) == (900, 999)
+        assert parse_range("bytes=500-5000", 1000) == (500, 999)
+        # Multi-range and malformed headers fall back to the full image
+        assert parse_range("bytes=0-1,5-9", 1000) is None
+        assert parse_range("items=0-1", 1000) is None
+        with pytest.raises(RangeNotSatisfiable):
+            parse_range("bytes=1000-", 1000)
+
+    def test_cached_range_response(self):
+        etag = image_etag("k")
+        response = cached_image_response(IMAGE, etag, "public", range_header="bytes=10-19")
+        assert response.status_code == 206
+        assert response.body == IMAGE[10:20]
+        assert response.headers["content-range"] == f"bytes 10-19/{len(IMAGE)}"
+
+        stale = cached_image_response(IMAGE, etag, "public", range_header="bytes=10-19", if_range='"old"')
+        assert stale.status_code == 200 and stale.body == IMAGE
+
+        unsatisfiable = cached_image_response(IMAGE, etag, "public", range_header=f"bytes={len(IMAGE)}-")
+        assert unsatisfiable.status_code == 416
+
+
+class TestStreamingMiss:
+    def test_streams_chunks_and_caches_complete_image(self):
+        store = AsyncMock()
+        upstream = FakeUpstream()
+
+        async def scenario():
+            response = await stream_upstream_image(session_returning(upstream), {}, '"e"', "public", store, timeout=3)
+            body = await read_body(response)
+            await asyncio.gather(*image_proxy._background)
+            return response, body
+
+        response, body = asyncio.run(scenario())
+        assert body == IMAGE
+        assert response.media_type == "image/png"
+        assert response.headers["content-length"] == str(len(IMAGE))
+        assert response.headers["x-cache"] == "MISS"
+        store.assert_awaited_once_with(IMAGE, "image/png")
+        assert upstream.released
+
+    def test_images_over_buffer_cap_are_streamed_but_not_cached(self):
+        store = AsyncMock()
+        with patch.object(image_proxy, "IMAGE_MAX_BUFFER_BYTES", 4096):
+            async def scenario():
+                response = await stream_upstream_image(session_returning(FakeUpstream()), {}, '"e"', "public", store, timeout=3)
+                return await read_body(response)
+            assert asyncio.run(scenario()) == IMAGE
+        store.assert_not_awaited()
+
+    def test_client_disconnect_does_not_cache_partial_image(self):
+        store = AsyncMock()
+        upstream = FakeUpstream()
+
+        async def scenario():
+            response = await stream_upstream_image(session_returning(upstream), {}, '"e"', "public", store, timeout=3)
+            chunks = response.body_iterator
+            await chunks.__anext__()
+            await chunks.aclose()
+
+        asyncio.run(scenario())
+        store.assert_not_awaited()
+        assert upstream.released
+
+    def test_upstream_error_status(self):
+        upstream = FakeUpstream(status=403)
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(stream_upstream_image(session_returning(upstream), {}, '"e"', "public", AsyncMock(), timeout=3))
+        assert error.value.status_code == 403
+        assert upstream.released
+
+
+def serve(client, session, headers=None, store=None, maxheight=None):
+    """serve_image for key image_proxy:k, with the given disk store (None: images kept in Redis)"""
+    with patch("app.main.get_image_store", return_value=store):
+        return asyncio.run(serve_image(
+            request_with(headers or {}), client, session, "image_proxy:k", "ref", 800, maxheight, "public"
+        ))
+
+
+def places_client(cached=None, refs=None):
+    client = MagicMock()
+    refs = {} if refs is None else refs
+    client.cache.get = AsyncMock(side_effect=lambda key: refs.get(key, cached if key == "image_proxy:k" else None))
+    client.cache.get_swr = AsyncMock(side_effect=lambda key, refresh: refs.get(key, cached if key == "image_proxy:k" else None))
+
+    async def set_value(key, value, ttl_type):
+        refs[key] = value
+    client.cache.set = AsyncMock(side_effect=set_value)
+    client.rate_limits = {"photos": MagicMock(acquire=AsyncMock(return_value=True))}
+    return client
+
+
+class TestServeImage:
+    def test_matching_etag_skips_cache_and_upstream(self):
+        client = places_client()
+        session = session_returning(FakeUpstream())
+        response = serve(client, session, headers={"if-none-match": image_etag("image_proxy:k")})
+        assert response.status_code == 304
+        client.cache.get_swr.assert_not_awaited()
+        session.get.assert_not_awaited()
+
+    def test_cache_hit_serves_range(self):
+        session = session_returning(FakeUpstream())
+        response = serve(places_client(cached=IMAGE), session, headers={"range": "bytes=-10"})
+        assert response.status_code == 206 and response.body == IMAGE[-10:]
+        session.get.assert_not_awaited()
+
+    def test_cache_miss_streams_from_google(self):
+        client = places_client()
+        session = session_returning(FakeUpstream())
+
+        async def scenario():
+            with patch("app.main.get_image_store", return_value=None):
+                response = await serve_image(request_with({}), client, session, "image_proxy:k", "ref", 800, 600, "public")
+            body = await read_body(response)
+            await asyncio.gather(*image_proxy._background)
+            return body
+
+        assert asyncio.run(scenario()) == IMAGE
+        assert session.get.await_args.kwargs["params"]["maxheight"] == "600"
+        client.cache.set.assert_awaited_once_with("image_proxy:k", IMAGE, "image_proxy")
+
+
+class TestImageStore:
+    def test_content_addressed_and_deduplicated(self, tmp_path):
+        store = ImageStore(str(tmp_path), max_bytes=10 ** 6)
+
+        async def scenario():
+            return await store.put(IMAGE), await store.put(IMAGE)
+
+        first, second = asyncio.run(scenario())
+        assert first == second
+        path, stat = store.lookup(first)
+        assert open(path, "rb").read() == IMAGE and stat.st_size == len(IMAGE)
+        assert store.stats["writes"] == 1 and store.stats["deduplicated"] == 1
+        assert store.lookup("0" * 64) is None
+
+    def test_least_recently_used_blobs_evicted_over_cap(self, tmp_path):
+        store = ImageStore(str(tmp_path), max_bytes=3 * len(IMAGE))
+        blobs = [bytes([i]) * len(IMAGE) for i in range(4)]
+
+        async def scenario():
+            digests = []
+            for i, blob in enumerate(blobs):
+                digests.append(await store.put(blob))
+                # Distinct, increasing mtimes; blob 0 is then used again
+                os.utime(store.path_for(digests[-1]), (1000 + i, 1000 + i))
+            os.utime(store.path_for(digests[0]), (2000, 2000))
+            store._schedule_eviction()
+            await store._evicting
+            return digests
+
+        digests = asyncio.run(scenario())
+        # Oldest first, down to the low watermark (90% of the cap)
+        assert [store.lookup(d) is not None for d in digests] == [True, False, False, True]
+        assert store.stats["evictions"] == 2
+        assert store.get_stats()["bytes"] == 2 * len(IMAGE)
+
+    def test_ref_key(self):
+        assert image_ref_key("image_proxy:maxwidth:800:photoreference:abc") == "image_ref:maxwidth:800:photoreference:abc"
+
+
+class TestServeFromDiskStore:
+    def test_miss_writes_blob_and_reference_then_hit_is_a_file_response(self, tmp_path):
+        store = ImageStore(str(tmp_path), max_bytes=10 ** 6)
+        refs = {}
+        client = places_client(refs=refs)
+        session = session_returning(FakeUpstream())
+
+        async def miss():
+            with patch("app.main.get_image_store", return_value=store):
+                response = await serve_image(request_with({}), client, session, "image_proxy:k", "ref", 800, None, "public")
+            body = await read_body(response)
+            await asyncio.gather(*image_proxy._background)
+            return body
+
+        assert asyncio.run(miss()) == IMAGE
+        # Redis keeps the bytes for other instances next to this instance's reference
+        assert sorted(refs) == ["image_proxy:k", "image_ref:k"]
+        assert refs["image_proxy:k"] == IMAGE
+        assert refs["image_ref:k"]["size"] == len(IMAGE) and refs["image_ref:k"]["content_type"] == "image/png"
+
+        hit = serve(client, session, store=store)
+        assert isinstance(hit, FileResponse)
+        assert hit.path == store.path_for(refs["image_ref:k"]["digest"])
+        assert hit.media_type == "image/png" and hit.headers["etag"] == image_etag("image_proxy:k")
+        assert session.get.await_count == 1
+
+    def test_legacy_redis_image_is_served_and_migrated(self, tmp_path):
+        store = ImageStore(str(tmp_path), max_bytes=10 ** 6)
+        refs = {}
+        client = places_client(cached=IMAGE, refs=refs)
+
+        async def scenario():
+            with patch("app.main.get_image_store", return_value=store):
+                response = await serve_image(request_with({}), client, MagicMock(), "image_proxy:k", "ref", 800, None, "public")
+            await asyncio.gather(*image_proxy._background)
+            return response
+
+        response = asyncio.run(scenario())
+        assert response.body == IMAGE
+        assert store.lookup(refs["image_ref:k"]["digest"]) is not None
+
+    def test_blob_written_by_another_instance_is_served_from_redis(self, tmp_path):
+        other = ImageStore(str(tmp_path / "other"), max_bytes=10 ** 6)
+        digest = asyncio.run(other.put(IMAGE))
+        store = ImageStore(str(tmp_path / "here"), max_bytes=10 ** 6)
+        refs = {"image_ref:k": {"digest": digest, "content_type": "image/png"}}
+        client = places_client(cached=IMAGE, refs=refs)
+        session = session_returning(FakeUpstream())
+
+        async def scenario():
+            with patch("app.main.get_image_store", return_value=store):
+                response = await serve_image(request_with({}), client, session, "image_proxy:k", "ref", 800, None, "public")
+            await asyncio.gather(*image_proxy._background)
+            return response
+
+        response = asyncio.run(scenario())
+        assert response.body == IMAGE and response.headers["x-cache"] == "HIT"
+        session.get.assert_not_awaited()
+        # Copied to this instance's disk for the next request
+        assert store.lookup(digest) is not None
+
+    def test_evicted_blob_falls_back_to_google(self, tmp_path):
+        store = ImageStore(str(tmp_path), max_bytes=10 ** 6)
+        client = places_client(refs={"image_ref:k": {"digest": "0" * 64, "content_type": "image/jpeg"}})
+        session = session_returning(FakeUpstream())
+        response = serve(client, session, store=store)
+        assert response.headers["x-cache"] == "MISS"
+        asyncio.run(response.body_iterator.aclose())
@@ -0,0 +1,106 @@
+"""
+Unit tests for the shared itinerary cache in complete_itinerary_from_selection
+(canonical selection signature, cache hits across calls, bypass flag).
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app import complete_itinerary as ci
+from app.llm_gateway import LLMGateway, StubBackend
+from app.places_client import RedisCache
+from app.schema import LandmarkSelection, StructuredItinerary, StructuredDayPlan, ItineraryBlock
+
+
+def selection(destination="San Diego", attractions=("Zoo", "Balboa Park"), special_requests=None, days=1):
+    return LandmarkSelection(
+        details={
+            "destination": destination, "travelDays": days, "startDate": "2026-06-01", "endDate": "2026-06-01",
+            "specialRequests": special_requests
+        },
+        itinerary=[
+            {"day": 1, "attractions": [
+                {"name": name, "description": "", "location": {"lat": 32.7, "lng": -117.1}, "type": "landmark"}
+                for name in attractions
+            ]}
+        ]
+    )
+
+
+class TestSelectionSignature:
+    def test_attraction_order_and_whitespace_ignored(self):
+        assert ci.get_cache_key(selection(attractions=("Zoo", "Balboa Park"))) == \
+            ci.get_cache_key(selection(attractions=("balboa  park ", "ZOO")))
+
+    def test_destination_aliases(self):
+        assert ci.get_cache_key(selection(destination="NYC")) == ci.get_cache_key(selection(destination=" New York City "))
+        assert ci.get_cache_key(selection(destination="San Diego, USA")) == ci.get_cache_key(selection(destination="san diego"))
+
+    def test_meaningful_changes_change_key(self):
+        base = ci.get_cache_key(selection())
+        assert ci.get_cache_key(selection(attractions=("Zoo",))) != base
+        assert ci.get_cache_key(selection(special_requests="vegetarian")) != base
+        assert ci.get_cache_key(selection(destination="Los Angeles")) != base
+
+    def test_key_is_versioned(self):
+        key = ci.get_cache_key(selection())
+        assert key.startswith(f"itinerary:v{ci.ITINERARY_CACHE_VERSION}:")
+
+
+class TestSharedItineraryCache:
+    """A second identical request is served from Redis without calling the LLM"""
+
+    def make_places_client(self):
+        store = {}
+        redis = AsyncMock()
+        redis.get.side_effect = lambda key, **kwargs: store.get(key)
+
+        async def set_value(key, value, ttl, **kwargs):
+            store[key] = value
+        redis.set.side_effect = set_value
+        places_client = MagicMock()
+        places_client.cache = RedisCache(redis)
+        return places_client, store
+
+    def run(self, places_client, sel, bypass_cache=False):
+        skeleton = StructuredItinerary(itinerary=[
+            StructuredDayPlan(day=1, blocks=[ItineraryBlock(type="landmark", name="Zoo", start_time="9:00 AM", duration="2h")])
+        ])
+        backend = StubBackend(latency=0, responders={"itinerary": lambda prompt: "{}"})
+
+        async def enhance(itinerary, places_client, destination, used_restaurants, progress=None, **kwargs):
+            return itinerary, {}
+
+        async def dedupe(itinerary, places_client=None):
+            return itinerary
+
+        with patch.object(ci, "get_llm_gateway", return_value=LLMGateway(backend=backend)), patch.object(ci, "parser") as parser, \
+                patch.object(ci, "enhance_itinerary_simultaneously", side_effect=enhance), \
+                patch.object(ci, "remove_duplicate_landmarks", side_effect=dedupe):
+            parser.parse = MagicMock(return_value=skeleton)
+            result = asyncio.run(ci.complete_itinerary_from_selection(sel, places_client, bypass_cache=bypass_cache))
+            return result, backend.calls
+
+    def test_repeat_selection_hits_shared_cache(self):
+        places_client, store = self.make_places_client()
+        first, first_calls = self.run(places_client, selection())
+        assert first_calls == 1
+        assert list(store) == [ci.get_cache_key(selection())]
+
+        # A fresh client (another worker) with the same Redis, attractions in a different order
+        other_worker = MagicMock()
+        other_worker.cache = RedisCache(places_client.cache.redis_client)
+        second, second_calls = self.run(other_worker, selection(attractions=("Balboa Park", "Zoo")))
+        assert second_calls == 0
+        assert second["itinerary"] == first["itinerary"]
+        assert second["performance_metrics"]["cache_hit"] is True
+        assert "cache_hit" not in first["performance_metrics"]
+
+    def test_bypass_regenerates_and_overwrites(self):
+        places_client, store = self.make_places_client()
+        self.run(places_client, selection())
+        written = store[ci.get_cache_key(selection())]
+
+        _, calls = self.run(places_client, selection(), bypass_cache=True)
+        assert calls == 1
+        assert store[ci.get_cache_key(selection())] is not written
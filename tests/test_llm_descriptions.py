@@ -0,0 +1,142 @@
+"""
+Unit tests for the per-place description cache in LLMDescriptionService
+(app/llm_descriptions.py): only uncached places reach the LLM, results keep
+input order, and keys are stable across processes.
+"""
+
+import asyncio
+import json
+import re
+from unittest.mock import AsyncMock, patch
+
+from app.llm_descriptions import (
+    DESCRIPTION_INDEX_KEY, DESCRIPTION_REDIS_MAX_ENTRIES, TRIM_DESCRIPTIONS_SCRIPT, LLMDescriptionService
+)
+from app.llm_gateway import LLMGateway, StubBackend
+from app.places_client import RedisCache
+
+PLACES = [
+    {"place_id": "p1", "name": "Zoo", "rating": 4.7, "types": ["zoo"]},
+    {"place_id": "p2", "name": "Pier", "rating": 4.2, "types": ["park"]},
+    {"place_id": "p3", "name": "Museum", "rating": 4.5, "types": ["museum"]},
+]
+
+
+def redis_cache():
+    store = {}
+    redis = AsyncMock()
+    redis.get.side_effect = lambda key, **kwargs: store.get(key)
+
+    async def set_value(key, value, ttl, **kwargs):
+        store[key] = value
+    redis.set.side_effect = set_value
+    return RedisCache(redis), store
+
+
+def describing_backend(prompts):
+    """Answers with '<name> described' for every numbered place in the prompt"""
+    def respond(prompt):
+        prompts.append(prompt)
+        names = re.findall(r"^\d+\. (.+?) \(Rating", prompt, re.MULTILINE)
+        return json.dumps([{"place_number": i, "description": f"{name} described"} for i, name in enumerate(names, 1)])
+    return StubBackend(latency=0, responders={"descriptions": respond})
+
+
+def describe(service, places, backend, **kwargs):
+    with patch("app.llm_descriptions.get_llm_gateway", return_value=LLMGateway(backend=backend)):
+        return asyncio.run(service.generate_place_descriptions(places, "San Diego", **kwargs))
+
+
+class TestDescriptionCache:
+    def test_only_uncached_places_sent_to_llm(self):
+        cache, store = redis_cache()
+        service = LLMDescriptionService(cache=cache)
+        prompts = []
+        backend = describing_backend(prompts)
+
+        describe(service, [PLACES[1]], backend)
+        described = describe(service, PLACES, backend)
+
+        assert [p["description"] for p in described] == ["Zoo described", "Pier described", "Museum described"]
+        assert all(p["description_source"] == "llm" for p in described)
+        assert "Pier" not in prompts[1] and "Zoo" in prompts[1]
+        assert len(store) == 3 and all(key.startswith("llm_description:v2:") for key in store)
+        assert service.get_stats()["cache_hits"] == 1
+
+        # Another worker with the same Redis answers everything from cache
+        other = LLMDescriptionService(cache=RedisCache(cache.redis_client))
+        again = describe(other, list(reversed(PLACES)), backend)
+        assert [p["description"] for p in again] == ["Museum described", "Pier described", "Zoo described"]
+        assert backend.calls == 2
+
+    def test_preference_profile_is_part_of_key(self):
+        service = LLMDescriptionService()
+        backend = describing_backend([])
+        describe(service, PLACES[:1], backend, user_preferences={"with_kids": True})
+        describe(service, PLACES[:1], backend, user_preferences={"with_kids": True})
+        describe(service, PLACES[:1], backend, user_preferences={"with_kids": False})
+        assert backend.calls == 2
+
+    def test_profile_fields_reach_the_prompt(self):
+        prompts = []
+        service = LLMDescriptionService()
+        describe(service, PLACES[:1], describing_backend(prompts),
+                 user_preferences={"with_kids": True, "special_requests": "dinosaurs"})
+        assert "traveling with children" in prompts[0] and "special interests: dinosaurs" in prompts[0]
+
+    def test_descriptions_mapped_by_place_number(self):
+        def reversed_answer(prompt):
+            return json.dumps([
+                {"place_number": 3, "description": "Museum described"},
+                {"place_number": 1, "description": "Zoo described"},
+            ])
+        service = LLMDescriptionService()
+        described = describe(service, PLACES, StubBackend(latency=0, responders={"descriptions": reversed_answer}))
+        assert [p["description"] for p in described] == ["Zoo described", described[1]["description"], "Museum described"]
+        assert [p["description_source"] for p in described] == ["llm", "fallback", "llm"]
+        assert len(service.cache) == 2
+
+    def test_batch_with_unknown_place_number_is_not_cached(self):
+        def off_by_one(prompt):
+            return json.dumps([{"place_number": i, "description": f"place {i}"} for i in range(2, 5)])
+        service = LLMDescriptionService()
+        described = describe(service, PLACES, StubBackend(latency=0, responders={"descriptions": off_by_one}))
+        assert all(p["description_source"] == "fallback" for p in described)
+        assert len(service.cache) == 0
+
+    def test_keys_are_deterministic(self):
+        profile = LLMDescriptionService._get_profile_key(" San Diego", {"special_requests": "Museums "})
+        assert profile == LLMDescriptionService._get_profile_key("san diego", {"special_requests": "museums"})
+        unnamed = {"name": "Old Town"}
+        assert LLMDescriptionService._get_cache_key(unnamed, "San Diego", profile) == \
+            LLMDescriptionService._get_cache_key({"name": "old town "}, "san diego", profile)
+
+    def test_failed_batch_falls_back_without_caching(self):
+        def fail(prompt):
+            raise RuntimeError("down")
+        service = LLMDescriptionService()
+        described = describe(service, PLACES, StubBackend(latency=0, responders={"descriptions": fail}), batch_size=2)
+        assert [p["name"] for p in described] == ["Zoo", "Pier", "Museum"]
+        assert all(p["description_source"] == "fallback" for p in described)
+        assert len(service.cache) == 0
+        assert "description" not in PLACES[0]
+
+    def test_redis_writes_are_indexed_for_trimming(self):
+        cache, store = redis_cache()
+        cache.redis_client.eval.return_value = 2
+        service = LLMDescriptionService(cache=cache)
+        describe(service, PLACES, describing_backend([]))
+
+        script, = cache.redis_client.eval.await_args.args
+        kwargs = cache.redis_client.eval.await_args.kwargs
+        assert script == TRIM_DESCRIPTIONS_SCRIPT
+        assert kwargs["keys"] == [DESCRIPTION_INDEX_KEY]
+        assert kwargs["args"][0] == DESCRIPTION_REDIS_MAX_ENTRIES
+        assert sorted(kwargs["args"][2:]) == sorted(store)
+        assert service.get_stats()["evicted"] == 2
+
+    def test_local_cache_is_bounded(self):
+        with patch("app.llm_descriptions.DESCRIPTION_CACHE_MAX_ENTRIES", 2):
+            service = LLMDescriptionService()
+        describe(service, PLACES, describing_backend([]))
+        assert len(service.cache) == 2
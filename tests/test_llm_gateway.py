@@ -0,0 +1,155 @@
+"""
+Unit tests for the shared LLM gateway (app/llm_gateway.py): completion cache,
+retries, concurrency limit, accounting and the offline stub backend.
+"""
+
+import asyncio
+import json
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app import llm_gateway
+from app.deadline import deadline_scope
+from app.llm_descriptions import LLMDescriptionService
+from app.llm_gateway import LLMGateway, RetryableLLMError, StubBackend
+from app.places_client import RedisCache
+
+MESSAGES = [{"role": "user", "content": "Describe the zoo"}]
+
+
+def redis_cache():
+    store = {}
+    redis = AsyncMock()
+    redis.get.side_effect = lambda key, **kwargs: store.get(key)
+
+    async def set_value(key, value, ttl, **kwargs):
+        store[key] = value
+    redis.set.side_effect = set_value
+    return RedisCache(redis), store
+
+
+class FlakyBackend(StubBackend):
+    """Fails with a transient error `failures` times before answering"""
+
+    def __init__(self, failures):
+        super().__init__(latency=0)
+        self.failures = failures
+
+    async def complete(self, request, timeout, purpose):
+        if self.failures:
+            self.failures -= 1
+            raise RetryableLLMError("503")
+        return await super().complete(request, timeout, purpose)
+
+
+class TestCompletionCache:
+    def test_identical_request_served_from_cache(self):
+        cache, store = redis_cache()
+        backend = StubBackend(latency=0)
+        gateway = LLMGateway(backend=backend, cache=cache)
+
+        async def scenario():
+            first = await gateway.complete(MESSAGES, model="gpt-3.5-turbo", max_tokens=50, purpose="test")
+            second = await gateway.complete(MESSAGES, model="gpt-3.5-turbo", max_tokens=50, purpose="test")
+            other = await gateway.complete(MESSAGES, model="gpt-3.5-turbo", max_tokens=60, purpose="test")
+            return first, second, other
+
+        first, second, other = asyncio.run(scenario())
+        assert backend.calls == 2
+        assert second.cached and second.content == first.content
+        assert not other.cached
+        assert all(key.startswith(f"llm:v{llm_gateway.LLM_CACHE_VERSION}:") for key in store)
+        assert gateway.get_stats()["purposes"]["test"]["cache_hits"] == 1
+
+    def test_cache_can_be_skipped(self):
+        cache, store = redis_cache()
+        gateway = LLMGateway(backend=StubBackend(latency=0), cache=cache)
+        asyncio.run(gateway.complete(MESSAGES, model="m", max_tokens=10, use_cache=False))
+        assert store == {}
+
+
+class TestRetries:
+    def test_transient_errors_retried_with_backoff(self):
+        gateway = LLMGateway(backend=FlakyBackend(failures=2), max_retries=2)
+        with patch.object(llm_gateway.random, "uniform", return_value=0.0) as jitter:
+            response = asyncio.run(gateway.complete(MESSAGES, model="m", max_tokens=10, purpose="test"))
+        assert response.content
+        # Full jitter over an exponentially growing window
+        assert [call.args for call in jitter.call_args_list] == [
+            (0, llm_gateway.RETRY_BASE_BACKOFF), (0, llm_gateway.RETRY_BASE_BACKOFF * 2)
+        ]
+        assert gateway.stats["test"]["retries"] == 2
+
+    def test_gives_up_after_max_retries(self):
+        gateway = LLMGateway(backend=FlakyBackend(failures=5), max_retries=1)
+        with patch.object(llm_gateway.random, "uniform", return_value=0.0):
+            with pytest.raises(RetryableLLMError):
+                asyncio.run(gateway.complete(MESSAGES, model="m", max_tokens=10, purpose="test"))
+        assert gateway.stats["test"]["errors"] == 1
+
+    def test_no_retry_when_budget_is_spent(self):
+        gateway = LLMGateway(backend=FlakyBackend(failures=1), max_retries=3)
+
+        async def scenario():
+            with deadline_scope(0.0):
+                await gateway.complete(MESSAGES, model="m", max_tokens=10, purpose="test")
+
+        with pytest.raises(RetryableLLMError):
+            asyncio.run(scenario())
+        assert gateway.stats["test"]["retries"] == 0
+
+
+class TestConcurrencyAndAccounting:
+    def test_concurrency_is_capped(self):
+        peak = {"value": 0}
+        gateway = LLMGateway(backend=StubBackend(latency=0.02), max_concurrency=2)
+        original = gateway.backend.complete
+
+        async def tracking_complete(request, timeout, purpose):
+            peak["value"] = max(peak["value"], gateway.in_flight)
+            return await original(request, timeout, purpose)
+        gateway.backend.complete = tracking_complete
+
+        async def scenario():
+            await asyncio.gather(*(
+                gateway.complete([{"role": "user", "content": str(i)}], model="m", max_tokens=10) for i in range(6)
+            ))
+
+        asyncio.run(scenario())
+        assert peak["value"] == 2
+        assert gateway.in_flight == 0
+
+    def test_tokens_and_latency_accounted_per_purpose(self):
+        gateway = LLMGateway(backend=StubBackend(latency=0.01))
+
+        async def scenario():
+            await gateway.complete(MESSAGES, model="m", max_tokens=10, purpose="descriptions")
+            chunks = [text async for text, _ in gateway.stream(MESSAGES, model="m", max_tokens=10, purpose="itinerary")]
+            return chunks
+
+        asyncio.run(scenario())
+        stats = gateway.get_stats()
+        assert stats["backend"] == "stub"
+        for purpose in ("descriptions", "itinerary"):
+            assert stats["purposes"][purpose]["calls"] == 1
+            assert stats["purposes"][purpose]["prompt_tokens"] > 0
+            assert stats["purposes"][purpose]["avg_latency_ms"] >= 10
+
+
+class TestStubBackend:
+    def test_itinerary_from_selected_attractions(self):
+        prompt = "SELECTED ATTRACTIONS (REQUIRED):\n\nDay 1:\n- Zoo (landmark)\n- Balboa Park (landmark)\n\nREQUIREMENTS:\n• Day 9: ignored"
+        gateway = LLMGateway(backend=StubBackend(latency=0))
+        response = asyncio.run(gateway.complete([{"role": "user", "content": prompt}], model="m", max_tokens=10, purpose="itinerary"))
+        days = json.loads(response.content)["itinerary"]
+        assert [b["name"] for b in days[0]["blocks"]] == ["Zoo", "Balboa Park"]
+        assert [b["start_time"] for b in days[0]["blocks"]] == ["09:00", "12:00"]
+
+    def test_descriptions_service_runs_offline(self):
+        service = LLMDescriptionService()
+        places = [{"name": "Zoo", "rating": 4.7, "types": ["zoo"]}, {"name": "Pier", "rating": 4.2, "types": ["park"]}]
+        with patch("app.llm_descriptions.get_llm_gateway", return_value=LLMGateway(backend=StubBackend(latency=0))):
+            described = asyncio.run(service.generate_place_descriptions(places, "San Diego"))
+        assert [p["description_source"] for p in described] == ["llm", "llm"]
+        assert described[0]["description"].startswith("Zoo ")
@@ -0,0 +1,116 @@
+"""
+Unit tests for the in-process cache tier (app/local_cache.py) and its use inside RedisCache.
+
+Redis is mocked, so these run without a server.
+"""
+
+import asyncio
+import json
+import time
+from unittest.mock import AsyncMock
+
+from app.local_cache import LocalCache
+from app.places_client import CACHE_SCHEMA_VERSION, RedisCache
+
+
+class TestLocalCache:
+    """Byte-bounded TTL-LRU behaviour"""
+
+    def test_hit_miss_counters(self):
+        cache = LocalCache({'places': 60})
+        assert cache.get("places:a") is None
+        cache.set("places:a", [1, 2], 'places', 10)
+        assert cache.get("places:a") == [1, 2]
+        stats = cache.get_stats()
+        assert stats["hits"] == 1 and stats["misses"] == 1
+        assert stats["bytes"] == 10
+
+    def test_capacity_is_measured_in_bytes(self):
+        cache = LocalCache({'places': 60}, max_bytes=100, max_item_bytes=100)
+        for i in range(5):
+            cache.set(f"places:{i}", i, 'places', 40)
+        stats = cache.get_stats()
+        assert stats["bytes"] <= 100
+        assert stats["evictions"] == 3
+        assert cache.get("places:4") == 4
+
+    def test_oversized_items_are_skipped(self):
+        cache = LocalCache({'image_proxy': 60}, max_bytes=1000, max_item_bytes=100)
+        cache.set("image_proxy:big", b"x" * 500, 'image_proxy', 500)
+        assert cache.get("image_proxy:big") is None
+
+    def test_expiry_caps_ttl(self):
+        cache = LocalCache({'places': 60})
+        cache.set("places:a", [1], 'places', 1, expires_at=time.time() + 5)
+        cache.set("places:b", [2], 'places', 1, expires_at=time.time() - 1)
+        assert cache._cache.get("places:a").ttl <= 5
+        assert cache.get("places:b") is None
+
+    def test_invalidation(self):
+        cache = LocalCache({'places': 60})
+        cache.set("places:destination:1,2:a", [1], 'places', 1)
+        cache.set("places:destination:1,2:b", [2], 'places', 1)
+        cache.set("geocode:destination:x", {}, 'geocode', 1)
+        assert cache.invalidate("geocode:destination:x")
+        assert cache.invalidate_prefix("places:destination:1,2") == 2
+        assert cache.get_stats()["entries"] == 0
+
+
+class TestRedisCacheTwoTier:
+    """RedisCache should only reach Redis on a local miss"""
+
+    def test_redis_hit_populates_local_tier(self):
+        async def scenario():
+            redis = AsyncMock()
+            cache = RedisCache(redis)
+            redis.get.return_value = cache._encode([{"name": "Museum"}], 'places')[0]
+            first = await cache.get("places:destination:1,2")
+            second = await cache.get("places:destination:1,2")
+            return redis, first, second
+
+        redis, first, second = asyncio.run(scenario())
+        assert first == second == [{"name": "Museum"}]
+        assert redis.get.await_count == 1
+
+    def test_local_copy_expires_with_the_redis_key(self):
+        async def scenario():
+            redis = AsyncMock()
+            cache = RedisCache(redis)
+            now = time.time()
+            # Written long ago: Redis drops the key in 30s, well before a full local TTL
+            redis.get.return_value = json.dumps({'_swr': CACHE_SCHEMA_VERSION, 'soft': now - 60, 'hard': now + 30, 'data': {"lat": 1.0}}).encode()
+            await cache.get("geocode:destination:paris")
+            return cache
+
+        cache = asyncio.run(scenario())
+        assert 0 < cache.local._cache.get("geocode:destination:paris").ttl <= 30
+
+    def test_legacy_values_are_not_kept_locally(self):
+        async def scenario():
+            redis = AsyncMock()
+            redis.get.return_value = json.dumps([{"name": "Museum"}]).encode()
+            cache = RedisCache(redis)
+            first = await cache.get("places:destination:1,2")
+            second = await cache.get("places:destination:1,2")
+            return redis, first, second
+
+        redis, first, second = asyncio.run(scenario())
+        assert first == second == [{"name": "Museum"}]
+        assert redis.get.await_count == 2
+
+    def test_set_writes_both_tiers_and_delete_clears_both(self):
+        async def scenario():
+            redis = AsyncMock()
+            cache = RedisCache(redis)
+            await cache.set("geocode:destination:paris", {"lat": 1.0, "lng": 2.0}, 'geocode')
+            hit = await cache.get("geocode:destination:paris")
+            await cache.delete("geocode:destination:paris")
+            return redis, cache, hit
+
+        redis, cache, hit = asyncio.run(scenario())
+        assert hit == {"lat": 1.0, "lng": 2.0}
+        redis.get.assert_not_called()
+        # Redis keeps the value through the stale-while-revalidate grace period
+        assert cache.ttl['geocode'] * 0.9 < redis.set.await_args.args[2] <= cache.ttl['geocode'] * 1.25 + 1
+        redis.delete.assert_awaited_once_with("geocode:destination:paris")
+        assert cache.local.get("geocode:destination:paris") is None
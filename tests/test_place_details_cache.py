@@ -0,0 +1,135 @@
+"""
+Unit tests for the per-place_id details cache and field profiles
+(GooglePlacesClient.get_place_details, slim_place_record).
+
+Redis and the Place Details API are mocked, so these run without network access.
+"""
+
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.places_client import GooglePlacesClient, RedisCache, PLACE_DETAILS_PROFILES, slim_place_record
+from app.single_flight import SingleFlight
+
+
+FULL_RESULT = {
+    'place_id': 'abc',
+    'name': 'Museum',
+    'rating': 4.7,
+    'website': 'https://museum.example',
+    'geometry': {'location': {'lat': 1.0, 'lng': 2.0}},
+    'photos': [{'photo_reference': 'ref1', 'height': 100, 'width': 200, 'html_attributions': ['x']}],
+    'reviews': [{'text': 'Great.', 'rating': 5, 'author_name': 'A'}, {'text': 'Fine.', 'rating': 4}],
+    'editorial_summary': {'overview': 'A museum'},
+    'formatted_phone_number': '555',
+    'opening_hours': {'open_now': True},
+}
+
+
+def make_client():
+    redis = AsyncMock()
+    redis.get.return_value = None
+    client = GooglePlacesClient.__new__(GooglePlacesClient)
+    client.logger = MagicMock()
+    client.cache = RedisCache(redis)
+    client.single_flight = SingleFlight()
+    client.details_cache_stats = {'hits': 0, 'misses': 0, 'upgrades': 0}
+    bucket = MagicMock()
+    bucket.acquire = AsyncMock(return_value=True)
+    client.rate_limits = {'place_details': bucket}
+
+    async def fake_details(place_id, include_opening_hours=True, fields=None):
+        await asyncio.sleep(0.01)  # Network latency, so concurrent callers overlap
+        keys = {'photos' if f == 'photo' else f.split('/')[0] for f in fields}
+        return {'status': 'OK', 'result': {k: v for k, v in {**FULL_RESULT, 'place_id': place_id}.items() if k in keys}}
+
+    client.place_details = AsyncMock(side_effect=fake_details)
+    return client
+
+
+class TestSlimPlaceRecord:
+    """Profile projection"""
+
+    def test_card_drops_enrich_fields_and_trims_photos(self):
+        record = slim_place_record(FULL_RESULT, 'card')
+        assert 'reviews' not in record and 'opening_hours' not in record
+        assert record['photos'] == [{'photo_reference': 'ref1'}]
+
+    def test_enrich_keeps_first_review_text_only(self):
+        record = slim_place_record(FULL_RESULT, 'enrich')
+        assert record['reviews'] == [{'text': 'Great.', 'rating': 5}]
+        assert record['editorial_summary'] == {'overview': 'A museum'}
+        assert 'opening_hours' not in record
+
+    def test_full_is_untrimmed(self):
+        assert slim_place_record(FULL_RESULT, 'full') == FULL_RESULT
+
+
+class TestPlaceDetailsCache:
+    """Details are fetched once per place_id and profile"""
+
+    def test_repeated_lookups_hit_the_cache(self):
+        async def scenario():
+            client = make_client()
+            first = await client.get_place_details("abc")
+            second = await client.get_place_details("abc")
+            return client, first, second
+
+        client, first, second = asyncio.run(scenario())
+        assert first == second
+        assert client.place_details.await_count == 1
+        assert client.place_details.await_args.kwargs['fields'] == PLACE_DETAILS_PROFILES['enrich']
+        assert client.details_cache_stats == {'hits': 1, 'misses': 1, 'upgrades': 0}
+        assert client.cache.redis_client.set.await_args.args[2] > client.cache.ttl['place_details'] * 0.9
+
+    def test_richer_profile_serves_poorer_requests(self):
+        async def scenario():
+            client = make_client()
+            await client.get_place_details("abc", profile='full')
+            card = await client.get_place_details("abc", profile='card')
+            return client, card
+
+        client, card = asyncio.run(scenario())
+        assert client.place_details.await_count == 1
+        assert card['result'] == slim_place_record(FULL_RESULT, 'card')
+
+    def test_lazy_upgrade_fetches_only_missing_fields(self):
+        async def scenario():
+            client = make_client()
+            await client.get_place_details("abc", profile='card')
+            enrich = await client.get_place_details("abc", profile='enrich')
+            return client, enrich
+
+        client, enrich = asyncio.run(scenario())
+        upgrade_fields = client.place_details.await_args_list[1].kwargs['fields']
+        assert 'name' not in upgrade_fields and 'reviews' in upgrade_fields
+        assert enrich['result']['name'] == 'Museum'
+        assert enrich['result']['reviews'] == [{'text': 'Great.', 'rating': 5}]
+        assert client.details_cache_stats['upgrades'] == 1
+
+    def test_unknown_profile_is_rejected(self):
+        with pytest.raises(ValueError):
+            asyncio.run(make_client().get_place_details("abc", profile='everything'))
+
+    def test_concurrent_lookups_share_one_fetch(self):
+        async def scenario():
+            client = make_client()
+            results = await asyncio.gather(*[client.get_place_details("abc") for _ in range(5)])
+            return client, results
+
+        client, results = asyncio.run(scenario())
+        assert client.place_details.await_count == 1
+        assert all(r['result']['place_id'] == "abc" for r in results)
+
+    def test_failed_lookups_are_not_cached(self):
+        async def scenario():
+            client = make_client()
+            client.place_details = AsyncMock(return_value=None)
+            await client.get_place_details("gone")
+            await client.get_place_details("gone")
+            return client
+
+        client = asyncio.run(scenario())
+        assert client.place_details.await_count == 2
+        client.cache.redis_client.set.assert_not_called()
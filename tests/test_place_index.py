@@ -0,0 +1,122 @@
+"""
+Unit tests for the spatial index of seen places (app/place_index.py)
+and how places_nearby uses it.
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+from app.place_index import PlaceIndex
+from app.places_client import GooglePlacesClient
+
+
+CENTER = {"lat": 29.4260, "lng": -98.4861}
+
+
+def make_place(i, lat_offset=0.0, name=None, types=("restaurant",), rating=4.5):
+    return {
+        "place_id": f"place_{i}",
+        "name": name or f"Restaurant {i}",
+        "types": list(types),
+        "rating": rating,
+        "geometry": {"location": {"lat": CENTER["lat"] + lat_offset + i * 0.0005, "lng": CENTER["lng"]}},
+    }
+
+
+class TestPlaceIndex:
+    """Coverage tracking and local answers"""
+
+    def test_covered_area_is_served_locally(self):
+        index = PlaceIndex()
+        places = [make_place(i) for i in range(8)]
+        index.add_results(CENTER, 5000, "restaurant", places)
+
+        results = index.query(CENTER, 2000, "restaurant")
+
+        assert results is not None and len(results) == 8
+        assert index.coverage(CENTER, 2000, "restaurant") == 1.0
+        assert index.get_stats()["local_hits"] == 1
+
+    def test_uncovered_area_falls_back(self):
+        index = PlaceIndex()
+        index.add_results(CENTER, 5000, "restaurant", [make_place(i) for i in range(8)])
+        far_away = {"lat": CENTER["lat"] + 1.0, "lng": CENTER["lng"]}
+
+        assert index.query(far_away, 2000, "restaurant") is None
+        assert index.query(CENTER, 2000, "tourist_attraction") is None
+
+    def test_keyword_and_truncated_searches_prove_no_coverage(self):
+        index = PlaceIndex()
+        index.add_results(CENTER, 3000, "restaurant", [make_place(i) for i in range(8)], keyword="tacos")
+        index.add_results(CENTER, 25000, "restaurant", [make_place(i) for i in range(20)])
+        # A full page is truncated at any radius
+        index.add_results(CENTER, 3000, "restaurant", [make_place(i) for i in range(20)])
+
+        assert index.coverage(CENTER, 2000, "restaurant") == 0.0
+        assert index.query(CENTER, 2000, "restaurant") is None
+
+    def test_results_are_copies(self):
+        index = PlaceIndex()
+        places = [make_place(i) for i in range(8)]
+        index.add_results(CENTER, 5000, "restaurant", places)
+        places[0]["_score"] = 1.0
+
+        results = index.query(CENTER, 2000, "restaurant")
+        results[0]["_priority_score"] = 9.0
+        assert all("_score" not in p and "_priority_score" not in p for p in index.query(CENTER, 2000, "restaurant"))
+
+    def test_keyword_queries_always_use_api(self):
+        index = PlaceIndex()
+        index.add_results(CENTER, 5000, "tourist_attraction", [make_place(1, name="The Alamo", types=["tourist_attraction"])])
+        index.add_results(CENTER, 5000, "tourist_attraction", [make_place(i) for i in range(2, 8)])
+        assert index.query(CENTER, 2000, "tourist_attraction") is not None
+
+        # Even with the area covered and a matching name indexed
+        assert index.query(CENTER, 2000, "tourist_attraction", keyword="alamo") is None
+
+    def test_coverage_report_lists_cells(self):
+        index = PlaceIndex()
+        index.add_results(CENTER, 5000, "restaurant", [make_place(i) for i in range(3)])
+
+        report = index.coverage_report(CENTER, 1000, "restaurant")
+
+        assert report and all(cell["covered"] for cell in report)
+        assert sum(cell["places"] for cell in report) == 3
+        assert index.get_stats()["types"]["restaurant"]["places"] == 3
+
+
+class TestPlacesNearbyUsesIndex:
+    """places_nearby should skip the API for covered areas"""
+
+    def test_second_search_skips_api(self):
+        payload = {"status": "OK", "results": [make_place(i) for i in range(8)]}
+
+        class FakeResponse:
+            status = 200
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            async def json(self):
+                return payload
+
+        async def scenario():
+            client = GooglePlacesClient.__new__(GooglePlacesClient)
+            client.api_key = "test"
+            client.logger = MagicMock()
+            client.place_index = PlaceIndex()
+            client._session = MagicMock()
+            client._session.get.return_value = FakeResponse()
+            client.rate_limits = {"nearby_search": MagicMock(acquire=AsyncMock(return_value=True))}
+            first = await client.places_nearby(CENTER, 3000, "restaurant")
+            second = await client.places_nearby(CENTER, 3000, "restaurant")
+            return client, first, second
+
+        client, first, second = asyncio.run(scenario())
+        assert client._session.get.call_count == 1
+        # The locally answered search didn't spend a rate-limit token
+        assert client.rate_limits["nearby_search"].acquire.await_count == 1
+        assert {p["place_id"] for p in first["results"]} == {p["place_id"] for p in second["results"]}
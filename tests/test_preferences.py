@@ -0,0 +1,100 @@
+"""
+Unit tests for PreferencesParser (app/preferences.py): local lexicon extraction,
+LLM fallback through the gateway for unclassified text, and the parse cache.
+"""
+
+import asyncio
+import json
+from unittest.mock import AsyncMock, patch
+
+from app import preferences
+from app.llm_gateway import LLMGateway, StubBackend
+from app.places_client import RedisCache
+from app.preferences import PreferencesParser, extract_preferences, normalize_request
+
+
+def redis_cache():
+    store = {}
+    redis = AsyncMock()
+    redis.get.side_effect = lambda key, **kwargs: store.get(key)
+
+    async def set_value(key, value, ttl, **kwargs):
+        store[key] = value
+    redis.set.side_effect = set_value
+    return RedisCache(redis), store
+
+
+def llm_answering(answer):
+    backend = StubBackend(latency=0, responders={"preferences": lambda prompt: json.dumps(answer)})
+    return backend, patch.object(preferences, "get_llm_gateway", return_value=LLMGateway(backend=backend))
+
+
+class TestLexiconExtraction:
+    def test_prompt_examples_answered_locally(self):
+        assert extract_preferences(normalize_request("Looking for Japanese food and quiet museums, need wheelchair access")) == (
+            {"keywords": ["quiet", "museum"], "cuisine_types": ["Japanese"], "accessibility": ["wheelchair"]}, []
+        )
+        assert extract_preferences(normalize_request("I would prefer Chinese restaurants"))[0]["cuisine_types"] == ["Chinese"]
+
+    def test_multi_word_phrases_and_curly_apostrophes(self):
+        result, unclassified = extract_preferences(normalize_request("Korean BBQ, stroller friendly, can’t walk far"))
+        assert result["cuisine_types"] == ["Korean"]
+        assert result["accessibility"] == ["stroller", "limited walking"]
+        assert unclassified == []
+
+    def test_unknown_words_and_negations_are_unclassified(self):
+        assert extract_preferences(normalize_request("We want to see where Elvis lived"))[1] == ["where", "elvis", "lived"]
+        assert extract_preferences(normalize_request("No seafood please"))[1] == ["no"]
+
+    def test_ambiguous_words_are_left_to_the_llm(self):
+        for text, word in [("fish market", "fish"), ("ski lift", "lift"), ("accessible", "accessible"),
+                           ("Thai curry", "curry"), ("outdoor seating", "seating")]:
+            result, unclassified = extract_preferences(normalize_request(text))
+            assert word in unclassified, text
+        assert extract_preferences(normalize_request("fish market"))[0]["cuisine_types"] == []
+
+
+class TestPreferencesParser:
+    def test_common_phrasing_skips_llm(self):
+        backend, gateway = llm_answering({})
+        parser = PreferencesParser()
+        with gateway:
+            result = asyncio.run(parser.parse_special_requests("Vegan food and beaches"))
+        assert result == {"keywords": ["beach"], "cuisine_types": ["Vegan"], "accessibility": []}
+        assert backend.calls == 0
+        assert parser.get_stats()["rules"] == 1 and parser.get_stats()["rule_share"] == 1.0
+
+    def test_unclassified_text_uses_llm_then_cache(self):
+        cache, store = redis_cache()
+        backend, gateway = llm_answering({"keywords": ["graceland"], "cuisine_types": [], "accessibility": []})
+        parser = PreferencesParser(cache=cache)
+        with gateway:
+            first = asyncio.run(parser.parse_special_requests("Museums and where Elvis lived"))
+            # Same request, different case and spacing: served from the cache
+            second = asyncio.run(parser.parse_special_requests("  museums and WHERE elvis lived. "))
+        assert first == second == {"keywords": ["graceland", "museum"], "cuisine_types": [], "accessibility": []}
+        assert backend.calls == 1
+        assert list(store) == [parser.cache_key(normalize_request("Museums and where Elvis lived"))]
+        assert parser.get_stats()["llm"] == 1 and parser.get_stats()["cache_hits"] == 1
+
+    def test_negation_trusts_llm_reading(self):
+        _, gateway = llm_answering({"keywords": [], "cuisine_types": [], "accessibility": []})
+        with gateway:
+            result = asyncio.run(PreferencesParser().parse_special_requests("No seafood please"))
+        assert result["cuisine_types"] == []
+
+    def test_llm_failure_falls_back_to_lexicon_result(self):
+        def fail(prompt):
+            raise RuntimeError("down")
+        backend = StubBackend(latency=0, responders={"preferences": fail})
+        parser = PreferencesParser()
+        with patch.object(preferences, "get_llm_gateway", return_value=LLMGateway(backend=backend)):
+            result = asyncio.run(parser.parse_special_requests("Sushi near where Elvis lived"))
+        assert result["cuisine_types"] == ["Japanese"]
+        assert parser.stats["llm_failures"] == 1
+
+    def test_enhancing_does_not_mutate_parsed_preferences(self):
+        parser = PreferencesParser()
+        parsed = asyncio.run(parser.parse_special_requests("museums"))
+        parser.enhance_preferences(parsed, True, [5], True, "2026-07-01")
+        assert parsed["keywords"] == ["museum"]
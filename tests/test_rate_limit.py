@@ -0,0 +1,69 @@
+"""
+Unit tests for the atomic rate limit decorator (decorators/rate_limit.py).
+
+The Lua scripts run inside Redis, so here redis_client.eval is mocked and we check
+how the decorator interprets script results. Use tests/scripts/rate_limit_benchmark.py
+against a real Redis to exercise the scripts under concurrency.
+"""
+
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi import HTTPException, Request
+
+from decorators.rate_limit import rate_limit, DAILY_LIMIT_SCRIPT, SLIDING_WINDOW_SCRIPT
+
+
+@rate_limit(endpoint="test_daily", limit=2)
+async def daily_endpoint():
+    return "ok"
+
+
+@rate_limit(endpoint="test_sliding", limit=2, window_seconds=60, per_client=True)
+async def sliding_endpoint(request=None):
+    return "ok"
+
+
+class TestRateLimitDecorator:
+    """One eval call per request; -1 blocks, None fails open"""
+
+    @pytest.mark.parametrize("remaining, blocked", [(1, False), (0, False), (-1, True), (None, False)])
+    def test_daily_mode(self, remaining, blocked):
+        with patch("decorators.rate_limit.redis_client.eval", AsyncMock(return_value=remaining)) as mock_eval:
+            if blocked:
+                with pytest.raises(HTTPException) as exc:
+                    asyncio.run(daily_endpoint())
+                assert exc.value.status_code == 429
+            else:
+                assert asyncio.run(daily_endpoint()) == "ok"
+        mock_eval.assert_awaited_once()
+        assert mock_eval.await_args.args[0] == DAILY_LIMIT_SCRIPT
+        assert mock_eval.await_args.kwargs["keys"] == ["rate_limit:api:test_daily"]
+
+    def test_sliding_mode_without_request_uses_global_key(self):
+        with patch("decorators.rate_limit.redis_client.eval", AsyncMock(return_value=-1)) as mock_eval:
+            with pytest.raises(HTTPException):
+                asyncio.run(sliding_endpoint())
+        assert mock_eval.await_args.args[0] == SLIDING_WINDOW_SCRIPT
+        assert mock_eval.await_args.kwargs["keys"] == ["rate_limit:sliding:test_sliding:global"]
+        assert mock_eval.await_args.kwargs["args"][:2] == [60000, 2]
+
+    def sliding_key_for(self, forwarded=None, peer="10.0.0.9"):
+        request = MagicMock(spec=Request)
+        request.headers = {"x-forwarded-for": forwarded} if forwarded else {}
+        request.client.host = peer
+        with patch("decorators.rate_limit.redis_client.eval", AsyncMock(return_value=1)) as mock_eval:
+            asyncio.run(sliding_endpoint(request=request))
+        return mock_eval.await_args.kwargs["keys"][0]
+
+    def test_client_is_the_entry_added_by_the_trusted_proxy(self):
+        # The left-most entries are whatever the client sent; the proxy appends the real peer
+        assert self.sliding_key_for("1.2.3.4, 203.0.113.7") == "rate_limit:sliding:test_sliding:203.0.113.7"
+        assert self.sliding_key_for("203.0.113.7") == "rate_limit:sliding:test_sliding:203.0.113.7"
+        with patch("decorators.rate_limit.TRUSTED_PROXY_HOPS", 2):
+            assert self.sliding_key_for("1.2.3.4, 203.0.113.7, 10.0.0.2") == "rate_limit:sliding:test_sliding:203.0.113.7"
+
+    def test_without_trusted_proxy_uses_socket_peer(self):
+        assert self.sliding_key_for() == "rate_limit:sliding:test_sliding:10.0.0.9"
+        with patch("decorators.rate_limit.TRUSTED_PROXY_HOPS", 0):
+            assert self.sliding_key_for("1.2.3.4") == "rate_limit:sliding:test_sliding:10.0.0.9"
@@ -0,0 +1,135 @@
+"""
+Unit tests for RedisClient batching: auto-pipelining, mget and mset_with_ttl.
+
+The redis-py client is replaced by a fake that records pipeline executions.
+"""
+
+import asyncio
+import os
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.deadline import deadline_scope
+from app.redis_client import RedisClient
+
+
+class FakePipeline:
+    def __init__(self, store, executions):
+        self.store = store
+        self.executions = executions
+        self.commands = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+            return self
+        return queue
+
+    async def execute(self, raise_on_error=True):
+        self.executions.append([c[0] for c in self.commands])
+        results = []
+        for name, args, _ in self.commands:
+            if name == 'get':
+                results.append(self.store.get(args[0]))
+            elif name == 'setex':
+                self.store[args[0]] = args[2]
+                results.append(True)
+            elif name == 'mget':
+                results.append([self.store.get(k) for k in args[0]])
+            else:
+                results.append(ValueError(f"unsupported {name}"))
+        return results
+
+
+def make_client(store, auto_pipeline=True):
+    executions = []
+    fake = MagicMock()
+    fake.pipeline.side_effect = lambda transaction=False: FakePipeline(store, executions)
+    client = RedisClient("redis://unused", auto_pipeline=auto_pipeline)
+    client.client = fake
+    return client, executions
+
+
+class TestAutoPipelining:
+    """Commands issued in the same tick should share one round trip"""
+
+    def test_concurrent_gets_share_one_pipeline(self):
+        async def scenario():
+            client, executions = make_client({'a': b'1', 'b': b'2'})
+            results = await asyncio.gather(client.get('a'), client.get('b'), client.get('c'))
+            return client, executions, results
+
+        client, executions, results = asyncio.run(scenario())
+        assert results == [b'1', b'2', None]
+        assert executions == [['get', 'get', 'get']]
+        assert client.pipeline_stats == {'flushes': 1, 'commands': 3}
+        assert client._flushes == set()
+
+    def test_flush_task_is_referenced_until_done(self):
+        async def scenario():
+            client, _ = make_client({'a': b'1'})
+            pending = asyncio.ensure_future(client._command('get', 'a'))
+            await asyncio.sleep(0)
+            held = len(client._flushes)
+            await pending
+            return client, held
+
+        client, held = asyncio.run(scenario())
+        assert held == 1
+        assert client._flushes == set()
+
+    def test_per_command_errors_are_isolated(self):
+        async def scenario():
+            client, _ = make_client({'a': b'1'})
+            return await asyncio.gather(client.get('a'), client.decr('a'))
+
+        get_result, decr_result = asyncio.run(scenario())
+        assert get_result == b'1'
+        assert decr_result is None  # error logged and swallowed like before
+
+    def test_disabled_mode_calls_client_directly(self):
+        async def scenario():
+            client, executions = make_client({})
+            client.auto_pipeline = False
+            client.client.get = AsyncMock(return_value=b'x')
+            return await client.get('a'), executions
+
+        result, executions = asyncio.run(scenario())
+        assert result == b'x'
+        assert executions == []
+
+    def test_disabled_unless_opted_in(self):
+        with patch.dict(os.environ, {}, clear=False):
+            os.environ.pop('REDIS_AUTO_PIPELINE', None)
+            assert not RedisClient("redis://unused").auto_pipeline
+            os.environ['REDIS_AUTO_PIPELINE'] = 'true'
+            assert RedisClient("redis://unused").auto_pipeline
+
+    def test_writes_are_capped_by_the_request_deadline(self):
+        async def hang(*args, **kwargs):
+            await asyncio.sleep(5)
+
+        async def scenario():
+            client, _ = make_client({}, auto_pipeline=False)
+            client.client.setex = hang
+            with deadline_scope(0.05):
+                start = time.perf_counter()
+                await client.set('a', b'1', 60)
+                return time.perf_counter() - start
+
+        assert asyncio.run(scenario()) < 1.0
+
+
+class TestBatchApi:
+    def test_mget_and_mset_with_ttl(self):
+        async def scenario():
+            store = {}
+            client, executions = make_client(store)
+            ok = await client.mset_with_ttl({'a': (b'1', 60), 'b': (b'2', 120)})
+            values = await client.mget(['a', 'b', 'missing'])
+            return ok, values, executions
+
+        ok, values, executions = asyncio.run(scenario())
+        assert ok
+        assert values == [b'1', b'2', None]
+        assert executions == [['setex', 'setex'], ['mget']]
@@ -0,0 +1,137 @@
+"""
+Unit tests for GoogleRoutesClient.calculate_distance_matrix (app/routes_client.py).
+
+The aiohttp session and Redis are mocked, so these run without network access.
+"""
+
+import asyncio
+import os
+from unittest.mock import AsyncMock, MagicMock
+
+os.environ.setdefault("GOOGLE_PLACES_API_KEY", "test")
+
+from app.routes_client import GoogleRoutesClient
+from app.places_client import RedisCache
+
+
+class FakeResponse:
+    def __init__(self, payload, status=200):
+        self.payload = payload
+        self.status = status
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise Exception(f"HTTP {self.status}")
+
+    async def json(self):
+        return self.payload
+
+
+ORIGINS = [{"lat": 29.42, "lng": -98.49}, {"lat": 29.43, "lng": -98.48}]
+DESTINATIONS = [{"lat": 29.44, "lng": -98.47}, {"lat": 29.45, "lng": -98.46}, {"lat": 29.46, "lng": -98.45}]
+
+
+def matrix_payload(origin_count, dest_count):
+    return [
+        {
+            "originIndex": i,
+            "destinationIndex": j,
+            "distanceMeters": 1000 * (i + 1) + j,
+            "duration": f"{60 * (j + 1)}s",
+            "condition": "ROUTE_EXISTS",
+        }
+        for i in range(origin_count)
+        for j in range(dest_count)
+    ]
+
+
+class TestDistanceMatrix:
+    """Matrix endpoint, per-pair fallback and pair cache"""
+
+    def test_single_matrix_request_for_all_pairs(self):
+        session = MagicMock()
+        session.post.return_value = FakeResponse(matrix_payload(2, 3))
+        client = GoogleRoutesClient(session=session)
+
+        matrix = asyncio.run(client.calculate_distance_matrix(ORIGINS, DESTINATIONS, mode="DRIVE"))
+
+        assert session.post.call_count == 1
+        assert session.post.call_args.args[0] == client.matrix_url
+        assert len(matrix) == 2 and all(len(row) == 3 for row in matrix)
+        assert matrix[1][2]["distance_meters"] == 2002
+        assert matrix[1][2]["duration_seconds"] == 180
+        assert matrix[0][0]["duration_text"] == "1 mins"
+
+    def test_large_requests_are_chunked_by_origin_rows(self):
+        origins = [{"lat": 29.0 + i / 100, "lng": -98.0} for i in range(30)]
+        destinations = [{"lat": 30.0 + j / 100, "lng": -98.0} for j in range(30)]
+        session = MagicMock()
+        session.post.side_effect = lambda url, **kw: FakeResponse(
+            matrix_payload(len(kw["json"]["origins"]), len(kw["json"]["destinations"]))
+        )
+        client = GoogleRoutesClient(session=session)
+
+        matrix = asyncio.run(client.calculate_distance_matrix(origins, destinations))
+
+        assert session.post.call_count == 2
+        for call in session.post.call_args_list:
+            body = call.kwargs["json"]
+            assert len(body["origins"]) * len(body["destinations"]) <= GoogleRoutesClient.MAX_MATRIX_ELEMENTS
+        assert all(element.get("error") is None for row in matrix for element in row)
+
+    def test_falls_back_to_bounded_per_pair_routes(self):
+        in_flight = 0
+        peak = 0
+
+        class SlowRouteResponse(FakeResponse):
+            async def __aenter__(self):
+                nonlocal in_flight, peak
+                in_flight += 1
+                peak = max(peak, in_flight)
+                await asyncio.sleep(0.01)
+                return self
+
+            async def __aexit__(self, *exc):
+                nonlocal in_flight
+                in_flight -= 1
+                return False
+
+        def post(url, **kw):
+            if url.endswith("computeRouteMatrix"):
+                return FakeResponse([], status=503)
+            return SlowRouteResponse({"routes": [{"distanceMeters": 500, "duration": "120s"}]})
+
+        session = MagicMock()
+        session.post.side_effect = post
+        client = GoogleRoutesClient(session=session, max_concurrency=2)
+
+        matrix = asyncio.run(client.calculate_distance_matrix(ORIGINS, DESTINATIONS, mode="WALK"))
+
+        assert peak <= 2
+        assert all(element["distance_meters"] == 500 for row in matrix for element in row)
+        walk_bodies = [c.kwargs["json"] for c in session.post.call_args_list]
+        assert all("routingPreference" not in body for body in walk_bodies)
+
+    def test_cached_pairs_skip_the_api(self):
+        async def scenario():
+            redis = AsyncMock()
+            redis.get.return_value = None
+            cache = RedisCache(redis)
+            session = MagicMock()
+            session.post.side_effect = lambda url, **kw: FakeResponse(
+                matrix_payload(len(kw["json"]["origins"]), len(kw["json"]["destinations"]))
+            )
+            client = GoogleRoutesClient(session=session, cache=cache)
+            first = await client.calculate_distance_matrix(ORIGINS, DESTINATIONS)
+            second = await client.calculate_distance_matrix(ORIGINS, DESTINATIONS)
+            return session, first, second
+
+        session, first, second = asyncio.run(scenario())
+        assert session.post.call_count == 1
+        assert first == second
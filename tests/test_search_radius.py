@@ -0,0 +1,81 @@
+"""
+Unit tests for the search radius lookup (radius_for_address and the per-cell
+calculate_radius cache in app/places_client.py).
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+from app.places_client import GooglePlacesClient, RedisCache, radius_for_address, DEFAULT_SEARCH_RADIUS
+from app.single_flight import SingleFlight
+
+
+def address(*components):
+    return [{"address_components": [{"long_name": name, "types": types} for name, types in components]}]
+
+
+SAN_ANTONIO = address(("Downtown", ["neighborhood"]), ("San Antonio", ["locality"]), ("Texas", ["administrative_area_level_1"]))
+AUSTIN = address(("Austin", ["locality"]), ("Texas", ["administrative_area_level_1"]))
+BROOKLYN = address(("Brooklyn", ["sublocality"]), ("New York", ["locality"]))
+
+
+class TestRadiusForAddress:
+    """Locality-size table lookup"""
+
+    def test_sprawling_locality_override(self):
+        assert radius_for_address(SAN_ANTONIO) == (40000, "San Antonio")
+
+    def test_area_type_defaults(self):
+        assert radius_for_address(AUSTIN) == (30000, "Austin")
+        assert radius_for_address(BROOKLYN) == (20000, "Brooklyn")
+
+    def test_unknown_area(self):
+        assert radius_for_address([]) == (DEFAULT_SEARCH_RADIUS, None)
+        assert radius_for_address(address(("Somewhere", ["route"]))) == (DEFAULT_SEARCH_RADIUS, None)
+
+
+class TestCalculateRadiusCache:
+    """Concurrent get_places misses should trigger a single reverse geocode"""
+
+    def make_client(self, reverse_geocode):
+        redis = AsyncMock()
+        redis.get.return_value = None
+        client = GooglePlacesClient.__new__(GooglePlacesClient)
+        client.logger = MagicMock()
+        client.cache = RedisCache(redis)
+        client.single_flight = SingleFlight()
+        client.routes_client = MagicMock()
+        client.routes_client.reverse_geocode = AsyncMock(side_effect=reverse_geocode)
+        return client
+
+    def test_one_reverse_geocode_per_cell(self):
+        async def reverse_geocode(location):
+            await asyncio.sleep(0.01)
+            return SAN_ANTONIO
+
+        async def scenario():
+            client = self.make_client(reverse_geocode)
+            location = {"lat": 29.4241, "lng": -98.4936}
+            radii = await asyncio.gather(*[client.calculate_radius(location) for _ in range(6)])
+            # A nearby point in the same cell is served from cache
+            radii.append(await client.calculate_radius({"lat": 29.4219, "lng": -98.4911}))
+            return client, radii
+
+        client, radii = asyncio.run(scenario())
+        assert radii == [40000] * 7
+        assert client.routes_client.reverse_geocode.await_count == 1
+
+    def test_errors_use_default_and_are_not_cached(self):
+        async def reverse_geocode(location):
+            raise RuntimeError("boom")
+
+        async def scenario():
+            client = self.make_client(reverse_geocode)
+            first = await client.calculate_radius({"lat": 1.0, "lng": 2.0})
+            second = await client.calculate_radius({"lat": 1.0, "lng": 2.0})
+            return client, first, second
+
+        client, first, second = asyncio.run(scenario())
+        assert first == second == DEFAULT_SEARCH_RADIUS
+        assert client.routes_client.reverse_geocode.await_count == 2
+        client.cache.redis_client.set.assert_not_called()
@@ -0,0 +1,110 @@
+"""
+Unit tests for single-flight coalescing of cache misses (app/single_flight.py).
+
+No Redis server or Google API calls are needed - Redis is mocked.
+"""
+
+import asyncio
+from unittest.mock import AsyncMock
+
+from app.single_flight import SingleFlight
+
+
+class TestSingleFlight:
+    """Concurrent misses for one key should trigger exactly one fetch"""
+
+    def test_in_process_callers_share_one_fetch(self):
+        async def scenario():
+            flight = SingleFlight()
+            calls = 0
+
+            async def fetch():
+                nonlocal calls
+                calls += 1
+                await asyncio.sleep(0.01)
+                return ["place"]
+
+            results = await asyncio.gather(*[flight.do("places:x", fetch) for _ in range(5)])
+            return flight, calls, results
+
+        flight, calls, results = asyncio.run(scenario())
+        assert calls == 1
+        assert results == [["place"]] * 5
+        stats = flight.get_stats()
+        assert stats["keys"]["places:x"]["collapsed"] == 4
+        assert stats["totals"]["fetches"] == 1
+        assert stats["in_flight"] == 0
+
+    def test_errors_propagate_to_all_waiters(self):
+        async def scenario():
+            flight = SingleFlight()
+
+            async def fetch():
+                await asyncio.sleep(0.01)
+                raise RuntimeError("upstream failed")
+
+            return await asyncio.gather(*[flight.do("k", fetch) for _ in range(3)], return_exceptions=True)
+
+        results = asyncio.run(scenario())
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+    def test_cancelled_leader_does_not_cancel_followers(self):
+        async def scenario():
+            flight = SingleFlight()
+
+            async def fetch():
+                await asyncio.sleep(0.05)
+                return ["place"]
+
+            leader = asyncio.ensure_future(asyncio.wait_for(flight.do("k", fetch), timeout=0.01))
+            await asyncio.sleep(0)
+            follower = asyncio.ensure_future(asyncio.wait_for(flight.do("k", fetch), timeout=5))
+            return await asyncio.gather(leader, follower, return_exceptions=True), flight
+
+        (leader, follower), flight = asyncio.run(scenario())
+        assert isinstance(leader, asyncio.TimeoutError)
+        assert follower == ["place"]
+        assert flight.get_stats()["totals"]["fetches"] == 1
+        assert flight.get_stats()["in_flight"] == 0
+
+    def test_waits_for_remote_leader_instead_of_fetching(self):
+        async def scenario():
+            redis = AsyncMock()
+            redis.set_nx.return_value = False  # another worker holds the lease
+            redis.exists.return_value = True
+            flight = SingleFlight(redis, lease_ms=1000, poll_interval=0.001)
+
+            cache_reads = iter([None, None, ["cached"]])
+            fetch = AsyncMock(return_value=["fetched"])
+            result = await flight.do("k", fetch, cache_get=AsyncMock(side_effect=lambda: next(cache_reads)))
+            return flight, fetch, result
+
+        flight, fetch, result = asyncio.run(scenario())
+        assert result == ["cached"]
+        fetch.assert_not_called()
+        assert flight.get_stats()["keys"]["k"]["remote_hits"] == 1
+
+    def test_leader_releases_lease(self):
+        async def scenario():
+            redis = AsyncMock()
+            redis.set_nx.return_value = True
+            flight = SingleFlight(redis)
+            result = await flight.do("k", AsyncMock(return_value=["x"]), cache_get=AsyncMock(return_value=None))
+            return redis, result
+
+        redis, result = asyncio.run(scenario())
+        assert result == ["x"]
+        redis.delete_if_equals.assert_awaited_once()
+        assert redis.delete_if_equals.await_args.args[0] == "singleflight:k"
+
+    def test_redis_unavailable_falls_back_to_local_fetch(self):
+        async def scenario():
+            redis = AsyncMock()
+            redis.set_nx.return_value = None
+            flight = SingleFlight(redis)
+            result = await flight.do("k", AsyncMock(return_value=["x"]), cache_get=AsyncMock(return_value=None))
+            return redis, result
+
+        redis, result = asyncio.run(scenario())
+        assert result == ["x"]
+        redis.delete_if_equals.assert_not_called()
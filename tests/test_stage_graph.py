@@ -0,0 +1,163 @@
+"""
+Unit tests for the stage-graph executor (app/stage_graph.py) and its use in
+RecommendationGenerator.generate_recommendations.
+"""
+
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi import HTTPException
+
+from app.recommendations import RecommendationGenerator
+from app.stage_graph import StageCancelled, StageGraph, StageStats
+
+LOCATION = {"lat": 30.2672, "lng": -97.7431}
+
+
+def sleeper(seconds, value=None):
+    async def run(inputs):
+        await asyncio.sleep(seconds)
+        return value if value is not None else dict(inputs)
+    return run
+
+
+class TestStageGraph:
+    def test_stages_start_when_inputs_ready(self):
+        graph = StageGraph("test")
+        graph.add("slow", sleeper(0.05, "slow"))
+        graph.add("fast", sleeper(0.01, "fast"))
+        graph.add("after_fast", sleeper(0.01), deps=["fast"])
+        graph.add("join", sleeper(0), deps=["slow", "after_fast"])
+
+        results = asyncio.run(graph.run())
+
+        assert results["after_fast"] == {"fast": "fast"}
+        assert results["join"] == {"slow": "slow", "after_fast": {"fast": "fast"}}
+        # after_fast did not wait for the unrelated slow stage
+        assert graph.timings["after_fast"]["end_ms"] < graph.timings["slow"]["end_ms"]
+        assert graph.critical_path() == ["slow", "join"]
+
+    def test_independent_stages_overlap(self):
+        graph = StageGraph("test")
+        for name in ("a", "b", "c"):
+            graph.add(name, sleeper(0.05, name))
+
+        start = time.perf_counter()
+        asyncio.run(graph.run())
+        assert time.perf_counter() - start < 0.12
+
+    def test_failure_propagates(self):
+        async def boom(inputs):
+            raise ValueError("boom")
+
+        graph = StageGraph("test")
+        graph.add("boom", boom)
+        graph.add("downstream", sleeper(0), deps=["boom"])
+        with pytest.raises(ValueError):
+            asyncio.run(graph.run())
+        assert "downstream" not in graph.timings
+
+    def test_cancelled_stage_counts_as_failure(self):
+        async def cancelled(inputs):
+            raise asyncio.CancelledError()
+
+        graph = StageGraph("test")
+        graph.add("cancelled", cancelled)
+        graph.add("downstream", sleeper(0), deps=["cancelled"])
+        graph.add("other", sleeper(0, "ok"))
+        with pytest.raises(StageCancelled, match="cancelled"):
+            asyncio.run(graph.run())
+        assert "downstream" not in graph.timings
+
+    def test_undefined_dependency_rejected(self):
+        graph = StageGraph("test")
+        with pytest.raises(ValueError):
+            graph.add("a", sleeper(0), deps=["missing"])
+
+    def test_stats_bucket_per_type_searches(self):
+        graph = StageGraph("test")
+        graph.add("geocode", sleeper(0.01, "loc"))
+        graph.add("search:museum", sleeper(0.02, "m"), deps=["geocode"])
+        graph.add("search:park", sleeper(0.01, "p"), deps=["geocode"])
+        asyncio.run(graph.run())
+
+        stats = StageStats()
+        stats.record(graph)
+        result = stats.get_stats()
+        assert result["runs"] == 1
+        assert result["stages"]["search"]["count"] == 2
+        assert result["last_critical_path"] == ["geocode", "search:museum"]
+        assert result["critical_path_counts"] == {"geocode": 1, "search": 1}
+
+
+def place(name, rating=4.5, reviews=1000):
+    return {"place_id": name, "name": name, "rating": rating, "user_ratings_total": reviews, "types": ["point_of_interest"]}
+
+
+def make_generator(get_places, parse_delay=0.0, location=LOCATION):
+    generator = RecommendationGenerator.__new__(RecommendationGenerator)
+    generator.logger = MagicMock()
+    generator.default_photo_max_width = 800
+    generator.stage_stats = StageStats()
+    generator.places_client = MagicMock()
+    generator.places_client.geocode = AsyncMock(return_value=location)
+    generator.places_client.calculate_radius = AsyncMock(return_value=10000)
+    generator.places_client.get_places = AsyncMock(side_effect=get_places)
+
+    async def parse(special_requests):
+        await asyncio.sleep(parse_delay)
+        return {}
+
+    generator.preferences_parser = MagicMock()
+    generator.preferences_parser.parse_special_requests = AsyncMock(side_effect=parse)
+    generator.preferences_parser.enhance_preferences = MagicMock(return_value={"keywords": [], "cuisine_types": ["Chinese"]})
+    return generator
+
+
+class TestGenerateRecommendationsGraph:
+    def test_results_and_stage_timings(self):
+        async def get_places(location, place_type, keywords=None, max_results=None, special_requests=None):
+            return [place(f"{place_type} {i}") for i in range(3)]
+
+        generator = make_generator(get_places, parse_delay=0.03)
+        result = asyncio.run(generator.generate_recommendations("Austin", travel_days=2))
+
+        assert len(result["restaurants"]) == 3
+        assert len(result["landmarks"]) == 12
+        # Geocoding did not wait for the preferences LLM call
+        restaurant_call = generator.places_client.get_places.call_args_list[-1]
+        assert restaurant_call.kwargs["keywords"] == ["chinese"]
+        stats = generator.stage_stats.get_stats()
+        assert {"preferences", "geocode", "radius", "search", "ranking"} <= set(stats["stages"])
+        assert stats["last_critical_path"][0] == "preferences"
+        assert stats["last_critical_path"][-1] == "ranking"
+
+    def test_failed_landmark_search_is_skipped(self):
+        async def get_places(location, place_type, keywords=None, max_results=None, special_requests=None):
+            if place_type == "museum":
+                raise RuntimeError("quota")
+            return [place(f"{place_type} spot")]
+
+        result = asyncio.run(make_generator(get_places).generate_recommendations("Austin", travel_days=1))
+        assert "museum spot" not in result["landmarks"]
+        assert "park spot" in result["landmarks"]
+
+    def test_cancelled_landmark_search_is_skipped(self):
+        async def get_places(location, place_type, keywords=None, max_results=None, special_requests=None):
+            if place_type == "museum":
+                # e.g. a shared fetch cancelled underneath this search
+                raise asyncio.CancelledError()
+            return [place(f"{place_type} spot")]
+
+        result = asyncio.run(make_generator(get_places).generate_recommendations("Austin", travel_days=1))
+        assert "museum spot" not in result["landmarks"]
+        assert "park spot" in result["landmarks"]
+
+    def test_geocode_failure_is_404(self):
+        generator = make_generator(AsyncMock(return_value=[]), location=None)
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(generator.generate_recommendations("Nowhere", travel_days=1))
+        assert exc.value.status_code == 404
+        generator.places_client.get_places.assert_not_called()
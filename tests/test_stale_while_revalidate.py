@@ -0,0 +1,126 @@
+"""
+Unit tests for the stale-while-revalidate cache envelope in RedisCache (app/places_client.py).
+
+Redis is mocked, so these run without a server.
+"""
+
+import asyncio
+import json
+import time
+from unittest.mock import AsyncMock
+
+from app.places_client import RedisCache, CACHE_SCHEMA_VERSION, _IMAGE_ENVELOPE, _IMAGE_ENVELOPE_MAGIC
+
+
+def envelope(value, soft_offset, hard_offset, version=CACHE_SCHEMA_VERSION):
+    now = time.time()
+    return json.dumps({'_swr': version, 'soft': now + soft_offset, 'hard': now + hard_offset, 'data': value}).encode()
+
+
+class TestEnvelope:
+    """Encoding, legacy values and schema versions"""
+
+    def test_round_trip_through_redis_bytes(self):
+        async def scenario():
+            cache = RedisCache(AsyncMock())
+            await cache.set("places:a", [{"name": "Museum"}], 'places')
+            stored = cache.redis_client.set.await_args.args[1]
+            reader = RedisCache(AsyncMock())
+            reader.redis_client.get.return_value = stored
+            return await reader.get_entry("places:a")
+
+        entry = asyncio.run(scenario())
+        assert entry.value == [{"name": "Museum"}]
+        assert not entry.stale
+        assert entry.soft_expiry < entry.hard_expiry
+
+    def test_soft_ttls_are_jittered(self):
+        cache = RedisCache(AsyncMock())
+        softs = {round(cache._encode([1], 'places')[2].soft_expiry - time.time()) for _ in range(20)}
+        assert len(softs) > 1
+        assert all(cache.ttl['places'] * 0.9 - 1 <= s <= cache.ttl['places'] for s in softs)
+
+    def test_legacy_values_still_readable(self):
+        async def scenario():
+            cache = RedisCache(AsyncMock())
+            cache.redis_client.get.return_value = json.dumps({"lat": 1.0}).encode()
+            geocode = await cache.get("geocode:destination:x")
+            cache.local.clear()
+            cache.redis_client.get.return_value = b"\xff\xd8raw-jpeg"
+            image = await cache.get("image_proxy:photoreference:abc")
+            return geocode, image
+
+        geocode, image = asyncio.run(scenario())
+        assert geocode == {"lat": 1.0}
+        assert image == b"\xff\xd8raw-jpeg"
+
+    def test_image_envelope_round_trip(self):
+        cache = RedisCache(AsyncMock())
+        data, _, _ = cache._encode(b"\xff\xd8image", 'image_proxy')
+        assert data.startswith(_IMAGE_ENVELOPE_MAGIC)
+        entry = cache._decode("image_proxy:x", data)
+        assert entry.value == b"\xff\xd8image"
+        assert len(data) == _IMAGE_ENVELOPE.size + len(b"\xff\xd8image")
+
+    def test_other_schema_versions_are_misses(self):
+        async def scenario():
+            cache = RedisCache(AsyncMock())
+            cache.redis_client.get.return_value = envelope([1], 100, 200, version=CACHE_SCHEMA_VERSION + 1)
+            return await cache.get("places:a")
+
+        assert asyncio.run(scenario()) is None
+
+
+class TestStaleWhileRevalidate:
+    """Stale reads return immediately and trigger one refresh per key"""
+
+    def test_stale_value_served_with_single_refresh(self):
+        async def scenario():
+            cache = RedisCache(AsyncMock())
+            cache.redis_client.get.return_value = envelope(["old"], -10, 100)
+            refresh = AsyncMock(return_value=["new"])
+
+            async def slow_refresh():
+                await asyncio.sleep(0.01)
+                return await refresh()
+
+            values = await asyncio.gather(*[cache.get_swr("places:a", slow_refresh) for _ in range(5)])
+            await asyncio.sleep(0.05)
+            return cache, refresh, values
+
+        cache, refresh, values = asyncio.run(scenario())
+        assert values == [["old"]] * 5
+        assert refresh.await_count == 1
+        stats = cache.get_swr_stats()
+        assert stats['stale_serves'] == 5 and stats['refreshes'] == 1 and stats['refreshing'] == 0
+
+    def test_fresh_values_do_not_refresh(self):
+        async def scenario():
+            cache = RedisCache(AsyncMock())
+            cache.redis_client.get.return_value = envelope(["fresh"], 100, 200)
+            refresh = AsyncMock()
+            value = await cache.get_swr("places:a", refresh)
+            return cache, refresh, value
+
+        cache, refresh, value = asyncio.run(scenario())
+        assert value == ["fresh"]
+        refresh.assert_not_called()
+        assert cache.get_swr_stats()['fresh_hits'] == 1
+
+    def test_past_hard_expiry_is_a_miss(self):
+        async def scenario():
+            cache = RedisCache(AsyncMock())
+            cache.redis_client.get.return_value = envelope(["dead"], -20, -10)
+            return await cache.get_swr("places:a", AsyncMock())
+
+        assert asyncio.run(scenario()) is None
+
+    def test_failed_refresh_is_counted(self):
+        async def scenario():
+            cache = RedisCache(AsyncMock())
+            cache.redis_client.get.return_value = envelope(["old"], -10, 100)
+            await cache.get_swr("places:a", AsyncMock(side_effect=RuntimeError("boom")))
+            await asyncio.sleep(0.01)
+            return cache
+
+        assert asyncio.run(scenario()).get_swr_stats()['refresh_failures'] == 1
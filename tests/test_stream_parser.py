@@ -0,0 +1,115 @@
+"""
+Unit tests for incremental parsing of the streamed itinerary (app/stream_parser.py)
+and for starting per-day enrichment before the LLM has finished answering.
+"""
+
+import asyncio
+import json
+import time
+from unittest.mock import MagicMock, patch
+
+from app import complete_itinerary as ci
+from app.llm_gateway import LLMGateway
+from app.schema import LandmarkSelection, ItineraryBlock
+from app.stream_parser import IncrementalArrayParser
+
+
+def day(number, name):
+    return {"day": number, "blocks": [
+        {"type": "landmark", "name": name, "description": "Say \"hi\" {not a brace}", "start_time": "09:00", "duration": "2h"}
+    ]}
+
+
+DOCUMENT = json.dumps({"itinerary": [day(1, "Zoo"), day(2, "Museum")]})
+
+
+class TestIncrementalArrayParser:
+    def test_items_returned_as_they_close(self):
+        parser = IncrementalArrayParser()
+        first_end = DOCUMENT.index('"Museum"') - 30
+        assert [d["day"] for d in parser.feed(DOCUMENT[:first_end])] == [1]
+        assert [d["day"] for d in parser.feed(DOCUMENT[first_end:])] == [2]
+        assert parser.text == DOCUMENT
+
+    def test_one_character_at_a_time(self):
+        parser = IncrementalArrayParser()
+        items = []
+        for char in DOCUMENT:
+            items.extend(parser.feed(char))
+        assert items == [day(1, "Zoo"), day(2, "Museum")]
+
+    def test_braces_in_strings_and_code_fence_ignored(self):
+        parser = IncrementalArrayParser()
+        assert parser.feed("```json\n" + DOCUMENT + "\n```") == [day(1, "Zoo"), day(2, "Museum")]
+
+    def test_nested_arrays_are_not_items(self):
+        parser = IncrementalArrayParser()
+        # Blocks inside a day close at depth 4 and must not be returned on their own
+        assert [d["day"] for d in parser.feed(DOCUMENT)] == [1, 2]
+
+
+def selection():
+    return LandmarkSelection(
+        details={"destination": "San Diego", "travelDays": 2, "startDate": "2026-06-01", "endDate": "2026-06-02"},
+        itinerary=[
+            {"day": d, "attractions": [{"name": "Zoo", "description": "", "location": {"lat": 32.7, "lng": -117.1}, "type": "landmark"}]}
+            for d in (1, 2)
+        ]
+    )
+
+
+class TestEnrichmentOverlapsStream:
+    """Day 1 is enriched while the LLM is still writing day 2"""
+
+    def run(self, final_document=DOCUMENT):
+        split = DOCUMENT.index('{"day": 2')
+        stream_done = {}
+        started = []
+
+        class SlowSecondDay:
+            name = "test"
+
+            async def stream(self, request, timeout, purpose):
+                yield DOCUMENT[:split], None
+                await asyncio.sleep(0.1)
+                yield DOCUMENT[split:], None
+                stream_done["at"] = time.perf_counter()
+
+        async def enrich(day_plan, places_client, destination, used_restaurants, progress=None):
+            started.append((day_plan.day, time.perf_counter()))
+            lunch = ItineraryBlock(type="restaurant", name=f"Lunch {day_plan.day}", start_time="12:00", duration="1h")
+            return day_plan.blocks + [lunch], 1
+
+        async def describe(itinerary, destination, progress=None):
+            return None
+
+        async def dedupe(itinerary, places_client=None):
+            return itinerary
+
+        places_client = MagicMock()
+        places_client.cache = None
+        events = []
+        with patch.object(ci, "get_llm_gateway", return_value=LLMGateway(backend=SlowSecondDay())), \
+                patch.object(ci, "enrich_day", side_effect=enrich), \
+                patch.object(ci, "describe_landmarks", side_effect=describe), \
+                patch.object(ci, "remove_duplicate_landmarks", side_effect=dedupe), \
+                patch.object(ci, "parser") as parser:
+            parser.parse = MagicMock(side_effect=lambda text: ci.StructuredItinerary.model_validate_json(final_document))
+            result = asyncio.run(ci.complete_itinerary_from_selection(selection(), places_client, progress=events.append))
+        return result, started, stream_done["at"], events
+
+    def test_first_day_enriched_before_stream_ends(self):
+        result, started, stream_end, events = self.run()
+        assert started[0][0] == 1 and started[0][1] < stream_end
+        # Each day is enriched exactly once
+        assert sorted(d for d, _ in started) == [1, 2]
+        assert [[b["name"] for b in d["blocks"]] for d in result["itinerary"]] == [["Zoo", "Lunch 1"], ["Museum", "Lunch 2"]]
+        assert [e["day"] for e in events if e["event"] == "skeleton_day"] == [1, 2]
+        assert "llm_first_day" in result["performance_metrics"]["timings"]
+        assert result["performance_metrics"]["costs"]["google_places"]["enhancement_api_calls"] == 2
+
+    def test_day_changed_by_final_parse_is_enriched_again(self):
+        changed = json.dumps({"itinerary": [day(1, "Aquarium"), day(2, "Museum")]})
+        result, started, _, _ = self.run(final_document=changed)
+        assert sorted(d for d, _ in started) == [1, 1, 2]
+        assert result["itinerary"][0]["blocks"][0]["name"] == "Aquarium"
@@ -0,0 +1,73 @@
+"""
+Unit tests for the shared token bucket (app/token_bucket.py).
+
+Redis is mocked; the per-process fallback is exercised directly.
+"""
+
+import asyncio
+import time
+from unittest.mock import AsyncMock
+
+from app.token_bucket import TokenBucket
+
+
+class TestTokenBucket:
+    """acquire() should wait for a token rather than fail immediately"""
+
+    def test_redis_bucket_waits_then_acquires(self):
+        async def scenario():
+            redis = AsyncMock()
+            # Empty bucket first (retry in 20ms), then a token is available
+            redis.eval.side_effect = [[0, 20, "0.5"], [1, 0, "0.2"]]
+            bucket = TokenBucket('nearby_search', 600, 60, redis)
+            ok = await bucket.acquire()
+            return bucket, redis, ok
+
+        bucket, redis, ok = asyncio.run(scenario())
+        assert ok
+        assert redis.eval.await_count == 2
+        stats = bucket.get_stats()
+        assert stats["acquired"] == 1 and stats["waited"] == 1
+        assert stats["max_wait_ms"] >= 15
+        assert stats["tokens"] == 0.2
+
+    def test_rejects_after_deadline(self):
+        async def scenario():
+            redis = AsyncMock()
+            redis.eval.return_value = [0, 1000, "0"]
+            bucket = TokenBucket('place_details', 600, 60, redis)
+            return bucket, await bucket.acquire(deadline=time.monotonic() + 0.05)
+
+        bucket, ok = asyncio.run(scenario())
+        assert not ok
+        assert bucket.get_stats()["rejected"] == 1
+
+    def test_local_fallback_when_redis_unavailable(self):
+        async def scenario():
+            redis = AsyncMock()
+            redis.eval.return_value = None
+            bucket = TokenBucket('photos', 2, 60, redis, max_wait=0.01)
+            return bucket, [await bucket.acquire() for _ in range(3)]
+
+        bucket, results = asyncio.run(scenario())
+        assert results == [True, True, False]
+        assert bucket.get_stats()["fallback_local"] >= 3
+
+    def test_failed_redis_is_skipped_during_cooldown(self):
+        async def hanging_eval(*args, **kwargs):
+            await asyncio.sleep(0.05)  # Stands in for the eval timeout
+            return None
+
+        async def scenario():
+            redis = AsyncMock()
+            redis.eval.side_effect = hanging_eval
+            bucket = TokenBucket('photos', 1, 60, redis, max_wait=0.3)
+            start = time.perf_counter()
+            results = [await bucket.acquire() for _ in range(2)]
+            return redis, results, time.perf_counter() - start
+
+        redis, results, elapsed = asyncio.run(scenario())
+        # The empty local bucket retries until the deadline without going back to Redis
+        assert results == [True, False]
+        assert redis.eval.await_count == 1
+        assert elapsed < 0.5
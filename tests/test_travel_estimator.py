@@ -0,0 +1,74 @@
+"""
+Unit tests for the offline travel-time estimator (app/travel_estimator.py)
+and its use as a get_distance_matrix backend.
+"""
+
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.travel_estimator import TravelTimeEstimator, haversine_matrix
+from app.places_client import GooglePlacesClient
+
+
+ALAMO = {"lat": 29.4260, "lng": -98.4861}
+RIVER_WALK = {"lat": 29.4230, "lng": -98.4900}
+PEARL = {"lat": 29.4430, "lng": -98.4810}
+
+
+class TestTravelTimeEstimator:
+    """Great-circle distance, estimates and calibration"""
+
+    def test_haversine_matrix_shape_and_values(self):
+        distances = haversine_matrix([ALAMO, PEARL], [ALAMO, RIVER_WALK, PEARL])
+        assert distances.shape == (2, 3)
+        assert distances[0, 0] == pytest.approx(0.0)
+        # Alamo -> Pearl is roughly 1.9 km as the crow flies
+        assert 1800 < distances[0, 2] < 2000
+        assert distances[0, 2] == pytest.approx(distances[1, 0])
+
+    def test_estimate_matrix_matches_routes_format(self):
+        estimator = TravelTimeEstimator()
+        matrix = estimator.estimate_matrix([ALAMO], [RIVER_WALK, PEARL], mode="WALK")
+        element = matrix[0][1]
+        assert set(element) >= {"distance_meters", "duration_seconds", "distance_km", "duration_text"}
+        assert element["estimated"] is True
+        assert matrix[0][0]["duration_seconds"] < element["duration_seconds"]
+
+    def test_driving_is_faster_than_walking(self):
+        estimator = TravelTimeEstimator()
+        assert estimator.estimate_minutes(ALAMO, PEARL, "DRIVE") < estimator.estimate_minutes(ALAMO, PEARL, "WALK")
+
+    def test_calibration_fits_detour_and_speed(self):
+        estimator = TravelTimeEstimator()
+        destinations = [RIVER_WALK, PEARL, {"lat": 29.4500, "lng": -98.5000}]
+        straight = haversine_matrix([ALAMO], destinations)[0]
+        # Real routes that are exactly 2x the straight line at 10 m/s (+ default 180s overhead)
+        real = [[{"distance_meters": 2 * d, "duration_seconds": 2 * d / 10 + 180} for d in straight]]
+
+        assert estimator.calibrate([ALAMO], destinations, real, mode="DRIVE")
+        assert estimator.profiles["DRIVE"]["detour_factor"] == pytest.approx(2.0)
+        assert estimator.profiles["DRIVE"]["speed_mps"] == pytest.approx(10.0)
+        assert estimator.get_stats()["DRIVE"]["calibration_samples"] == 3
+
+    def test_calibration_ignores_missing_and_failed_pairs(self):
+        estimator = TravelTimeEstimator()
+        matrix = [[None, {"error": "No route found"}, {"distance_meters": 3000, "duration_seconds": 400}]]
+        assert not estimator.calibrate([ALAMO], [RIVER_WALK, PEARL, PEARL], matrix)
+
+
+class TestDistanceMatrixBackend:
+    """GooglePlacesClient.get_distance_matrix backend selection"""
+
+    def test_estimate_backend_makes_no_api_calls(self):
+        client = GooglePlacesClient.__new__(GooglePlacesClient)
+        client.travel_estimator = TravelTimeEstimator()
+        client.distance_matrix_backend = "routes"
+        client.routes_client = MagicMock()
+        client.routes_client.calculate_distance_matrix = AsyncMock()
+        client.logger = MagicMock()
+
+        matrix = asyncio.run(client.get_distance_matrix([ALAMO], [PEARL], mode="walking", backend="estimate"))
+
+        client.routes_client.calculate_distance_matrix.assert_not_called()
+        assert matrix[0][0]["estimated"] is True